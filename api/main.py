@@ -0,0 +1,254 @@
+"""
+api/main.py
+MindField async API (ASGI)
+--------------------------
+Serves the bridge from one event loop instead of one blocked worker per
+request:
+
+  uvicorn api.main:app --host 0.0.0.0 --port 8000
+
+  POST /query  → dual-geometry hits (same payload as the Flask /query)
+  POST /ask    → bridge hits + an answer from the chat model (web/app.js)
+  GET  /stats  → cache counters and in-flight load
+  GET  /metrics → Prometheus exposition (responses carry Server-Timing)
+
+The bridge itself is synchronous (Chroma / sentence-transformers), so each
+search runs on a bounded thread pool while the loop keeps accepting
+connections. All threads share the process-wide BridgeEngine, i.e. one
+Chroma client and one pooled OpenAI embeddings session; chat completions go
+through AsyncOpenAI over a pooled httpx client.
+
+Backpressure: at most API_MAX_INFLIGHT requests are admitted; a request
+that cannot get a slot within API_QUEUE_TIMEOUT seconds gets 503 with
+Retry-After instead of piling up.
+
+Controlled via .env:
+  API_MAX_INFLIGHT   = admitted concurrent requests          (default 512)
+  API_QUEUE_TIMEOUT  = seconds to wait for a slot             (default 2)
+  API_THREADS        = threads running bridge searches        (default 64)
+  API_CHAT_CONNECTIONS = pooled connections to the chat API   (default 64)
+  OPENAI_CHAT_MODEL  = chat model for /ask                    (default gpt-5)
+"""
+
+import os
+import sys
+import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import anyio
+import httpx
+from dotenv import load_dotenv
+from fastapi import Body, FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from openai import AsyncOpenAI
+
+load_dotenv()
+
+API_MAX_INFLIGHT = int(os.getenv("API_MAX_INFLIGHT", "512"))
+API_QUEUE_TIMEOUT = float(os.getenv("API_QUEUE_TIMEOUT", "2"))
+API_THREADS = int(os.getenv("API_THREADS", "64"))
+API_CHAT_CONNECTIONS = int(os.getenv("API_CHAT_CONNECTIONS", "64"))
+OPENAI_CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-5")
+
+# each bridge query fans out to two hemisphere searches
+os.environ.setdefault("BRIDGE_POOL_SIZE", str(API_THREADS * 2))
+os.environ.setdefault("OPENAI_POOL_SIZE", str(API_THREADS))
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "scripts"))
+from bridge_query import get_engine, SEARCH_MODES  # noqa: E402
+from lexical_index import normalize_filters  # noqa: E402
+from telemetry import trace, span, render, flatten  # noqa: E402
+
+# ─────────────────────────────────────────────
+# Backpressure
+# ─────────────────────────────────────────────
+class Backpressure:
+    """Admission control: a bounded number of requests in flight, the rest rejected fast."""
+
+    def __init__(self, limit=API_MAX_INFLIGHT, queue_timeout=API_QUEUE_TIMEOUT):
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.inflight = 0
+        self.rejected = 0
+        self._slots = asyncio.Semaphore(limit)
+
+    @asynccontextmanager
+    async def slot(self):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(503, "bridge saturated, retry shortly", headers={"Retry-After": "1"})
+        self.inflight += 1
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            self._slots.release()
+
+    def stats(self):
+        return {"inflight": self.inflight, "limit": self.limit, "rejected": self.rejected}
+
+
+class State:
+    backpressure = None
+    threads = None
+    chat = None
+
+state = State()
+
+def chat_client():
+    """Pooled async chat client, opened on the first /ask (only /ask needs a key)."""
+    if state.chat is None:
+        state.chat = AsyncOpenAI(http_client=httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=API_CHAT_CONNECTIONS,
+                                max_keepalive_connections=API_CHAT_CONNECTIONS),
+            timeout=httpx.Timeout(120.0, connect=10.0),
+        ))
+    return state.chat
+
+async def run_blocking(fn, *args):
+    """Run a synchronous bridge call on the bounded search pool."""
+    return await anyio.to_thread.run_sync(fn, *args, limiter=state.threads)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    state.backpressure = Backpressure()
+    state.threads = anyio.CapacityLimiter(API_THREADS)
+    try:
+        # open Chroma and load the query models before taking traffic
+        await run_blocking(get_engine().warm)
+    except Exception as e:
+        print("Bridge preload skipped:", e)
+    yield
+    if state.chat is not None:
+        await state.chat.close()
+
+
+app = FastAPI(title="Mind Field API", lifespan=lifespan)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"]
+)
+
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    # the trace rides the context into to_thread, so bridge spans land on it
+    with trace(request.url.path) as t:
+        response = await call_next(request)
+        t.status = str(response.status_code)
+    response.headers["Server-Timing"] = t.server_timing()
+    return response
+
+# ─────────────────────────────────────────────
+# Prompt
+# ─────────────────────────────────────────────
+def build_prompt(query, result):
+    """Compasses (orientation) as the bearing, fragments (texture) as the texture."""
+    def short(txt, n=400):
+        return (txt[:n] + "…") if len(txt) > n else txt
+
+    context_lines = [
+        f"({o.get('codex_id', '?')} / {o.get('source', '?')}) "
+        f"{o.get('node_label', '')} ↔ {o.get('field_label', '')}"
+        for o in result.get("orientation", [])[:5]
+    ]
+    texture_lines = [
+        f"[{t.get('codex_id', '?')} · {t.get('title', '?')} · segmento {t.get('segment', '?')}] "
+        f"{short(t.get('document') or '')}"
+        for t in result.get("texture", [])[:6]
+    ]
+    context = "\n".join(context_lines) or "(sem bússolas)"
+    texture = "\n".join(texture_lines) or "(sem fragmentos)"
+
+    prompt = f"""
+Você é o **Arquivista de Delta** (pt-BR, tom cosmopoético, não utilitarista).
+TAREFA:
+- Responder à pergunta preservando o estilo do arquivo.
+- Separar em duas seções: **ECO** (citações/evocações sutis) e **SÍNTESE** (interpretação).
+- Basear-se nas BÚSSOLAS (orientação) e FRAGMENTOS (textura). Evitar inventar fatos fora deles.
+- Se o material é insuficiente, declare limites com graça.
+
+PERGUNTA:
+{query}
+
+BÚSSOLAS (orientação):
+{context}
+
+FRAGMENTOS (textura):
+{texture}
+"""
+    return prompt
+
+# ─────────────────────────────────────────────
+# Routes
+# ─────────────────────────────────────────────
+def read_query(payload):
+    query = (payload.get("query") or "").strip()
+    if not query:
+        raise HTTPException(400, "empty query")
+    return query
+
+def read_options(payload):
+    """(mode, filters) from the request body; see bridge_query.py."""
+    mode = payload.get("mode")
+    if mode is not None and mode not in SEARCH_MODES:
+        raise HTTPException(400, f"'mode' must be one of {', '.join(SEARCH_MODES)}")
+    try:
+        return mode, normalize_filters(payload.get("filters"))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+async def bridge(query, mode=None, filters=None):
+    try:
+        return await run_blocking(get_engine().query, query, 5, mode, filters)
+    except Exception as e:
+        print("Bridge error:", e)
+        raise HTTPException(500, str(e))
+
+
+@app.post("/query")
+async def query(payload: dict = Body(...)):
+    q, (mode, filters) = read_query(payload), read_options(payload)
+    async with state.backpressure.slot():
+        return await bridge(q, mode, filters)
+
+
+@app.post("/ask")
+async def ask(payload: dict = Body(...)):
+    q, (mode, filters) = read_query(payload), read_options(payload)
+    async with state.backpressure.slot():
+        result = await bridge(q, mode, filters)
+        with span("chat"):
+            chat = await chat_client().chat.completions.create(
+                model=OPENAI_CHAT_MODEL,
+                messages=[
+                    {"role": "system", "content": "Você é o Arquivista de Delta."},
+                    {"role": "user", "content": build_prompt(q, result)},
+                ],
+                temperature=0.4,
+            )
+    return {
+        "answer": chat.choices[0].message.content,
+        "debug": {
+            "local_hits": len(result.get("texture", [])),
+            "abstract_hits": len(result.get("orientation", [])),
+            "partial": result.get("partial", []),
+            "lexical_fallback": result.get("lexical_fallback", []),
+        },
+    }
+
+
+@app.get("/stats")
+async def stats():
+    return {**get_engine().stats(), "load": state.backpressure.stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    gauges = flatten("mindfield", {**get_engine().stats(), "load": state.backpressure.stats()})
+    return PlainTextResponse(render(gauges), media_type="text/plain; version=0.0.4")
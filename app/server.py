@@ -1,5 +1,7 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 import sys
+import json
+from functools import wraps
 from pathlib import Path
 
 # --- Path setup ---
@@ -8,7 +10,16 @@ SCRIPTS_PATH = BASE_DIR.parent / "scripts"
 STATIC_PATH = BASE_DIR / "static"
 
 sys.path.append(str(SCRIPTS_PATH))
-from bridge_query import query_bridge  # import your bridge
+from bridge_query import query_bridge, query_bridge_batch, stream_bridge, bridge_stats, preload, SEARCH_MODES  # import your bridge
+from lexical_index import normalize_filters
+from telemetry import trace, span, render, flatten
+
+# Load the query models once, before gunicorn --preload forks the workers.
+# Chroma is not opened here: each worker connects on its first request.
+try:
+    preload()
+except Exception as e:
+    print("Bridge preload skipped:", e)
 
 # --- Flask app setup ---
 app = Flask(
@@ -17,6 +28,43 @@ app = Flask(
     static_url_path="",  # <-- this line fixes the 404s
 )
 
+def timed(route):
+    """Trace the view: stage spans → Server-Timing header and /metrics histograms."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with trace(route) as t:
+                response = app.make_response(view(*args, **kwargs))
+                t.status = str(response.status_code)
+            response.headers["Server-Timing"] = t.server_timing()
+            return response
+        return wrapper
+    return decorator
+
+def search_options(data):
+    """
+    Optional per-request search mode (vector | hybrid | lexical; None →
+    BRIDGE_SEARCH_MODE) and metadata filters ({"category" | "codex_id" | "tags": ...}).
+    """
+    mode = data.get("mode")
+    if mode is not None and mode not in SEARCH_MODES:
+        raise ValueError(f"'mode' must be one of {', '.join(SEARCH_MODES)}")
+    return {"mode": mode, "filters": normalize_filters(data.get("filters"))}
+
+MAX_N_RESULTS = 50
+
+def result_count(data):
+    """'n_results' (default 5) as an int in 1..MAX_N_RESULTS; it reaches every backend per query."""
+    value = data.get("n_results", 5)
+    try:
+        n_results = None if isinstance(value, (bool, float)) else int(value)
+    except (TypeError, ValueError):
+        n_results = None
+    if n_results is None or not 1 <= n_results <= MAX_N_RESULTS:
+        raise ValueError(f"'n_results' must be an integer from 1 to {MAX_N_RESULTS}")
+    return n_results
+
+
 @app.route("/")
 def index():
     """Serve MindField Atlas interface."""
@@ -24,49 +72,159 @@ def index():
 
 
 @app.route("/query", methods=["POST"])
+@timed("/query")
 def query():
     """Bridge front-end query to the dual-geometry engine"""
     data = request.get_json(force=True)
     q = data.get("query", "").strip()
     if not q:
         return jsonify({"error": "empty query"}), 400
+    try:
+        options = search_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     try:
-        result = query_bridge(q)
-        lines = ["✅ bridge complete"]
-
-        # --- Orientation layer ---
-        if "orientation" in result:
-            lines.append("\n🧭  Orientation layer — dual-geometry compasses:")
-            for o in result["orientation"]:
-                codex = o.get("codex_id", "N/A")
-                node = o.get("node_label", "Unknown")
-                field = o.get("field_label", "")
-                src = o.get("source", "")
-                geom = o.get("geometry_pair", "")
-                lines.append(
-                    f"  • {codex} — {node} ↔ {field}  ({src}) [{geom}]"
-                )
-
-        # --- Texture layer ---
-        if "texture" in result:
-            lines.append("\n🌿  Texture layer — paragraph fragments:")
-            for t in result["texture"]:
-                codex = t.get("codex_id", "N/A")
-                title = t.get("title", "Unknown")
-                segment = t.get("segment", "")
-                # ↓ now we also show the first ~180 chars of the actual text
-                text = t.get("document", "").strip()
-                if text:
-                    preview = text.replace("\n", " ")[:180] + "..."
-                else:
-                    preview = "(no text)"
-                lines.append(f"  • {codex} — {title}  [segment {segment}]")
-                lines.append(f"    → {preview}")
-
-        lines.append("\n✅  bridge complete — two hemispheres queried in native geometry.")
-        return jsonify({"output": "\n".join(lines)})
+        result = query_bridge(q, **options)
+        with span("format"):
+            # structured layers ride along so the canvas can plot the hits' x/y
+            return jsonify({"output": bridge_text(result), **result})
+
+    except Exception as e:
+        print("Bridge error:", e)
+        return jsonify({"error": str(e)}), 500
+
+
+def bridge_text(result):
+    """Glyph text version of a bridge result (🧭 orientation, 🌿 texture)."""
+    lines = ["✅ bridge complete"]
+
+    # --- Orientation layer ---
+    if "orientation" in result:
+        lines.append("\n🧭  Orientation layer — dual-geometry compasses:")
+        for o in result["orientation"]:
+            codex = o.get("codex_id", "N/A")
+            node = o.get("node_label", "Unknown")
+            field = o.get("field_label", "")
+            src = o.get("source", "")
+            geom = o.get("geometry_pair", "")
+            lines.append(
+                f"  • {codex} — {node} ↔ {field}  ({src}) [{geom}]"
+            )
+
+    # --- Texture layer ---
+    if "texture" in result:
+        lines.append("\n🌿  Texture layer — paragraph fragments:")
+        for t in result["texture"]:
+            codex = t.get("codex_id", "N/A")
+            title = t.get("title", "Unknown")
+            segment = t.get("segment", "")
+            # ↓ now we also show the first ~180 chars of the actual text
+            text = t.get("document", "").strip()
+            if text:
+                preview = text.replace("\n", " ")[:180] + "..."
+            else:
+                preview = "(no text)"
+            lines.append(f"  • {codex} — {title}  [segment {segment}]")
+            lines.append(f"    → {preview}")
+            if t.get("alternates"):
+                also = ", ".join(f"{a['codex_id']} [{a['segment']}]" for a in t["alternates"])
+                lines.append(f"    ≡ também em {also}")
+
+    field = result.get("resonance")
+    if field and field.get("links"):
+        coherence = field.get("coherence", {})
+        lines.append(
+            f"\n🔗  Resonance field — mean {field['mean']:.2f}  "
+            f"(coherence 🧭 {coherence.get('orientation') or 0:.2f} · 🌿 {coherence.get('texture') or 0:.2f})"
+        )
+        for link in field["links"][:3]:
+            o = result["orientation"][link["orientation"]]
+            t = result["texture"][link["texture"]]
+            lines.append(f"  • {o.get('node_label', '')} ↔ {t.get('title', '')} [segment {t.get('segment', '')}]  ({link['score']:.2f})")
+
+    if result.get("partial"):
+        lines.append(f"\n⚠️  partial result — {', '.join(result['partial'])} layer timed out.")
+    if result.get("lexical_fallback"):
+        lines.append(f"\n🔤  {', '.join(result['lexical_fallback'])} answered by keyword search while its model loads.")
+
+    lines.append("\n✅  bridge complete — two hemispheres queried in native geometry.")
+    return "\n".join(lines)
+
 
+@app.route("/query/stream", methods=["POST"])
+def query_stream():
+    """
+    Stream the bridge as NDJSON: one structured line per hemisphere the
+    moment its search finishes, then a closing "done" line.
+    """
+    data = request.get_json(force=True)
+    q = data.get("query", "").strip()
+    if not q:
+        return jsonify({"error": "empty query"}), 400
+    try:
+        n_results = result_count(data)
+        options = search_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def events():
+        # headers are gone by the time the layers finish, so the stage
+        # timings ride on the closing line instead of a Server-Timing header
+        with trace("/query/stream") as t:
+            try:
+                for event, payload in stream_bridge(q, n_results=n_results, **options):
+                    payload = {"event": event, **payload, "elapsed_ms": round(t.elapsed() * 1000, 1)}
+                    if event == "done":
+                        payload["server_timing"] = t.server_timing()
+                    yield json.dumps(payload, ensure_ascii=False) + "\n"
+            except Exception as e:
+                print("Bridge error:", e)
+                t.status = "error"
+                yield json.dumps({"event": "error", "error": str(e)}) + "\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    """Cache hit rates and eviction counters for this worker."""
+    return jsonify(bridge_stats())
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus exposition: stage/request histograms plus cache counters (per worker)."""
+    return Response(render(flatten("mindfield", bridge_stats())), mimetype="text/plain; version=0.0.4")
+
+
+MAX_BATCH = 5000
+
+@app.route("/query/batch", methods=["POST"])
+@timed("/query/batch")
+def query_batch():
+    """Run many queries in one call; returns structured JSON per query."""
+    data = request.get_json(force=True)
+    queries = data.get("queries") or []
+    if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+        return jsonify({"error": "'queries' must be a list of strings"}), 400
+    queries = [q.strip() for q in queries]
+    if not queries or not all(queries):
+        return jsonify({"error": "empty query"}), 400
+    if len(queries) > MAX_BATCH:
+        return jsonify({"error": f"at most {MAX_BATCH} queries per batch"}), 400
+    try:
+        n_results = result_count(data)
+        options = search_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        return jsonify({"results": query_bridge_batch(queries, n_results=n_results, **options)})
     except Exception as e:
         print("Bridge error:", e)
         return jsonify({"error": str(e)}), 500
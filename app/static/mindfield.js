@@ -21,25 +21,34 @@ document.addEventListener("DOMContentLoaded", () => {
     if (!q) return;
     status.textContent = "⟳ querying...";
     output.textContent = "";
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+
+    // Each hemisphere arrives as its own NDJSON line (see /query/stream),
+    // so the first layer is drawn while the second is still searching.
+    const data = { orientation: [], texture: [], query_point: {} };
+    const text = {};
 
     try {
-      const res = await fetch("/query", {
+      const res = await fetch("/query/stream", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ query: q }),
       });
-      const data = await res.json();
-
-      if (data.output) {
-        // --- NEW: Textual mode rendering ---
-        status.textContent = "formatting bridge output...";
-        renderTextOutput(data.output);
-        status.textContent = "✅ bridge complete";
-      } else {
-        // --- Constellation mode (fallback) ---
-        status.textContent = "rendering constellation...";
-        drawConstellation(data);
-        status.textContent = "✅ complete";
+      if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = "";
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        let nl;
+        while ((nl = buffered.indexOf("\n")) >= 0) {
+          const line = buffered.slice(0, nl).trim();
+          buffered = buffered.slice(nl + 1);
+          if (line) handleEvent(JSON.parse(line), data, text);
+        }
       }
     } catch (err) {
       console.error(err);
@@ -48,6 +57,84 @@ document.addEventListener("DOMContentLoaded", () => {
     }
   }
 
+  function handleEvent(evt, data, text) {
+    if (evt.event === "orientation" || evt.event === "texture") {
+      data[evt.event] = evt.hits;
+      data.query_point[evt.event] = evt.query_point;
+      text[evt.event] = formatLayer(evt.event, evt.hits);
+      renderTextOutput(
+        ["✅ bridge complete", text.orientation, text.texture].filter(Boolean).join("\n")
+      );
+      if (hasCoordinates(data)) drawConstellation(data);
+      status.textContent = `⟳ ${evt.event} layer in ${evt.elapsed_ms} ms...`;
+    } else if (evt.event === "resonance") {
+      data.resonance = evt.field;
+      ["orientation", "texture"].forEach((layer) => {
+        const scores = evt.scores[layer] || {};
+        data[layer].forEach((hit, i) => {
+          Object.keys(scores).forEach((key) => { hit[key] = scores[key][i]; });
+        });
+      });
+      text.resonance = formatResonance(data);
+      if (hasCoordinates(data)) drawConstellation(data);
+    } else if (evt.event === "done") {
+      if (evt.partial && evt.partial.length) {
+        text.partial = `\n⚠️  partial result — ${evt.partial.join(", ")} layer timed out.`;
+      }
+      if (evt.lexical_fallback && evt.lexical_fallback.length) {
+        text.fallback = `\n🔤  ${evt.lexical_fallback.join(", ")} answered by keyword search while its model loads.`;
+      }
+      renderTextOutput(
+        [text.orientation, text.texture, text.resonance, text.partial, text.fallback,
+         "\n✅  bridge complete — two hemispheres queried in native geometry."]
+          .filter(Boolean).join("\n")
+      );
+      status.textContent = `✅ bridge complete (${evt.elapsed_ms} ms)`;
+    } else if (evt.event === "error") {
+      status.textContent = "⚠️ error in bridge";
+      output.textContent = `Bridge error — ${evt.error}`;
+    }
+  }
+
+  // Same glyph layout the /query endpoint builds server-side.
+  function formatLayer(layer, hits) {
+    const lines = [];
+    if (layer === "orientation") {
+      lines.push("\n🧭  Orientation layer — dual-geometry compasses:");
+      hits.forEach((o) => {
+        lines.push(`  • ${o.codex_id || "N/A"} — ${o.node_label || "Unknown"} ↔ ${o.field_label || ""}  (${o.source || ""}) [${o.geometry_pair || ""}]`);
+      });
+    } else {
+      lines.push("\n🌿  Texture layer — paragraph fragments:");
+      hits.forEach((t) => {
+        const body = (t.document || "").trim();
+        const preview = body ? body.replace(/\n/g, " ").slice(0, 180) + "..." : "(no text)";
+        lines.push(`  • ${t.codex_id || "N/A"} — ${t.title || "Unknown"}  [segment ${t.segment ?? ""}]`);
+        lines.push(`    → ${preview}`);
+        if (t.alternates && t.alternates.length) {
+          const also = t.alternates.map((a) => `${a.codex_id} [${a.segment}]`).join(", ");
+          lines.push(`    ≡ também em ${also}`);
+        }
+      });
+    }
+    return lines.join("\n");
+  }
+
+  // Resonance summary, laid out like the /query text output.
+  function formatResonance(data) {
+    const field = data.resonance;
+    if (!field || !field.links || !field.links.length) return "";
+    const c = field.coherence || {};
+    const lines = [`\n🔗  Resonance field — mean ${field.mean.toFixed(2)}  ` +
+      `(coherence 🧭 ${(c.orientation || 0).toFixed(2)} · 🌿 ${(c.texture || 0).toFixed(2)})`];
+    field.links.slice(0, 3).forEach((link) => {
+      const o = data.orientation[link.orientation] || {};
+      const t = data.texture[link.texture] || {};
+      lines.push(`  • ${o.node_label || ""} ↔ ${t.title || ""} [segment ${t.segment ?? ""}]  (${link.score.toFixed(2)})`);
+    });
+    return lines.join("\n");
+  }
+
   /**
    * NEW: Parses the raw text output from the server
    * and renders it as structured HTML.
@@ -63,6 +150,8 @@ document.addEventListener("DOMContentLoaded", () => {
         html += `<span class="layer-title orientation">${line}</span>`;
       } else if (line.startsWith('🌿')) {
         html += `<span class="layer-title texture">${line}</span>`;
+      } else if (line.startsWith('🔗')) {
+        html += `<span class="layer-title resonance">${line}</span>`;
       } else if (line.startsWith('  •')) {
         html += `<span class="list-item">${line}</span>`;
       } else if (line.startsWith('    →')) {
@@ -84,23 +173,34 @@ document.addEventListener("DOMContentLoaded", () => {
   });
 
   // --- Constellation visual layer ---
-  // (This function is unchanged)
+  // Hits carry precomputed x/y (see scripts/constellation.py).
+  function hasCoordinates(data) {
+    return [...(data.orientation || []), ...(data.texture || [])].some(
+      (n) => typeof n.x === "number"
+    );
+  }
+
   function drawConstellation(data) {
     ctx.clearRect(0, 0, canvas.width, canvas.height);
-    const { orientation = [], texture = [] } = data;
+    const orientation = (data.orientation || []).filter((n) => typeof n.x === "number");
+    const texture = (data.texture || []).filter((n) => typeof n.x === "number");
     const cx = canvas.width / 2;
     const cy = canvas.height / 2;
 
     const mapX = (x) => cx + x * (canvas.width * 0.35);
     const mapY = (y) => cy + y * (canvas.height * 0.35);
 
-    // draw resonance links
-    texture.forEach((t, i) => {
-      const o = orientation[i % orientation.length];
+    // draw resonance links: the strongest compass ↔ fragment pairs, brighter when closer
+    const links = (data.resonance && data.resonance.links) || [];
+    links.forEach((link) => {
+      const o = (data.orientation || [])[link.orientation];
+      const t = (data.texture || [])[link.texture];
+      if (!o || !t || typeof o.x !== "number" || typeof t.x !== "number") return;
+      const alpha = 0.08 + 0.5 * Math.max(0, Math.min(1, link.score));
       ctx.beginPath();
       ctx.moveTo(mapX(o.x), mapY(o.y));
       ctx.lineTo(mapX(t.x), mapY(t.y));
-      ctx.strokeStyle = "rgba(255,255,255,0.08)";
+      ctx.strokeStyle = `rgba(255,255,255,${alpha.toFixed(2)})`;
       ctx.lineWidth = 1;
       ctx.stroke();
     });
@@ -109,6 +209,11 @@ document.addEventListener("DOMContentLoaded", () => {
     orientation.forEach((n) => drawNode(n, "gold"));
     texture.forEach((n) => drawNode(n, "cyan"));
 
+    // the query itself, placed among its neighbours on each layer
+    Object.values(data.query_point || {}).forEach((p) => {
+      if (p) drawNode({ ...p, title: "◎ query" }, "white");
+    });
+
     function drawNode(n, color) {
       ctx.beginPath();
       ctx.arc(mapX(n.x), mapY(n.y), 5, 0, 2 * Math.PI);
@@ -119,7 +224,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
       ctx.font = "12px monospace";
       ctx.fillStyle = "rgba(255,255,255,0.65)";
-      const label = n.title || n.excerpt?.slice(0, 48) || n.id;
+      const label = n.title || n.node_label || n.excerpt?.slice(0, 48) || n.id;
       ctx.fillText(label, mapX(n.x) + 10, mapY(n.y) + 3);
     }
   }
@@ -0,0 +1,14 @@
+"""
+bench
+MindField benchmark suite
+-------------------------
+  corpus.py    synthetic Markdown notebooks + ICOSA/DODECA geometry JSON
+  pipeline.py  records/sec for ingestion stages 1–4
+  load.py      p50/p95/p99 latency of query_bridge and /query under concurrency
+  run.py       CLI tying them together; emits one JSON document per run
+
+Everything runs in a scratch workspace with deterministic hash embedders
+(see scripts/embedders.py), so no model download or API key is needed:
+
+  python -m bench.run --fragments 10000 --concurrency 1,8,32 --out bench.json
+"""
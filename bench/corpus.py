@@ -0,0 +1,146 @@
+"""
+bench/corpus.py
+Synthetic corpus generator
+--------------------------
+Writes notebooks shaped like data/raw_md (Title/Author header, blank-line
+separated paragraphs) and one geometry file per notebook shaped like
+data/raw_geometry_json (metadata, ICOSA_MESH nodes/relations/triads,
+DODECA_FIELD resonance_points/pentagonal_fields, FUSION_SYNTHESIS).
+
+Every paragraph is exactly three sentences, so stage 1 turns it into exactly
+one fragment and `fragments` is the archive size the run will produce.
+Output is fully determined by the seed.
+"""
+
+import os
+import json
+import random
+
+WORDS = (
+    "mirror glass membrane field manifold curvature coherence fidelity drift "
+    "mechanism topology ecology mind signal silence resonance pattern memory "
+    "threshold geometry compass texture fragment lattice horizon return ethic "
+    "learning error depth surface relation gravity chamber vertex edge pentagon "
+    "triad node trace archive breath tension attractor boundary witness rhythm "
+    "interpretation transparency machine model language meaning measure care "
+    "integrity fragility determinism hallucination projection orbit density "
+    "gradient feedback symmetry fold seam weather current tide root canopy"
+).split()
+
+CATEGORIES = ("THEORY", "FIELD", "CODEX", "NOTE")
+NODES_PER_CODEX = 12
+FIELDS_PER_CODEX = 12
+POINTS_PER_CODEX = 20
+
+
+def sentence(rng, lo=8, hi=20):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(lo, hi))]
+    return words[0].capitalize() + " " + " ".join(words[1:]) + "."
+
+def paragraph(rng):
+    return " ".join(sentence(rng) for _ in range(3))
+
+def title(rng, n=3):
+    return " ".join(rng.choice(WORDS).capitalize() for _ in range(n))
+
+def codex_name(i, rng):
+    category = CATEGORIES[i % len(CATEGORIES)]
+    slug = "_".join(rng.choice(WORDS).capitalize() for _ in range(3))
+    return f"{category}.{i + 1:06d}_{slug}"
+
+def notebook(rng, name, n_paragraphs):
+    lines = [f"Title: {name.split('_', 1)[1].replace('_', ' ')}  ", "Author:", "", ""]
+    for p in range(n_paragraphs):
+        if p and p % 25 == 0:
+            lines += [title(rng, 4), ""]   # short heading lines are filtered by stage 1
+        lines += [paragraph(rng), ""]
+    return "\n".join(lines)
+
+def geometry(rng, name):
+    nodes = [{
+        "id": f"N{i + 1}",
+        "label": title(rng, 5),
+        "summary": paragraph(rng),
+        "excerpts": [{"source_ref": {"file": f"{name}.md", "page": None,
+                                     "line_start": None, "line_end": None},
+                      "text": sentence(rng)}],
+    } for i in range(NODES_PER_CODEX)]
+    relations = [{
+        "id": f"R{i + 1}",
+        "source": f"N{i % NODES_PER_CODEX + 1}",
+        "target": f"N{(i * 5 + 1) % NODES_PER_CODEX + 1}",
+        "relation_types": rng.sample(["paradoxal", "metodológica", "causal", "ética", "ressonante"], 2),
+        "summary": sentence(rng),
+    } for i in range(30)]
+    triads = [{
+        "id": f"T{i + 1}",
+        "nodes": [f"N{n + 1}" for n in rng.sample(range(NODES_PER_CODEX), 3)],
+        "insight": sentence(rng),
+        "format": "paragrafo",
+        "evidence": [],
+    } for i in range(20)]
+    points = [{
+        "id": f"P{i + 1}",
+        "text": sentence(rng),
+        "source_ref": {"file": f"{name}.md", "page": None, "line_start": None, "line_end": None},
+    } for i in range(POINTS_PER_CODEX)]
+    fields = [{
+        "id": f"D{i + 1}",
+        "title": title(rng, 5),
+        "point_refs": [f"P{p + 1}" for p in rng.sample(range(POINTS_PER_CODEX), 4)],
+        "paragraph": paragraph(rng),
+        "reflection": sentence(rng),
+    } for i in range(FIELDS_PER_CODEX)]
+    return {
+        "metadata": {
+            "title": name.split("_", 1)[1].replace("_", " "),
+            "tags": rng.sample(WORDS, 5),
+            "source_file": f"{name}.md",
+        },
+        "ICOSA_MESH": {"nodes": nodes, "relations": relations, "triads": triads},
+        "DODECA_FIELD": {"resonance_points": points, "pentagonal_fields": fields},
+        "FUSION_SYNTHESIS": {
+            "preamble": paragraph(rng),
+            "mapping": [{"node_id": f"N{i + 1}", "dodeca_field_id": f"D{i + 1}", "note": sentence(rng)}
+                        for i in range(NODES_PER_CODEX)],
+            "compression_commentary": paragraph(rng),
+        },
+    }
+
+
+def generate_corpus(root, fragments=1000, per_file=250, seed=0):
+    """
+    Write <root>/data/raw_md and <root>/data/raw_geometry_json.
+    Returns counts: notebooks, fragments, compasses, bytes.
+    """
+    md_dir = os.path.join(root, "data", "raw_md")
+    geo_dir = os.path.join(root, "data", "raw_geometry_json")
+    os.makedirs(md_dir, exist_ok=True)
+    os.makedirs(geo_dir, exist_ok=True)
+
+    rng = random.Random(seed)
+    n_files = max(1, -(-fragments // per_file))
+    written, total_bytes = 0, 0
+    for i in range(n_files):
+        name = codex_name(i, rng)
+        n = min(per_file, fragments - written)
+        md = notebook(rng, name, n)
+        geo = json.dumps(geometry(rng, name), ensure_ascii=False, indent=2)
+        with open(os.path.join(md_dir, f"{name}.md"), "w", encoding="utf-8") as f:
+            f.write(md)
+        with open(os.path.join(geo_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+            f.write(geo)
+        written += n
+        total_bytes += len(md.encode("utf-8")) + len(geo.encode("utf-8"))
+    return {
+        "notebooks": n_files,
+        "fragments": written,
+        "compasses": n_files * NODES_PER_CODEX,
+        "bytes": total_bytes,
+    }
+
+
+def sample_queries(n, seed=1):
+    """Distinct short queries in the corpus vocabulary."""
+    rng = random.Random(seed)
+    return [f"{' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 7)))} {i}" for i in range(n)]
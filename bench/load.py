@@ -0,0 +1,95 @@
+"""
+bench/load.py
+Query latency under concurrency
+-------------------------------
+`concurrency` client threads issue `requests` queries between them; each
+call is timed individually. Reported in milliseconds.
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def percentiles(samples_ms):
+    if not samples_ms:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    a = np.asarray(samples_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(a, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "mean": round(float(a.mean()), 3),
+        "max": round(float(a.max()), 3),
+    }
+
+def run_load(call, queries, concurrency):
+    """Time call(query) for every query with `concurrency` threads; returns latency stats."""
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(q):
+        nonlocal errors
+        t0 = time.perf_counter()
+        try:
+            call(q)
+            ok = True
+        except Exception:
+            ok = False
+        ms = (time.perf_counter() - t0) * 1000
+        with lock:
+            if ok:
+                latencies.append(ms)
+            else:
+                errors += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, queries))
+    wall = time.perf_counter() - t0
+    return {
+        "concurrency": concurrency,
+        "requests": len(queries),
+        "errors": errors,
+        "throughput_qps": round(len(queries) / wall, 2) if wall > 0 else None,
+        "latency_ms": percentiles(latencies),
+    }
+
+
+# ─────────────────────────────────────────────
+# Targets
+# ─────────────────────────────────────────────
+def bridge_target():
+    from bridge_query import query_bridge
+    return query_bridge
+
+def flask_target():
+    """POST /query through the Flask app in-process (one test client per thread)."""
+    from app.server import app
+    local = threading.local()
+
+    def call(q):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        r = client.post("/query", json={"query": q})
+        if r.status_code != 200:
+            raise RuntimeError(f"/query returned {r.status_code}")
+    return call
+
+def http_target(url):
+    """POST /query against a running server (Flask or api/main.py)."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_maxsize=256))
+    session.mount("https://", HTTPAdapter(pool_maxsize=256))
+    endpoint = url.rstrip("/") + "/query"
+
+    def call(q):
+        r = session.post(endpoint, json={"query": q}, timeout=60)
+        r.raise_for_status()
+    return call
@@ -0,0 +1,79 @@
+"""
+bench/pipeline.py
+Per-stage ingestion throughput
+------------------------------
+Runs stages 1–4 exactly as the CLI would (their own main(), their own
+relative data/ paths) inside a workspace directory, and reports
+records/sec for each. Embedding stages use whatever TEXTURE_EMBEDDER /
+ORIENTATION_EMBEDDER is set to; the bench sets hash stand-ins.
+"""
+
+import os
+import io
+import sys
+import time
+import importlib
+import contextlib
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.append(str(SCRIPTS_DIR))
+
+# the bridge opens both collections through one client (CHROMA_LOCAL_PATH)
+VECTOR_PATH = "data/vectors/local"
+
+
+def count_lines(path):
+    with open(path, "rb") as f:
+        return sum(1 for _ in f)
+
+@contextlib.contextmanager
+def working_dir(path):
+    old = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(old)
+
+def run_main(module_name, argv, quiet=True):
+    """Import a stage script and run its main() with argv; returns wall seconds."""
+    module = importlib.import_module(module_name)
+    if hasattr(module, "LOCAL_VECTOR_PATH"):
+        module.LOCAL_VECTOR_PATH = VECTOR_PATH
+    old_argv = sys.argv
+    sys.argv = [f"{module_name}.py", *argv]
+    sink = io.StringIO() if quiet else None
+    try:
+        with contextlib.redirect_stdout(sink) if quiet else contextlib.nullcontext():
+            t0 = time.perf_counter()
+            module.main()
+            return time.perf_counter() - t0
+    finally:
+        sys.argv = old_argv
+
+
+def stage_result(records, seconds):
+    return {
+        "records": records,
+        "seconds": round(seconds, 4),
+        "records_per_sec": round(records / seconds, 2) if seconds > 0 else None,
+    }
+
+def run_stages(workspace, workers=1, batch_size=64, quiet=True):
+    """Run stages 1–4 in `workspace` (which holds data/raw_md, data/raw_geometry_json)."""
+    results = {}
+    with working_dir(workspace):
+        seconds = run_main("1_md_to_jsonl", ["-q", "-j", str(workers)], quiet)
+        results["1_md_to_jsonl"] = stage_result(count_lines("data/processed/archive.jsonl"), seconds)
+
+        seconds = run_main("2_embed_local", ["--full", "--batch-size", str(batch_size)], quiet)
+        results["2_embed_local"] = stage_result(count_lines("data/processed/fragments.jsonl"), seconds)
+
+        seconds = run_main("3_make_abstracts_dual_geometry", [], quiet)
+        results["3_make_abstracts"] = stage_result(count_lines("data/processed/abstracts.jsonl"), seconds)
+
+        seconds = run_main("4_embed_openai_abstracts", ["--full"], quiet)
+        results["4_embed_abstracts"] = stage_result(count_lines("data/processed/abstracts.jsonl"), seconds)
+    return results
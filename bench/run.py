@@ -0,0 +1,156 @@
+"""
+bench/run.py
+MindField benchmark runner
+--------------------------
+  python -m bench.run --fragments 10000 --concurrency 1,8,32 --out bench.json
+
+1. generates a synthetic corpus in a scratch workspace
+2. runs ingestion stages 1–4 and records records/sec per stage
+3. fires queries at query_bridge and /query at each concurrency level
+
+Prints (or writes) one JSON document, so runs on different commits can be
+diffed or compared by a script. Hash embedders are used by default, which
+keeps the run offline and deterministic; pass real specs (st:…, openai:…)
+to measure the production models instead.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import contextlib
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+def configure_env(args, workspace):
+    """Point every stage and the bridge at the workspace; must run before they are imported."""
+    os.environ.update({
+        "CHROMA_MODE": "local",
+        "CHROMA_LOCAL_PATH": os.path.join(workspace, "data", "vectors", "local"),
+        "CHROMA_COLLECTION_TEXTURE": "mindfield_fragments",
+        "CHROMA_COLLECTION_ORIENTATION": "mindfield_compasses_large_v2",
+        "BRIDGE_BACKEND": "chroma",
+        "TEXTURE_EMBEDDER": args.texture_embedder,
+        "ORIENTATION_EMBEDDER": args.orientation_embedder,
+        "CONSTELLATION_DIR": os.path.join(workspace, "data", "vectors", "constellation"),
+        "SHARD_DIR": os.path.join(workspace, "data", "vectors", "shards"),
+        "TEXTURE_SHARDS": str(args.shards),
+        "LEXICAL_INDEX_DIR": os.path.join(workspace, "data", "index"),
+        "EMBED_CACHE_PATH": "",
+        "OPENAI_EMBED_CACHE": "",
+        "BRIDGE_RESULT_CACHE": os.environ.get("BRIDGE_RESULT_CACHE", "1024") if args.cache else "0",
+    })
+
+def collect(args, ap, workspace, report):
+    """Fill report with corpus, stage and query measurements."""
+    from bench.corpus import generate_corpus, sample_queries
+    from bench.pipeline import run_stages
+    from bench.load import run_load, bridge_target, flask_target, http_target
+
+    if not args.skip_ingest:
+        print(f"🧪 gerando corpus sintético ({args.fragments} fragmentos) em {workspace}")
+        t0 = time.perf_counter()
+        corpus = generate_corpus(workspace, args.fragments, args.per_file, args.seed)
+        corpus["seconds"] = round(time.perf_counter() - t0, 4)
+        report["corpus"] = corpus
+
+        print("⚙️  stages 1–4 ...")
+        report["stages"] = run_stages(workspace, args.workers, args.batch_size, quiet=not args.verbose)
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    targets = {}
+    for name in [t.strip() for t in args.targets.split(",") if t.strip()]:
+        if name == "bridge":
+            targets["query_bridge"] = bridge_target()
+        elif name == "flask":
+            targets["/query"] = flask_target()
+        else:
+            ap.error(f"unknown target {name!r}")
+    if args.url:
+        targets[f"{args.url.rstrip('/')}/query"] = http_target(args.url)
+
+    report["query"] = {}
+    for i, (name, call) in enumerate(targets.items()):
+        call(sample_queries(1, seed=999)[0])  # connect + warm before timing
+        runs = []
+        for level in levels:
+            print(f"🔎 {name} @ {level} threads ...")
+            queries = sample_queries(args.requests, seed=(i + 1) * 1000 + level)
+            runs.append(run_load(call, queries, level))
+        report["query"][name] = runs
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark ingestion throughput and query latency.")
+    ap.add_argument("--fragments", type=int, default=1000, help="synthetic archive size (1k–1M)")
+    ap.add_argument("--per-file", type=int, default=250, help="fragments per synthetic notebook")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=1, help="stage 1 parser processes")
+    ap.add_argument("--batch-size", type=int, default=64, help="stage 2 encode/write batch")
+    ap.add_argument("--shards", type=int, default=int(os.getenv("TEXTURE_SHARDS", "1")),
+                    help="texture shards built and searched in parallel (see scripts/shards.py)")
+    ap.add_argument("--concurrency", default="1,8,32", help="comma-separated client thread counts")
+    ap.add_argument("--requests", type=int, default=200, help="queries per concurrency level")
+    ap.add_argument("--targets", default="bridge,flask",
+                    help="comma-separated: bridge (query_bridge), flask (/query in-process)")
+    ap.add_argument("--url", default=None, help="also load a running server's /query at this base URL")
+    ap.add_argument("--texture-embedder", default="hash:384")
+    ap.add_argument("--orientation-embedder", default="hash:256")
+    ap.add_argument("--cache", action="store_true",
+                    help="keep the bridge result cache on (queries are distinct either way)")
+    ap.add_argument("--workspace", default=None, help="scratch directory (default: a new temp dir)")
+    ap.add_argument("--keep", action="store_true", help="keep the workspace afterwards")
+    ap.add_argument("--skip-ingest", action="store_true", help="reuse an already ingested --workspace")
+    ap.add_argument("--verbose", action="store_true", help="show the stages' own output")
+    ap.add_argument("--out", default=None, help="write JSON here instead of stdout")
+    args = ap.parse_args()
+
+    workspace = os.path.abspath(args.workspace or tempfile.mkdtemp(prefix="mindfield-bench-"))
+    os.makedirs(workspace, exist_ok=True)
+    configure_env(args, workspace)
+    sys.path.insert(0, str(REPO_DIR))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "texture_embedder": args.texture_embedder,
+            "orientation_embedder": args.orientation_embedder,
+            "result_cache": args.cache,
+        },
+    }
+    # the bridge and stages print progress; keep stdout for the JSON report
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            collect(args, ap, workspace, report)
+    finally:
+        if not args.keep and not args.workspace:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+        print(f"[OK] resultados em {args.out}", file=sys.stderr)
+    else:
+        print(payload)
+
+if __name__ == "__main__":
+    main()
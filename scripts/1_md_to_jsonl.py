@@ -1,10 +1,26 @@
-import os, re, json, hashlib, yaml
+import os, re, json, hashlib, argparse, yaml
+from concurrent.futures import ProcessPoolExecutor
+from ingest_manifest import file_hash, short_hash, load_manifest, save_manifest
+from telemetry import span, summary
+from lexical_index import build_index, fragment_records
+from dedup_fragments import FRAGMENTS_PATH, dedup_archive
 
 RAW_DIR = "data/raw_md"
 OUT_PATH = "data/processed/archive.jsonl"
+MANIFEST_PATH = "data/processed/manifest.json"
 
 MD_RE_TITLE = re.compile(r'^\s*#\s+(.+)', re.MULTILINE)
 
+# compiled once per process; strip_markdown / split_paragraphs run per file
+MD_RE_FENCE = re.compile(r'```.*?```', re.S)
+MD_RE_CODE = re.compile(r'`[^`]+`')
+MD_RE_LINK = re.compile(r'\[([^\]]+)\]\([^)]+\)')
+MD_RE_HEADING = re.compile(r'^\s*#{1,6}\s*', re.M)
+MD_RE_SYMBOLS = re.compile(r'[*_~>`#-]+')
+MD_RE_SPACE = re.compile(r'\s+')
+# split after periods that are followed by capital letters or new sentences
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z(“"])')
+
 def read_md_with_frontmatter(path):
     text = open(path, 'r', encoding='utf-8').read()
     meta = {}
@@ -20,12 +36,12 @@ def read_md_with_frontmatter(path):
     return meta, content
 
 def strip_markdown(md):
-    md = re.sub(r'```.*?```', '', md, flags=re.S)
-    md = re.sub(r'`[^`]+`', '', md)
-    md = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', md)
-    md = re.sub(r'^\s*#{1,6}\s*', '', md, flags=re.M)
-    md = re.sub(r'[*_~>`#-]+', ' ', md)
-    md = re.sub(r'\s+', ' ', md).strip()
+    md = MD_RE_FENCE.sub('', md)
+    md = MD_RE_CODE.sub('', md)
+    md = MD_RE_LINK.sub(r'\1', md)
+    md = MD_RE_HEADING.sub('', md)
+    md = MD_RE_SYMBOLS.sub(' ', md)
+    md = MD_RE_SPACE.sub(' ', md).strip()
     return md
 
 def first_heading(md):
@@ -50,9 +66,7 @@ def make_id(codex_id, relpath, title, seg):
     base = f"{codex_id}/{relpath}/{title}/{seg}"
     return hashlib.sha1(base.encode('utf-8')).hexdigest()[:16]
 
-def split_paragraphs(text, filename=None):
-    import re, os
-
+def split_paragraphs(text, filename=None, verbose=True):
     # normalize endings
     text = text.replace('\r\n', '\n').replace('\r', '\n').strip()
 
@@ -73,8 +87,7 @@ def split_paragraphs(text, filename=None):
     # now, further segment long combined paragraphs into sub-blocks by sentence clusters
     paras = []
     for c in combined:
-        # split after periods that are followed by capital letters or new sentences
-        splits = re.split(r'(?<=[.!?])\s+(?=[A-Z(“"])', c)
+        splits = SENTENCE_RE.split(c)
         # group every 3–4 sentences together to preserve flow
         buf, count = [], 0
         for s in splits:
@@ -91,52 +104,155 @@ def split_paragraphs(text, filename=None):
     if not paras:
         paras = [text]
 
-    file_label = os.path.basename(filename) if filename else "<text>"
-    print(f"   ↳ {len(paras)} segmentos extraídos de {file_label}")
+    if verbose:
+        file_label = os.path.basename(filename) if filename else "<text>"
+        print(f"   ↳ {len(paras)} segmentos extraídos de {file_label}")
     return paras
 
+def build_records(full, rel, fn, verbose=True):
+    """Parse one Markdown file into its fragment records."""
+    meta, md = read_md_with_frontmatter(full)
+    codex_id, category, num, slug, codex_title = parse_codex_id(fn)
+    title = meta.get('title') or first_heading(md) or codex_title
+    tags = meta.get('tags') or meta.get('keywords') or []
+    mood = meta.get('mood')
+    voice = meta.get('voice')
+    lang = meta.get('language')
+    notes = meta.get('notes')
+    plain = strip_markdown(md)
+
+    docs = []
+    paragraphs = split_paragraphs(plain, filename=fn, verbose=verbose)
+    for seg, para in enumerate(paragraphs):
+        docs.append({
+            "id": make_id(codex_id, rel, title, seg),
+            "codex_id": codex_id,
+            "category": category,
+            "index": num,
+            "slug": slug,
+            "codex_title": codex_title,
+            "title": title,
+            "segment": seg,
+            "content": para,
+            "content_hash": short_hash(para),
+            "epoch": "atemporal",
+            "tags": tags,
+            "mood": mood,
+            "voice": voice,
+            "language": lang,
+            "notes": notes
+        })
+    return docs
+
+def load_previous_records(path):
+    """Index the last archive by id so unchanged files can be copied through."""
+    records = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                doc = json.loads(line)
+                records[doc["id"]] = doc
+    return records
+
+def reuse_records(entry, fhash, previous):
+    """Return the previous records of a file whose bytes have not changed."""
+    if not entry or entry.get("hash") != fhash:
+        return None
+    docs = [previous.get(i) for i in entry.get("segments", {})]
+    if not docs or any(d is None for d in docs):
+        return None
+    return docs
+
+def list_sources():
+    """All Markdown files under RAW_DIR, in deterministic (path-sorted) order."""
+    sources = []
+    for root, dirs, filenames in os.walk(RAW_DIR):
+        dirs.sort()
+        for fn in sorted(filenames):
+            if fn.lower().endswith('.md'):
+                full = os.path.join(root, fn)
+                sources.append((full, os.path.relpath(full, RAW_DIR), fn))
+    return sources
+
+def _parse_job(job):
+    full, rel, fn, verbose = job
+    return build_records(full, rel, fn, verbose=verbose)
+
+def parse_changed(jobs, workers):
+    """Yield parsed records per job, in job order; fans out to a process pool if workers > 1."""
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield _parse_job(job)
+        return
+    chunksize = max(1, len(jobs) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_parse_job, jobs, chunksize=chunksize)
+
 def main():
+    ap = argparse.ArgumentParser(description="Convert Markdown notebooks into archive.jsonl fragments.")
+    ap.add_argument("-j", "--workers", type=int, default=1,
+                    help="parser processes (0 = one per core; default 1)")
+    ap.add_argument("-q", "--quiet", action="store_true", help="no per-file output")
+    ap.add_argument("--progress", action="store_true", help="show a progress bar (implies --quiet)")
+    args = ap.parse_args()
+    workers = args.workers or os.cpu_count() or 1
+    verbose = not (args.quiet or args.progress)
+
     os.makedirs(os.path.dirname(OUT_PATH), exist_ok=True)
-    count = 0
-    with open(OUT_PATH, 'w', encoding='utf-8') as out:
-        for root, _, files in os.walk(RAW_DIR):
-            for fn in sorted(files):
-                if not fn.lower().endswith('.md'):
-                    continue
-                full = os.path.join(root, fn)
-                rel = os.path.relpath(full, RAW_DIR)
-                meta, md = read_md_with_frontmatter(full)
-                codex_id, category, num, slug, codex_title = parse_codex_id(fn)
-                title = meta.get('title') or first_heading(md) or codex_title
-                tags = meta.get('tags') or meta.get('keywords') or []
-                mood = meta.get('mood')
-                voice = meta.get('voice')
-                lang = meta.get('language')
-                notes = meta.get('notes')
-                plain = strip_markdown(md)
-
-                paragraphs = split_paragraphs(plain, filename=fn)
-                for seg, para in enumerate(paragraphs):
-                    doc = {
-                        "id": make_id(codex_id, rel, title, seg),
-                        "codex_id": codex_id,
-                        "category": category,
-                        "index": num,
-                        "slug": slug,
-                        "codex_title": codex_title,
-                        "title": title,
-                        "segment": seg,
-                        "content": para,
-                        "epoch": "atemporal",
-                        "tags": tags,
-                        "mood": mood,
-                        "voice": voice,
-                        "language": lang,
-                        "notes": notes
-                    }
+    old_files = load_manifest(MANIFEST_PATH).get("files", {})
+    previous = load_previous_records(OUT_PATH) if old_files else {}
+    files = {}
+    count, unchanged, changed = 0, 0, 0
+
+    # hash every source up front; only changed files are parsed
+    sources = []
+    with span("hash"):
+        for full, rel, fn in list_sources():
+            fhash = file_hash(full)
+            sources.append((full, rel, fn, fhash, reuse_records(old_files.get(rel), fhash, previous)))
+    jobs = [(full, rel, fn, verbose) for full, rel, fn, _, docs in sources if docs is None]
+    parsed = parse_changed(jobs, workers)
+
+    bar = None
+    if args.progress:
+        from tqdm import tqdm
+        bar = tqdm(total=len(sources), unit="file")
+
+    tmp_path = OUT_PATH + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        for full, rel, fn, fhash, docs in sources:
+            if docs is None:
+                with span("parse"):
+                    docs = next(parsed)  # pool results arrive in submission order
+                changed += 1
+            else:
+                unchanged += 1
+
+            with span("write"):
+                for doc in docs:
                     out.write(json.dumps(doc, ensure_ascii=False) + "\n")
                     count += 1
+            files[rel] = {
+                "hash": fhash,
+                "segments": {d["id"]: d["content_hash"] for d in docs},
+            }
+            if bar is not None:
+                bar.update(1)
+    if bar is not None:
+        bar.close()
+    os.replace(tmp_path, OUT_PATH)
+    save_manifest(MANIFEST_PATH, {"files": files})
+
+    removed = len(set(old_files) - set(files))
+    with span("dedup"):
+        _, kept, collapsed = dedup_archive(OUT_PATH, FRAGMENTS_PATH)
+    with span("lexical_index"):
+        index_path, _, n_terms = build_index("fragments", fragment_records(FRAGMENTS_PATH))
     print(f"[OK] Gerado {OUT_PATH} com {count} fragmentos atemporais.")
+    print(f"     {changed} arquivos novos/alterados, {unchanged} inalterados, {removed} removidos.")
+    print(f"     {FRAGMENTS_PATH}: {kept} canônicos, {collapsed} quase-duplicados colapsados.")
+    print(f"     Índice BM25 {index_path}: {n_terms} termos.")
+    print(summary())
 
 if __name__ == "__main__":
     main()
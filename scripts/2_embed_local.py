@@ -1,7 +1,15 @@
 # scripts/2_embed_local.py
-import os, time, json, chromadb
-from sentence_transformers import SentenceTransformer
+import os, time, json, queue, argparse, threading, chromadb
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
+from embedders import get_embedder, open_geometry_collection
+from vector_backends import bump_version
+from ingest_manifest import fingerprint, vector_part, short_hash, load_manifest, save_manifest
+from telemetry import span, summary
+from lexical_index import tag_list
+from dedup_fragments import format_alternates
+from shards import TEXTURE_COLLECTION, TEXTURE_SHARDS, shard_of, shard_name, shard_path
 
 load_dotenv()
 
@@ -11,10 +19,13 @@ CHROMA_URL        = os.getenv("CHROMA_URL", "https://api.trychroma.com")
 CHROMA_API_KEY    = os.getenv("CHROMA_API_KEY")
 CHROMA_DB_NAME    = os.getenv("CHROMA_DB_NAME", "mindfield")
 CHROMA_TENANT     = os.getenv("CHROMA_TENANT", "default_tenant") # <-- ADDED
-COLLECTION_NAME   = "mindfield_fragments"
-DATA_PATH         = "data/processed/archive.jsonl"
+COLLECTION_NAME   = TEXTURE_COLLECTION  # CHROMA_COLLECTION_TEXTURE, the one the bridge searches
+DATA_PATH         = "data/processed/fragments.jsonl"  # archive.jsonl after dedup_fragments.py
 LOCAL_VECTOR_PATH = "data/vectors/local"
 MODEL_NAME        = "BAAI/bge-large-en-v1.5"
+EMBEDDER_SPEC     = os.getenv("TEXTURE_EMBEDDER", f"st:{MODEL_NAME}")  # hash:<dim> runs offline
+MANIFEST_PATH     = f"data/processed/embedded_{COLLECTION_NAME}.json"
+BATCH_SIZE        = 64
 
 # ── CLIENT SETUP ───────────────────────────────────────────────────────────
 def get_chroma_client():
@@ -33,48 +44,279 @@ def get_chroma_client():
         print("💽  Using local Chroma storage...")
         return chromadb.PersistentClient(path=LOCAL_VECTOR_PATH)
 
-# ── MAIN INGESTION ─────────────────────────────────────────────────────────
-def main():
-    start = time.time()
-    model = SentenceTransformer(MODEL_NAME)
-    db = get_chroma_client()
+# ── MANIFEST ───────────────────────────────────────────────────────────────
+def fragment_meta(d):
+    meta = {
+        "title": d.get("title"),
+        "codex_id": d.get("codex_id"),
+        "segment": d.get("segment"),
+        "category": d.get("category"),
+        "slug": d.get("slug"),
+        # Chroma metadata values are scalars, so tags are stored joined
+        "tags": ",".join(tag_list(d.get("tags"))),
+    }
+    if d.get("alternates"):
+        # near-duplicates collapsed into this fragment (dedup_fragments.py)
+        meta["alternates"] = format_alternates(d["alternates"])
+    return meta
+
+def embedder_key(dim=None):
+    """What the vector half of a fingerprint covers besides the text: model and stored dimension."""
+    return f"{EMBEDDER_SPEC}@{dim}" if dim else EMBEDDER_SPEC
+
+def fragment_fingerprint(d, meta, dim=None):
+    return fingerprint(d.get("content_hash") or short_hash(d["content"]), meta, embedder_key(dim))
+
+def plan_changes(docs, manifest, dim=None):
+    """
+    Split the archive into segments to (re-)embed, segments whose metadata
+    alone changed (e.g. their alternates) and ids to delete.
+    """
+    current, todo, updates = {}, [], []
+    for d in docs:
+        meta = fragment_meta(d)
+        fp = fragment_fingerprint(d, meta, dim)
+        if d["id"] in current:
+            continue  # duplicate id in the archive: first occurrence wins
+        current[d["id"]] = fp
+        stored = manifest.get(d["id"])
+        if vector_part(stored) != vector_part(fp):
+            todo.append((d, meta, fp))
+        elif stored != fp:
+            updates.append((d, meta, fp))
+    stale = [i for i in manifest if i not in current]
+    return todo, updates, stale
+
+def update_metadata(coll, manifest, items):
+    """Write new metadata for already-embedded segments, without re-encoding them."""
+    for i in range(0, len(items), BATCH_SIZE):
+        chunk = items[i:i + BATCH_SIZE]
+        with span("update"):
+            coll.update(ids=[d["id"] for d, _, _ in chunk], metadatas=[meta for _, meta, _ in chunk])
+        for d, _, fp in chunk:
+            manifest[d["id"]] = fp
+
+# ── ENCODE / WRITE PIPELINE ────────────────────────────────────────────────
+def token_lengths(model, texts):
+    """Token count per text (falls back to word count without a tokenizer)."""
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None:
+        return [len(t.split()) for t in texts]
+    return [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+def length_bucketed(todo, lengths, batch_size):
+    """Batches of similar token length, so short fragments are not padded to long ones."""
+    order = sorted(range(len(todo)), key=lambda i: lengths[i])
+    return [[todo[i] for i in order[s:s + batch_size]] for s in range(0, len(order), batch_size)]
+
+class CollectionWriter(threading.Thread):
+    """
+    Consumes encoded batches from a bounded queue and upserts them while the
+    next batch encodes. A batch put with embs=None is a metadata-only update.
+    """
+
+    def __init__(self, coll, manifest, depth, manifest_path=MANIFEST_PATH):
+        super().__init__(name="chroma-writer", daemon=True)
+        self.coll = coll
+        self.manifest = manifest
+        self.manifest_path = manifest_path
+        self.queue = queue.Queue(maxsize=depth)
+        self.error = None
+        self.written = 0
+        self.write_seconds = 0.0
+
+    def run(self):
+        batches = 0
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            if self.error is not None:
+                self.queue.task_done()
+                continue  # drain so the producer never blocks on a dead writer
+            batch, embs = item
+            try:
+                if embs is None:
+                    update_metadata(self.coll, self.manifest, batch)
+                    continue
+                t0 = time.perf_counter()
+                with span("upsert"):
+                    self.coll.upsert(
+                        ids=[d["id"] for d, _, _ in batch],
+                        embeddings=embs,
+                        metadatas=[meta for _, meta, _ in batch],
+                        documents=[d["content"] for d, _, _ in batch],
+                    )
+                self.write_seconds += time.perf_counter() - t0
+                for d, _, fp in batch:
+                    self.manifest[d["id"]] = fp
+                self.written += len(batch)
+                batches += 1
+                print(f"   ↳ {self.written} fragmentos indexados...")
+                if batches % 20 == 0:
+                    save_manifest(self.manifest_path, self.manifest)
+            except Exception as e:
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def put(self, batch, embs):
+        if self.error is not None:
+            raise self.error
+        self.queue.put((batch, embs))
+
+    def flush(self):
+        """Block until every queued batch is written, so the manifest matches the collection."""
+        self.queue.join()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        self.queue.put(None)
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+def load_model(label=""):
+    if EMBEDDER_SPEC.startswith("st:"):
+        # imported lazily: an edit-only rebuild with nothing to embed skips torch entirely
+        from sentence_transformers import SentenceTransformer
+        print(f"🧭 {label}carregando modelo {EMBEDDER_SPEC[3:]} ...")
+        return SentenceTransformer(EMBEDDER_SPEC[3:])
+    print(f"🧭 {label}usando embedder {EMBEDDER_SPEC} ...")
+    return get_embedder(EMBEDDER_SPEC)
+
+def encode(model, texts, batch_size, pool=None, dim=None):
+    """Unit embeddings for one batch, truncated to dim (and renormalized) if set."""
+    with span("encode"):
+        if pool is not None:
+            embs = model.encode_multi_process(texts, pool, batch_size=batch_size, normalize_embeddings=True)
+        else:
+            embs = model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+        if dim:
+            embs = embs[:, :dim]
+            embs = embs / np.linalg.norm(embs, axis=1, keepdims=True)
+    return embs
+
+def embed_and_write(model, coll, manifest, todo, batch_size, queue_depth, processes, dim=None,
+                    manifest_path=MANIFEST_PATH):
+    """Encode length-bucketed batches, overlapping each encode with the previous write."""
+    texts = [d["content"] for d, _, _ in todo]
+    batches = length_bucketed(todo, token_lengths(model, texts), batch_size)
 
+    pool = None
+    if processes > 1:
+        pool = model.start_multi_process_pool(target_devices=["cpu"] * processes)
+
+    writer = CollectionWriter(coll, manifest, queue_depth, manifest_path)
+    writer.start()
+    encode_seconds = 0.0
     try:
-        coll = db.get_collection(COLLECTION_NAME)
-    except Exception:
-        print(f"🗃️  Creating new collection: {COLLECTION_NAME}")
-        coll = db.create_collection(COLLECTION_NAME)
+        for batch in batches:
+            texts = [d["content"] for d, _, _ in batch]
+            t0 = time.perf_counter()
+            embs = encode(model, texts, batch_size, pool, dim)
+            encode_seconds += time.perf_counter() - t0
+            writer.put(batch, embs.tolist())
+    finally:
+        writer.close()
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+    return encode_seconds, writer.write_seconds
+
+# ── INGESTION (one collection or one shard) ───────────────────────────────
+def ingest(db, name, manifest_path, docs, args, label=""):
+    """Bring one collection in line with docs; returns (embedded, removed)."""
+    # records the geometry so the bridge embeds queries with the same model
+    coll = open_geometry_collection(db, name, EMBEDDER_SPEC, args.dim, rebuild=args.full)
+
+    # an empty collection means the manifest no longer describes it
+    manifest = {} if args.full or coll.count() == 0 else load_manifest(manifest_path)
+
+    with span("plan"):
+        todo, updates, stale = plan_changes(docs, manifest, args.dim)
+    print(f"🧾 {label}{len(docs)} fragmentos: {len(todo)} novos/alterados, {len(updates)} só metadados, "
+          f"{len(stale)} removidos, {len(docs) - len(todo) - len(updates)} inalterados.")
+
+    for i in range(0, len(stale), BATCH_SIZE):
+        chunk = stale[i:i + BATCH_SIZE]
+        with span("delete"):
+            coll.delete(ids=chunk)
+        for doc_id in chunk:
+            manifest.pop(doc_id, None)
+
+    update_metadata(coll, manifest, updates)
+
+    if todo:
+        model = load_model(label)
+        t0 = time.perf_counter()
+        encode_s, write_s = embed_and_write(
+            model, coll, manifest, todo, args.batch_size, args.queue_depth, args.processes, args.dim,
+            manifest_path,
+        )
+        wall = time.perf_counter() - t0
+        print(f"\n⚡ {label}{len(todo) / wall:.1f} docs/s  (encode {encode_s:.1f}s, "
+              f"write {write_s:.1f}s, wall {wall:.1f}s, batch {args.batch_size})")
+
+    save_manifest(manifest_path, manifest)
+    if todo or updates or stale:
+        bump_version(coll)  # invalidates bridge result caches keyed on the old version
+    return len(todo), len(stale)
 
-    print(f"🧭 carregando modelo {MODEL_NAME} ...")
-    with open(DATA_PATH, "r") as f:
+def ingest_shard(job):
+    """Process-pool entry: build shard i of n in its own store (local) or collection (cloud)."""
+    i, n_shards, docs, args = job
+    name = shard_name(COLLECTION_NAME, i, n_shards)
+    if CHROMA_MODE == "local":
+        db = chromadb.PersistentClient(path=shard_path(COLLECTION_NAME, i, n_shards))
+    else:
+        db = get_chroma_client()
+    counts = ingest(db, name, f"data/processed/embedded_{name}.json", docs, args, label=f"[{name}] ")
+    print(summary(f"⏱️  [{name}]"))
+    return counts
+
+# ── MAIN INGESTION ─────────────────────────────────────────────────────────
+def main():
+    ap = argparse.ArgumentParser(description="Embed archive fragments into Chroma (incremental).")
+    ap.add_argument("--full", action="store_true", help="ignore the manifest and re-embed everything")
+    ap.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="fragments per encode/write batch")
+    ap.add_argument("--queue-depth", type=int, default=4, help="encoded batches waiting to be written")
+    ap.add_argument("--dim", type=int, default=None,
+                    help="store vectors truncated to this many leading dimensions (renormalized)")
+    ap.add_argument("--processes", type=int, default=1,
+                    help="encode with a sentence-transformers multi-process pool of this size")
+    ap.add_argument("--shards", type=int, default=TEXTURE_SHARDS,
+                    help="split fragments across N collections by codex_id hash (see shards.py)")
+    ap.add_argument("--shard-workers", type=int, default=0,
+                    help="shards built at once, one process each (0 = min(shards, cores))")
+    args = ap.parse_args()
+
+    start = time.time()
+    with span("load"), open(DATA_PATH, "r") as f:
         docs = [json.loads(line) for line in f]
 
-    ids, texts, metas = [], [], []
-    for i, d in enumerate(docs):
-        ids.append(d["id"])
-        texts.append(d["content"])
-        metas.append({
-            "title": d.get("title"),
-            "codex_id": d.get("codex_id"),
-            "segment": d.get("segment"),
-            "category": d.get("category"),
-            "slug": d.get("slug"),
-        })
-        if (i + 1) % 64 == 0:
-            embs = model.encode(texts, normalize_embeddings=True).tolist()
-            coll.add(ids=ids, embeddings=embs, metadatas=metas, documents=texts)
-            print(f"   ↳ {i+1} fragmentos indexados...")
-            ids, texts, metas = [], [], []
-
-    if texts:
-        embs = model.encode(texts, normalize_embeddings=True).tolist()
-        coll.add(ids=ids, embeddings=embs, metadatas=metas, documents=texts)
-
-    print(f"\n[OK] Indexados {len(docs)} fragmentos em {round((time.time()-start)/60,1)} min.")
+    if args.shards > 1:
+        groups = [[] for _ in range(args.shards)]
+        for d in docs:
+            groups[shard_of(d.get("codex_id") or d["id"], args.shards)].append(d)
+        workers = args.shard_workers or min(args.shards, os.cpu_count() or 1)
+        print(f"🧩 {args.shards} shards ({', '.join(str(len(g)) for g in groups)} fragmentos), "
+              f"{workers} em paralelo")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            counts = list(pool.map(ingest_shard, [(i, args.shards, g, args) for i, g in enumerate(groups)]))
+        embedded = sum(c[0] for c in counts)
+        location = os.path.join(os.path.dirname(shard_path(COLLECTION_NAME, 0, args.shards)), "")
+    else:
+        embedded, _ = ingest(get_chroma_client(), COLLECTION_NAME, MANIFEST_PATH, docs, args)
+        location = LOCAL_VECTOR_PATH
+
+    print(f"\n[OK] Indexados {embedded} fragmentos em {round((time.time()-start)/60,1)} min.")
+    print(summary())
     if CHROMA_MODE == "local":
-        print(f"Base vetorial salva em {LOCAL_VECTOR_PATH}")
+        print(f"Base vetorial salva em {location}")
     else:
         print(f"☁️  Upload concluído na base '{CHROMA_DB_NAME}'.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,4 +1,6 @@
 import os, json, re
+from telemetry import span, summary
+from lexical_index import build_index, compass_records
 
 RAW_JSON_DIR = "data/raw_geometry_json"
 OUT_PATH = "data/processed/abstracts.jsonl"
@@ -17,51 +19,59 @@ def fuse_summary(node_label, node_summary, field_label, field_paragraph):
     )
     return re.sub(r"\s+", " ", base).strip()
 
-def main():
-    os.makedirs(os.path.dirname(OUT_PATH), exist_ok=True)
-    count = 0
+def compose_file(full, fn):
+    """Yield the compass records of one geometry file (none if it lacks nodes or fields)."""
+    with open(full, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    meta = data.get("metadata", {})
+    codex_id = meta.get("id") or fn.split(".json")[0]
+    title = meta.get("title", codex_id)
+
+    nodes = data.get("ICOSA_MESH", {}).get("nodes", [])
+    fields = data.get("DODECA_FIELD", {}).get("pentagonal_fields", [])
+    if not nodes or not fields:
+        return
 
-    with open(OUT_PATH, "w", encoding="utf-8") as out:
-        for fn in sorted(os.listdir(RAW_JSON_DIR)):
-            if not fn.endswith(".json"):
-                continue
+    for i, node in enumerate(nodes):
+        node_label = clean(node.get("label") or f"Node {i+1}")
+        node_summary = clean(node.get("summary") or node.get("reflection") or "")
+        field = fields[i % len(fields)]
+        field_label = clean(field.get("label") or f"Field {i%len(fields)+1}")
+        field_paragraph = clean(field.get("paragraph", ""))
 
-            full = os.path.join(RAW_JSON_DIR, fn)
-            data = json.load(open(full, "r", encoding="utf-8"))
-            meta = data.get("metadata", {})
-            codex_id = meta.get("id") or fn.split(".json")[0]
-            title = meta.get("title", codex_id)
+        synthesis = fuse_summary(node_label, node_summary, field_label, field_paragraph)
 
-            nodes = data.get("ICOSA_MESH", {}).get("nodes", [])
-            fields = data.get("DODECA_FIELD", {}).get("pentagonal_fields", [])
-            if not nodes or not fields:
-                continue
+        yield {
+            "codex_id": codex_id,
+            "node_index": i + 1,
+            "node_label": node_label,
+            "node_summary": node_summary,
+            "field_index": (i % len(fields)) + 1,
+            "field_label": field_label,
+            "field_paragraph": field_paragraph,
+            "summary": synthesis,
+            "geometry_pair": "icosa↔dodeca",
+            "source": title
+        }
 
-            for i, node in enumerate(nodes):
-                node_label = clean(node.get("label") or f"Node {i+1}")
-                node_summary = clean(node.get("summary") or node.get("reflection") or "")
-                field = fields[i % len(fields)]
-                field_label = clean(field.get("label") or f"Field {i%len(fields)+1}")
-                field_paragraph = clean(field.get("paragraph", ""))
+def list_geometry_files():
+    return [(os.path.join(RAW_JSON_DIR, fn), fn) for fn in sorted(os.listdir(RAW_JSON_DIR)) if fn.endswith(".json")]
 
-                synthesis = fuse_summary(node_label, node_summary, field_label, field_paragraph)
+def main():
+    os.makedirs(os.path.dirname(OUT_PATH), exist_ok=True)
+    count = 0
 
-                doc = {
-                    "codex_id": codex_id,
-                    "node_index": i + 1,
-                    "node_label": node_label,
-                    "node_summary": node_summary,
-                    "field_index": (i % len(fields)) + 1,
-                    "field_label": field_label,
-                    "field_paragraph": field_paragraph,
-                    "summary": synthesis,
-                    "geometry_pair": "icosa↔dodeca",
-                    "source": title
-                }
+    with span("compose"), open(OUT_PATH, "w", encoding="utf-8") as out:
+        for full, fn in list_geometry_files():
+            for doc in compose_file(full, fn):
                 out.write(json.dumps(doc, ensure_ascii=False) + "\n")
                 count += 1
 
+    with span("lexical_index"):
+        index_path, _, n_terms = build_index("compasses", compass_records(OUT_PATH))
     print(f"[OK] Generated {count} dual-geometry compasses in {OUT_PATH}")
+    print(f"     BM25 index {index_path}: {n_terms} terms")
+    print(summary())
 
 if __name__ == "__main__":
     main()
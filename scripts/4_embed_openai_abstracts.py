@@ -1,7 +1,10 @@
 # scripts/4_embed_openai_abstracts.py
-import os, time, json, chromadb
-from openai import OpenAI
+import os, time, json, argparse, chromadb
 from dotenv import load_dotenv
+from embedders import get_embedder, open_geometry_collection, TruncatedEmbedder
+from vector_backends import bump_version
+from openai_embeddings import OpenAIEmbeddingClient
+from telemetry import span, summary
 
 load_dotenv()
 
@@ -15,7 +18,11 @@ COLLECTION_NAME   = "mindfield_compasses_large_v2"
 DATA_PATH         = "data/processed/abstracts.jsonl"
 LOCAL_VECTOR_PATH = "data/vectors/abstracts_v2"
 EMBED_MODEL       = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-large")
+EMBEDDER_SPEC     = os.getenv("ORIENTATION_EMBEDDER", f"openai:{EMBED_MODEL}")  # hash:<dim> runs offline
 API_KEY           = os.getenv("OPENAI_API_KEY")
+EMBED_CONCURRENCY = int(os.getenv("OPENAI_EMBED_CONCURRENCY", "4"))
+EMBED_CACHE_PATH  = os.getenv("OPENAI_EMBED_CACHE", "data/cache/openai_embeddings.sqlite")
+WRITE_BATCH       = 1024
 
 # ── CLIENT SETUP ───────────────────────────────────────────────────────────
 def get_chroma_client():
@@ -32,61 +39,84 @@ def get_chroma_client():
         print("💽  Using local Chroma storage...")
         return chromadb.PersistentClient(path=LOCAL_VECTOR_PATH)
 
+def make_embedder(dim=None):
+    if EMBEDDER_SPEC.startswith("openai:"):
+        # text-embedding-3 models are Matryoshka-trained: 'dimensions' truncates server-side
+        return OpenAIEmbeddingClient(
+            EMBEDDER_SPEC[len("openai:"):], api_key=API_KEY, dimensions=dim,
+            concurrency=EMBED_CONCURRENCY, cache_path=EMBED_CACHE_PATH,
+        )
+    embedder = get_embedder(EMBEDDER_SPEC)
+    # other models are truncated (and renormalized) locally, the way the bridge truncates queries
+    return TruncatedEmbedder(embedder, dim) if dim else embedder
+
+def compass_entry(d):
+    """(id, text, metadata) for one abstracts record, or None when it has no summary."""
+    # 1. Create a unique ID since 'id' does not exist
+    doc_id = f"{d.get('codex_id')}_{d.get('node_index')}_{d.get('field_index')}"
+
+    # 2. Use the 'summary' field for text
+    doc_text = d.get("summary")
+
+    # 3. Safety check if 'summary' key is missing
+    if not doc_text:
+        return None
+
+    return doc_id, doc_text, {
+        "codex_id": d.get("codex_id"),
+        "geometry_pair": d.get("geometry_pair"),
+        "node_label": d.get("node_label"),
+        "field_label": d.get("field_label"),
+        "source": d.get("source"),
+    }
+
 # ── MAIN INGESTION ─────────────────────────────────────────────────────────
 def main():
+    ap = argparse.ArgumentParser(description="Embed dual-geometry compasses with OpenAI into Chroma.")
+    ap.add_argument("--dim", type=int, default=None,
+                    help="store shortened embeddings (text-embedding-3 'dimensions'; other models are truncated)")
+    ap.add_argument("--full", action="store_true", help="drop and rebuild the collection if its dimension differs")
+    args = ap.parse_args()
+
     start = time.time()
-    openai_client = OpenAI(api_key=API_KEY)
+    embedder = make_embedder(args.dim)
     db = get_chroma_client()
 
-    try:
-        coll = db.get_collection(COLLECTION_NAME)
-    except Exception:
-        print(f"🗃️  Creating new collection: {COLLECTION_NAME}")
-        coll = db.create_collection(COLLECTION_NAME)
+    # records the geometry so the bridge embeds queries with the same model
+    coll = open_geometry_collection(db, COLLECTION_NAME, EMBEDDER_SPEC, args.dim, rebuild=args.full)
 
-    print(f"🧭 Using OpenAI embedding model: {EMBED_MODEL}")
-    with open(DATA_PATH, "r") as f:
+    print(f"🧭 Using embedding model: {EMBEDDER_SPEC}")
+    with span("load"), open(DATA_PATH, "r") as f:
         docs = [json.loads(line) for line in f]
 
     ids, texts, metas = [], [], []
-    
-    # --- MODIFIED LOOP ---
     for i, d in enumerate(docs):
-        
-        # 1. Create a unique ID since 'id' does not exist
-        doc_id = f"{d.get('codex_id')}_{d.get('node_index')}_{d.get('field_index')}"
-        
-        # 2. Use the 'summary' field for text
-        doc_text = d.get("summary")
-
-        # 3. Safety check if 'summary' key is missing
-        if not doc_text:
+        entry = compass_entry(d)
+        if entry is None:
             print(f"⚠️  Skipping record {i}. Missing 'summary' field.")
             continue
+        ids.append(entry[0])
+        texts.append(entry[1])
+        metas.append(entry[2])
+
+    # the client batches by tokens, runs requests concurrently and skips cached summaries
+    for s in range(0, len(texts), WRITE_BATCH):
+        with span("embed"):
+            embs = embedder.embed(texts[s:s + WRITE_BATCH])
+        with span("upsert"):
+            coll.upsert(ids=ids[s:s + WRITE_BATCH], embeddings=embs,
+                        metadatas=metas[s:s + WRITE_BATCH], documents=texts[s:s + WRITE_BATCH])
+        print(f"   ↳ {min(s + WRITE_BATCH, len(texts))} compasses indexados...")
+
+    if ids:
+        bump_version(coll)  # invalidates bridge result caches keyed on the old version
 
-        ids.append(doc_id)
-        texts.append(doc_text)
-        metas.append({
-            "codex_id": d.get("codex_id"),
-            "geometry_pair": d.get("geometry_pair"),
-            "node_label": d.get("node_label"),
-            "field_label": d.get("field_label"),
-            "source": d.get("source"),
-        })
-        
-        if (i + 1) % 64 == 0:
-            resp = openai_client.embeddings.create(model=EMBED_MODEL, input=texts)
-            embs = [e.embedding for e in resp.data]
-            coll.add(ids=ids, embeddings=embs, metadatas=metas, documents=texts)
-            print(f"   ↳ {i+1} compasses indexados...")
-            ids, texts, metas = [], [], []
-
-    if texts:
-        resp = openai_client.embeddings.create(model=EMBED_MODEL, input=texts)
-        embs = [e.embedding for e in resp.data]
-        coll.add(ids=ids, embeddings=embs, metadatas=metas, documents=texts)
-
-    print(f"\n[OK] Indexed {len(docs)} dual-geometry compasses in {round((time.time()-start)/60,1)} min.")
+    st = getattr(embedder, "stats", None)
+    if st:
+        print(f"   ↳ {st['embedded']} embedded, {st['cache_hits']} from cache, "
+              f"{st['requests']} requests, {st['retries']} retries")
+    print(f"\n[OK] Indexed {len(ids)} dual-geometry compasses in {round((time.time()-start)/60,1)} min.")
+    print(summary())
     if CHROMA_MODE == "local":
         print(f"Collection saved locally at {LOCAL_VECTOR_PATH}")
     else:
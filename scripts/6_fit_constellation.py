@@ -0,0 +1,54 @@
+# scripts/6_fit_constellation.py
+"""
+Fit the 2D constellation projection for each collection (run after stages 2 and 4).
+With TEXTURE_SHARDS > 1 the fragments are read from all shards and fitted
+as one map under the base collection name, the one the bridge looks up.
+
+  python scripts/6_fit_constellation.py
+  python scripts/6_fit_constellation.py --path data/vectors/local --collection mindfield_fragments_v2
+"""
+import argparse, time, chromadb
+import numpy as np
+from dotenv import load_dotenv
+from constellation import CONSTELLATION_DIR, fit_map
+from export_numpy_vault import PIPELINE_COLLECTIONS
+from vector_backends import fetch_collection
+from shards import TEXTURE_COLLECTION, TEXTURE_SHARDS, open_shards
+
+load_dotenv()
+
+def fetch_vectors(path, name):
+    """ids and vectors to project; sharded fragments are gathered from every shard."""
+    if name == TEXTURE_COLLECTION and TEXTURE_SHARDS > 1:
+        ids, vectors = [], []
+        for shard in open_shards(name, TEXTURE_SHARDS, backend="chroma").shards:
+            shard_ids, shard_vectors, _, _ = fetch_collection(shard.collection)
+            if shard_ids:
+                ids.extend(shard_ids)
+                vectors.append(shard_vectors)
+        return ids, np.vstack(vectors) if vectors else np.zeros((0, 0), np.float32)
+    coll = chromadb.PersistentClient(path=path or "data/vectors/local").get_collection(name)
+    ids, vectors, _, _ = fetch_collection(coll)
+    return ids, vectors
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--path", help="Chroma persist directory")
+    ap.add_argument("--collection", help="collection name")
+    ap.add_argument("--out", default=CONSTELLATION_DIR)
+    ap.add_argument("--neighbors", type=int, default=15)
+    ap.add_argument("--min-dist", type=float, default=0.1)
+    args = ap.parse_args()
+
+    targets = [(args.path, args.collection)] if args.collection else PIPELINE_COLLECTIONS
+    for path, name in targets:
+        start = time.time()
+        ids, vectors = fetch_vectors(path, name)
+        if len(ids) < 3:
+            print(f"⚠️  {name}: only {len(ids)} vectors, skipping")
+            continue
+        out = fit_map(name, ids, vectors, args.out, n_neighbors=args.neighbors, min_dist=args.min_dist)
+        print(f"[OK] {name}: {len(ids)} pontos projetados → {out} ({time.time()-start:.1f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -15,16 +15,57 @@ Controlled via .env:
   CHROMA_API_KEY = <your cloud key>
   CHROMA_DB_NAME = <database name>
   CHROMA_TENANT  = <tenant name>
+  BRIDGE_LAYER_TIMEOUT = <seconds per hemisphere, default 10>
+  BRIDGE_BACKEND = chroma | numpy | snapshot   (see vector_backends.py)
+  BRIDGE_SEARCH_MODE = vector | hybrid | lexical   (see lexical_index.py)
+  CHROMA_COLLECTION_TEXTURE = <fragments collection>   (see shards.py)
+  TEXTURE_SHARDS = <N: search N fragment shards in parallel>   (see shards.py)
+
+Queries are embedded with the model that built each collection
+(see embedders.py) rather than Chroma's default embedding function.
+Hits carry precomputed constellation x/y when 6_fit_constellation.py
+has been run (see constellation.py).
+
+Search modes (per engine via BRIDGE_SEARCH_MODE, or per request):
+  vector   embed the query and search the collection
+  hybrid   vector and BM25 candidates fused by reciprocal rank
+  lexical  BM25 only — no embedding call, no resonance scores
+A vector or hybrid layer whose query model is not loaded yet (and whose
+query embedding is not cached), or whose embedding call fails, is answered
+lexically while the model warms in the background, and is listed under
+'lexical_fallback' in the result.
+
+Filters ({"category": "THEORY", "codex_id": "THEORY.003*", "tags": [...]})
+restrict both layers to the matching partitions built at ingestion: the
+vector backend only scans those ids and BM25 only scores those rows, so
+a scoped query costs less than a global one (see lexical_index.py).
 """
 
 import os
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+import numpy as np
 import chromadb
 from chromadb import Client
 from chromadb.config import Settings
+from chromadb.errors import ChromaError
 
 from dotenv import load_dotenv
 load_dotenv()
 
+from embedders import embedder_for
+from vector_backends import BRIDGE_BACKEND, open_backend
+from shards import TEXTURE_COLLECTION, TEXTURE_SHARDS, open_shards
+from constellation import ConstellationMap, place_query
+from embedding_cache import get_embedding_cache, normalize_query
+from result_cache import ResultCache
+from telemetry import span, run_in_context
+from resonance import SCORE_KEYS, score_batch, apply_scores
+from lexical_index import open_index, fuse_results, normalize_filters, RRF_K
+from dedup_fragments import parse_alternates
+
 # ─────────────────────────────────────────────
 # Chroma connection logic
 # ─────────────────────────────────────────────
@@ -45,67 +86,602 @@ def get_chroma_client():
         return chromadb.PersistentClient(path=vector_path)
 
 # ─────────────────────────────────────────────
-# Query function
+# Bridge engine (one per worker process)
 # ─────────────────────────────────────────────
-def query_bridge(query_text: str):
+ORIENTATION_COLLECTION = os.getenv(
+    "CHROMA_COLLECTION_ORIENTATION", "mindfield_compasses_large_v2"
+)
+# seconds each hemisphere may take before the other is returned alone
+BRIDGE_LAYER_TIMEOUT = float(os.getenv("BRIDGE_LAYER_TIMEOUT", "10"))
+BRIDGE_POOL_SIZE = int(os.getenv("BRIDGE_POOL_SIZE", "8"))
+# queries per embedding call / collection.query() in batch mode
+BRIDGE_BATCH_CHUNK = int(os.getenv("BRIDGE_BATCH_CHUNK", "256"))
+# cached /query results per worker (0 disables the cache)
+BRIDGE_RESULT_CACHE = int(os.getenv("BRIDGE_RESULT_CACHE", "1024"))
+# cross-layer scores (see resonance.py); 0 skips them and the embedding fetch
+BRIDGE_RESONANCE = os.getenv("BRIDGE_RESONANCE", "1") != "0"
+BRIDGE_RESONANCE_LINKS = int(os.getenv("BRIDGE_RESONANCE_LINKS", "8"))
+SEARCH_INCLUDE = ["metadatas", "documents", "distances"]
+SEARCH_MODES = ("vector", "hybrid", "lexical")
+BRIDGE_SEARCH_MODE = os.getenv("BRIDGE_SEARCH_MODE", "vector").lower()
+# candidates each ranking contributes to the fusion, per requested hit
+BRIDGE_HYBRID_POOL = int(os.getenv("BRIDGE_HYBRID_POOL", "4"))
+BRIDGE_RRF_K = int(os.getenv("BRIDGE_RRF_K", str(RRF_K)))
+# BM25 index behind each layer (data/index/<name>.bm25.npz)
+LEXICAL_INDEXES = {"orientation": "compasses", "texture": "fragments"}
+
+# what a fresh connection can fix: a dropped cloud connection, a local store
+# locked or replaced underneath us, collections that failed to open
+RECONNECT_ERRORS = (ConnectionError, OSError, sqlite3.Error, ChromaError, RuntimeError)
+
+def reconnectable(e):
+    """True for errors worth one retry on a new connection; a slow backend (timeout) is not one."""
+    return isinstance(e, RECONNECT_ERRORS) and not isinstance(e, (TimeoutError, FutureTimeout))
+
+def resolve_mode(mode=None):
+    mode = (mode or BRIDGE_SEARCH_MODE).lower()
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode {mode!r}; expected one of {', '.join(SEARCH_MODES)}")
+    return mode
+
+
+class SearchPool(ThreadPoolExecutor):
+    """Bridge thread pool that counts threads held by searches whose caller timed out."""
+    stuck = 0
+
+
+class BridgeEngine:
     """
-    Run a dual-geometry query against both vector collections.
-    Returns a structured dict with 'orientation' and 'texture' results.
+    Long-lived handle on the vector backend for both collections.
+    Opens them once per process, shares them across request threads,
+    and reconnects after a failure or in a forked child.
     """
-    client = get_chroma_client()
-
-    # Collections: orientation (theory compasses) + texture (paragraph fragments)
-    orientation_collection_name = os.getenv(
-        "CHROMA_COLLECTION_ORIENTATION", "mindfield_compasses_large_v2"
-    )
-    texture_collection_name = os.getenv(
-        "CHROMA_COLLECTION_TEXTURE", "mindfield_fragments_v2"
-    )
-
-    try:
-        orientation = client.get_collection(orientation_collection_name)
-        texture = client.get_collection(texture_collection_name)
-    except Exception as e:
-        raise RuntimeError(f"Failed to load collections: {e}")
-
-    # ── Orientation layer query ──
-    orient_results = orientation.query(
-        query_texts=[query_text],
-        n_results=5,
-    )
-
-    orientation_hits = []
+
+    def __init__(self, orientation_name=ORIENTATION_COLLECTION,
+                 texture_name=TEXTURE_COLLECTION, client_factory=get_chroma_client,
+                 backend=BRIDGE_BACKEND):
+        self.orientation_name = orientation_name
+        self.backend = backend
+        self.texture_name = texture_name
+        self._client_factory = client_factory
+        self._lock = threading.RLock()
+        self._client = None
+        self._orientation = None
+        self._texture = None
+        self._embedders = None
+        self._maps = (None, None)
+        self._pid = None
+        self._executor = None
+        self._executor_pid = None
+        self._retired_stuck = 0
+        self._warming = set()
+        self.results = ResultCache(BRIDGE_RESULT_CACHE) if BRIDGE_RESULT_CACHE > 0 else None
+
+    def connect(self):
+        """Open the client and both collection handles if not already open."""
+        with self._lock:
+            if self._orientation is not None and self._pid == os.getpid():
+                if not (self._orientation.stale() or self._texture.stale()):
+                    return self._orientation, self._texture
+                # a new snapshot was swapped in; in-flight queries keep the old handles
+                print("🔄  Vector data replaced on disk, reopening collections")
+            with span("connect"):
+                client = self._client_factory() if self.backend == "chroma" else None
+                try:
+                    orientation = open_backend(self.orientation_name, client, self.backend)
+                    if TEXTURE_SHARDS > 1:
+                        texture = open_shards(self.texture_name, TEXTURE_SHARDS, client, self.backend)
+                    else:
+                        texture = open_backend(self.texture_name, client, self.backend)
+                except Exception as e:
+                    raise RuntimeError(f"Failed to load collections: {e}")
+                self._client, self._orientation, self._texture = client, orientation, texture
+                self._embedders = (
+                    embedder_for("orientation", orientation),
+                    embedder_for("texture", texture),
+                )
+                self._maps = (
+                    ConstellationMap.load(self.orientation_name),
+                    ConstellationMap.load(self.texture_name),
+                )
+            self._pid = os.getpid()
+            return orientation, texture
+
+    def embedders(self):
+        """Query embedders matching the geometry each collection was built in."""
+        with self._lock:
+            self.connect()
+            return self._embedders
+
+    def warm(self):
+        """Connect and load the local query models ahead of the first request."""
+        for embedder in self.embedders():
+            embedder.warm()
+
+    def reset(self):
+        """Drop the cached handles; the next call reconnects."""
+        with self._lock:
+            self._client = None
+            self._orientation = None
+            self._texture = None
+            self._embedders = None
+            self._pid = None
+
+    def executor(self):
+        """
+        Thread pool for the per-hemisphere searches (recreated after a fork).
+        Once half its threads are held by searches nobody waits for any more,
+        it is retired (those threads exit when their search returns) and a
+        fresh pool takes new requests, as long as no more than
+        BRIDGE_POOL_SIZE such threads are outstanding in all.
+        """
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = SearchPool(max_workers=BRIDGE_POOL_SIZE, thread_name_prefix="bridge")
+                self._executor_pid = os.getpid()
+                self._retired_stuck = 0
+            elif (self._executor.stuck * 2 >= BRIDGE_POOL_SIZE
+                  and self._retired_stuck + self._executor.stuck <= BRIDGE_POOL_SIZE):
+                print(f"⚠️  {self._executor.stuck} bridge threads held by timed-out searches, starting a fresh pool")
+                self._retired_stuck += self._executor.stuck
+                self._executor.shutdown(wait=False)
+                self._executor = SearchPool(max_workers=BRIDGE_POOL_SIZE, thread_name_prefix="bridge")
+            return self._executor
+
+    def abandon(self, future, pool):
+        """A search whose caller timed out: drop it if it has not started, else count its thread as stuck."""
+        if future.cancel():
+            return
+        with self._lock:
+            pool.stuck += 1
+
+        def released(_):
+            with self._lock:
+                pool.stuck -= 1
+                if pool is not self._executor:
+                    self._retired_stuck -= 1
+        future.add_done_callback(released)
+
+    def versions(self, mode="vector"):
+        """
+        Data versions of what a query in this mode reads; they change when
+        ingestion writes (collections) or rebuilds the BM25 indexes.
+        """
+        orientation, texture = self.connect()
+        versions = (orientation.version(), texture.version())
+        if mode != "vector":
+            versions += tuple(
+                index.mtime if index is not None else 0
+                for index in map(open_index, LEXICAL_INDEXES.values())
+            )
+        return versions
+
+    def cache_key(self, query_text, n_results, mode, filters=None):
+        # filtered queries read the partitions, which live in the BM25 index files
+        versions = self.versions("hybrid" if filters else mode)
+        scope = tuple(sorted(filters.items())) if filters else None
+        return (normalize_query(query_text), mode, scope, *versions, n_results)
+
+    def query(self, query_text: str, n_results: int = 5, mode=None, filters=None):
+        """
+        Run a dual-geometry query against both vector collections.
+        Identical queries against unchanged collections are served from the
+        result cache, and concurrent identical misses share one search.
+        """
+        mode, filters = resolve_mode(mode), normalize_filters(filters)
+        if self.results is None:
+            return self._query_with_retry(query_text, n_results, mode, filters)
+        return self.results.get_or_compute(
+            self.cache_key(query_text, n_results, mode, filters),
+            lambda: self._query_with_retry(query_text, n_results, mode, filters),
+            cacheable=lambda result: "partial" not in result and "lexical_fallback" not in result,
+        )
+
+    def _query_with_retry(self, query_text, n_results, mode, filters):
+        # retries once on a fresh connection if the cached one has gone stale
+        try:
+            return self._query(query_text, n_results, mode, filters)
+        except Exception as e:
+            if not reconnectable(e):
+                raise
+            print("⚠️  Bridge connection failed, reconnecting:", e)
+            self.reset()
+            return self._query(query_text, n_results, mode, filters)
+
+    def stats(self):
+        return {
+            "results": self.results.stats() if self.results else None,
+            "embeddings": get_embedding_cache().stats(),
+        }
+
+    def search_orientation(self, query_texts, n_results=5, mode=None, filters=None):
+        """
+        Search the compasses for a batch of queries (one embedding call and
+        one collection query per batch). Returns (hits per query, geometry)
+        — see layer_geometry().
+        """
+        results, embeddings, mode = self._retrieve("orientation", query_texts, n_results, mode, filters)
+        constellation = self._maps[0]
+        with span("format_orientation"):
+            hits = [orientation_hits(results, row, constellation) for row in range(len(query_texts))]
+        return hits, layer_geometry(embeddings, results, mode)
+
+    def search_texture(self, query_texts, n_results=5, mode=None, filters=None):
+        """Search the fragments for a batch of queries (see search_orientation)."""
+        results, embeddings, mode = self._retrieve("texture", query_texts, n_results, mode, filters)
+        constellation = self._maps[1]
+        with span("format_texture"):
+            hits = [texture_hits(results, row, constellation) for row in range(len(query_texts))]
+        return hits, layer_geometry(embeddings, results, mode)
+
+    def _retrieve(self, layer, query_texts, n_results, mode, filters=None):
+        """
+        Chroma-shaped results for one layer, the query embeddings (None when
+        none were computed) and the mode that actually served it.
+        """
+        mode = resolve_mode(mode)
+        orientation, texture = self.connect()
+        backend = orientation if layer == "orientation" else texture
+        embedder = self.embedders()[0 if layer == "orientation" else 1]
+        index = open_index(LEXICAL_INDEXES[layer])
+
+        subset, subset_ids = None, None
+        if filters:
+            if index is None:
+                raise RuntimeError(f"Filtered queries need the {layer} partitions (run lexical_index.py)")
+            subset, subset_ids = index.select(filters)
+            if subset is not None and not len(subset):
+                return empty_results(len(query_texts)), None, mode
+
+        if mode != "lexical" and index is not None and not embedder.ready(query_texts):
+            self.warm_in_background(embedder)
+            mode = "fallback"
+        embeddings = None
+        if mode in ("vector", "hybrid"):
+            try:
+                with span(f"embed_{layer}"):
+                    embeddings = embedder.embed(query_texts)
+            except Exception as e:
+                if index is None:
+                    raise
+                print(f"⚠️  {layer} embedding failed, answering lexically:", e)
+                mode = "fallback"
+
+        if mode in ("lexical", "fallback"):
+            if index is None:
+                raise RuntimeError(f"No BM25 index for the {layer} layer (run lexical_index.py)")
+            with span(f"lexical_{layer}"):
+                return index.query(query_texts, n_results, subset), None, mode
+
+        fuse = mode == "hybrid" and index is not None
+        pool = n_results * BRIDGE_HYBRID_POOL if fuse else n_results
+        if subset_ids is not None:
+            pool = min(pool, len(subset_ids))
+        with span(f"search_{layer}"):
+            results = backend.query(query_embeddings=embeddings, n_results=pool,
+                                    include=self.include(), ids=subset_ids)
+        if fuse:
+            with span(f"lexical_{layer}"):
+                lexical = index.query(query_texts, pool, subset)
+            with span(f"fuse_{layer}"):
+                results = fuse_results(results, lexical, n_results, backend.get_vectors, k=BRIDGE_RRF_K)
+        return results, embeddings, mode
+
+    def warm_in_background(self, embedder):
+        """Load a cold query model on the bridge pool (once) while queries fall back."""
+        with self._lock:
+            if id(embedder) in self._warming:
+                return
+            self._warming.add(id(embedder))
+        print("⏳  Query model not loaded yet, warming it; answering lexically meanwhile")
+        self.executor().submit(embedder.warm)
+
+    @staticmethod
+    def include():
+        return SEARCH_INCLUDE + ["embeddings"] if BRIDGE_RESONANCE else SEARCH_INCLUDE
+
+    def score(self, hits, geometry):
+        """
+        Cross-layer scores for a batch (resonance.py): annotates the hits in
+        place and returns one resonance field per query, or None when a
+        layer is missing or scoring is off.
+        """
+        if not BRIDGE_RESONANCE or set(geometry) != {"orientation", "texture"}:
+            return None
+        orientation, texture = geometry["orientation"], geometry["texture"]
+        if orientation["hits"] is None or texture["hits"] is None:
+            return None
+        _, texture_embedder = self.embedders()
+        with span("resonance"):
+            # compasses are compared to fragments in the texture geometry
+            rows = [[d or "" for d in row] for row in orientation["documents"]]
+            docs = sorted({d for row in rows for d in row})
+            vectors = dict(zip(docs, texture_embedder.embed(docs))) if docs else {}
+            crossed = [[vectors[d] for d in row] for row in rows]
+            rows = score_batch(orientation, texture, crossed, links=BRIDGE_RESONANCE_LINKS)
+            for row, scores in enumerate(rows):
+                apply_scores(hits["orientation"][row], scores["orientation"])
+                apply_scores(hits["texture"][row], scores["texture"])
+        return [scores["field"] for scores in rows]
+
+    def query_batch(self, query_texts, n_results=5, mode=None, filters=None):
+        """
+        Run many queries at once: each hemisphere embeds the whole chunk in
+        one model call and searches it in one collection.query().
+        """
+        mode, filters = resolve_mode(mode), normalize_filters(filters)
+        results = []
+        for start in range(0, len(query_texts), BRIDGE_BATCH_CHUNK):
+            chunk = list(query_texts[start:start + BRIDGE_BATCH_CHUNK])
+            try:
+                layers = self._search_both(chunk, n_results, timeout=None, mode=mode, filters=filters)
+            except Exception as e:
+                if not reconnectable(e):
+                    raise
+                print("⚠️  Bridge connection failed, reconnecting:", e)
+                self.reset()
+                layers = self._search_both(chunk, n_results, timeout=None, mode=mode, filters=filters)
+            fields = layers.get("resonance")
+            for i, q in enumerate(chunk):
+                result = {
+                    "query": q,
+                    "orientation": layers["orientation"][i],
+                    "texture": layers["texture"][i],
+                    "query_point": query_points(layers, i),
+                }
+                if fields:
+                    result["resonance"] = fields[i]
+                if "lexical_fallback" in layers:
+                    result["lexical_fallback"] = layers["lexical_fallback"]
+                results.append(result)
+        return results
+
+    def _search_both(self, query_texts, n_results, timeout, mode=None, filters=None):
+        # Both hemispheres (embedding included) run side by side, so latency
+        # tracks the slower layer rather than the sum of the two.
+        self.connect()
+        pool = self.executor()
+        futures = {
+            layer: pool.submit(run_in_context(search), query_texts, n_results, mode, filters)
+            for layer, search in (("orientation", self.search_orientation), ("texture", self.search_texture))
+        }
+        layers, geometry, partial = {}, {}, []
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for layer, future in futures.items():
+            try:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                layers[layer], geometry[layer] = future.result(timeout=remaining)
+            except FutureTimeout:
+                print(f"⚠️  {layer} layer timed out after {timeout}s")
+                self.abandon(future, pool)
+                layers[layer] = [[] for _ in query_texts]
+                partial.append(layer)
+        if len(partial) == len(futures):
+            raise TimeoutError("both hemispheres timed out")
+        if partial:
+            layers["partial"] = partial
+        fallback = [layer for layer, g in geometry.items() if g["mode"] == "fallback"]
+        if fallback:
+            layers["lexical_fallback"] = fallback
+        fields = self.score(layers, geometry)
+        if fields is not None:
+            layers["resonance"] = fields
+        return layers
+
+    def stream(self, query_text, n_results=5, mode=None, filters=None):
+        """
+        Yield (event, payload) pairs as each hemisphere finishes:
+        ("orientation" | "texture", {"hits", "query_point"}) in completion
+        order, then ("resonance", {"field", "scores"}) once both are in,
+        then ("done", {"partial": [...]}). Exceptions propagate.
+        """
+        mode, filters = resolve_mode(mode), normalize_filters(filters)
+        key = None
+        if self.results is not None:
+            key = self.cache_key(query_text, n_results, mode, filters)
+            cached = self.results.peek(key)
+            if cached is not None:
+                for layer in ("orientation", "texture"):
+                    yield layer, {"hits": cached[layer], "query_point": cached["query_point"][layer]}
+                if "resonance" in cached:
+                    yield "resonance", {"field": cached["resonance"], "scores": hit_scores(cached)}
+                yield "done", {"partial": [], "cached": True}
+                return
+
+        self.connect()
+        pool = self.executor()
+        futures = {
+            pool.submit(run_in_context(search), [query_text], n_results, mode, filters): layer
+            for layer, search in (("orientation", self.search_orientation), ("texture", self.search_texture))
+        }
+        result, geometry, partial = {}, {}, []
+        try:
+            for future in as_completed(futures, timeout=BRIDGE_LAYER_TIMEOUT):
+                layer = futures[future]
+                hits, geometry[layer] = future.result()
+                result[layer] = hits[0]
+                yield layer, {"hits": hits[0], "query_point": place_query(hits[0])}
+        except FutureTimeout:
+            partial = [layer for layer in futures.values() if layer not in result]
+            print(f"⚠️  {', '.join(partial)} layer timed out after {BRIDGE_LAYER_TIMEOUT}s")
+            for future, layer in futures.items():
+                if layer in partial:
+                    self.abandon(future, pool)
+
+        fields = None if partial else self.score({k: [v] for k, v in result.items()}, geometry)
+        if fields is not None:
+            result["resonance"] = fields[0]
+            yield "resonance", {"field": fields[0], "scores": hit_scores(result)}
+
+        fallback = [layer for layer, g in geometry.items() if g["mode"] == "fallback"]
+        if key is not None and not partial and not fallback:
+            result["query_point"] = {layer: place_query(result[layer]) for layer in ("orientation", "texture")}
+            self.results.put(key, result)
+        done = {"partial": partial}
+        if fallback:
+            done["lexical_fallback"] = fallback
+        yield "done", done
+
+    def _query(self, query_text, n_results, mode=None, filters=None):
+        layers = self._search_both([query_text], n_results, timeout=BRIDGE_LAYER_TIMEOUT,
+                                   mode=mode, filters=filters)
+        result = {
+            "orientation": layers["orientation"][0],
+            "texture": layers["texture"][0],
+            "query_point": query_points(layers),
+        }
+        if "resonance" in layers:
+            result["resonance"] = layers["resonance"][0]
+        if "partial" in layers:
+            result["partial"] = layers["partial"]
+        if "lexical_fallback" in layers:
+            result["lexical_fallback"] = layers["lexical_fallback"]
+        return result
+
+
+# ─────────────────────────────────────────────
+# Result formatting
+# ─────────────────────────────────────────────
+def attach_geometry(hit, results, row, i, constellation):
+    """
+    Add the hit's distance (vector hits), its BM25 / fusion score (lexical
+    and hybrid hits) and, if the collection has a fitted map, its x/y.
+    """
+    distances = results.get("distances")
+    if distances and distances[row][i] is not None:
+        hit["distance"] = round(float(distances[row][i]), 6)
+    scores = results.get("scores")
+    if scores:
+        hit["score"] = round(float(scores[row][i]), 6)
+    if constellation is not None:
+        xy = constellation.xy(results["ids"][row][i])
+        if xy is not None:
+            hit["x"], hit["y"] = xy
+    return hit
+
+def orientation_hits(orient_results, row=0, constellation=None):
+    hits = []
     if orient_results and "documents" in orient_results:
-        for i in range(len(orient_results["ids"][0])):
-            orientation_hits.append({
-                "codex_id": orient_results["metadatas"][0][i].get("codex_id", ""),
-                "node_label": orient_results["metadatas"][0][i].get("node_label", ""),
-                "field_label": orient_results["metadatas"][0][i].get("field_label", ""),
-                "source": orient_results["metadatas"][0][i].get("source", ""),
-                "geometry_pair": orient_results["metadatas"][0][i].get("geometry_pair", ""),
-            })
-
-    # ── Texture layer query ──
-    text_results = texture.query(
-        query_texts=[query_text],
-        n_results=5,
-    )
-
-    texture_hits = []
+        metas = orient_results["metadatas"][row]
+        for i in range(len(orient_results["ids"][row])):
+            hits.append(attach_geometry({
+                "codex_id": metas[i].get("codex_id", ""),
+                "node_label": metas[i].get("node_label", ""),
+                "field_label": metas[i].get("field_label", ""),
+                "source": metas[i].get("source", ""),
+                "geometry_pair": metas[i].get("geometry_pair", ""),
+            }, orient_results, row, i, constellation))
+    return hits
+
+def texture_hits(text_results, row=0, constellation=None):
+    hits = []
     if text_results and "documents" in text_results:
-        for i in range(len(text_results["ids"][0])):
-            texture_hits.append({
-                "codex_id": text_results["metadatas"][0][i].get("codex_id", ""),
-                "title": text_results["metadatas"][0][i].get("title", ""),
-                "segment": text_results["metadatas"][0][i].get("segment", ""),
-                "document": text_results["documents"][0][i],
-            })
+        metas = text_results["metadatas"][row]
+        for i in range(len(text_results["ids"][row])):
+            hit = {
+                "codex_id": metas[i].get("codex_id", ""),
+                "title": metas[i].get("title", ""),
+                "segment": metas[i].get("segment", ""),
+                "document": text_results["documents"][row][i],
+            }
+            if metas[i].get("alternates"):
+                # the same passage in other codices, collapsed at ingest
+                hit["alternates"] = parse_alternates(metas[i]["alternates"])
+            hits.append(attach_geometry(hit, text_results, row, i, constellation))
+    return hits
+
+def empty_results(n_queries):
+    """Chroma-shaped results with no hits (a filter that matches nothing)."""
+    return {key: [[] for _ in range(n_queries)] for key in ("ids", "metadatas", "documents", "distances")}
+
+def layer_geometry(query_embeddings, results, mode="vector"):
+    """
+    Query vectors, per-row hit vectors and documents of one layer, for
+    scoring. Lexically served layers (or hits whose vectors could not be
+    fetched) have no hit vectors, so the batch is left unscored.
+    """
+    embeddings = results.get("embeddings") if results else None
+    if query_embeddings is None or (embeddings is not None and any(
+            v is None for row in embeddings for v in row)):
+        embeddings = None
+    return {
+        "query": None if query_embeddings is None else np.asarray(query_embeddings, dtype=np.float32),
+        "hits": None if embeddings is None else [np.asarray(row, dtype=np.float32) for row in embeddings],
+        "documents": [list(row or []) for row in (results or {}).get("documents") or []],
+        "mode": mode,
+    }
+
+def hit_scores(result):
+    """Per-layer score columns of already-annotated hits (for the stream's resonance event)."""
+    return {
+        layer: {key: [hit.get(key) for hit in result[layer]] for key in SCORE_KEYS}
+        for layer in ("orientation", "texture")
+    }
 
+def query_points(layers, row=0):
+    """Place the query on each layer's constellation from its neighbours."""
     return {
-        "orientation": orientation_hits,
-        "texture": texture_hits,
+        layer: place_query(layers[layer][row])
+        for layer in ("orientation", "texture")
     }
 
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """Return the process-wide BridgeEngine, creating it on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = BridgeEngine()
+    return _engine
+
+def preload():
+    """
+    Load the query models at import time (e.g. under gunicorn --preload),
+    so the workers share them copy-on-write. No Chroma client is opened:
+    Chroma caches its system (sqlite handles, background threads) per path,
+    and a worker that inherited the master's would hang reconnecting, so
+    each worker connects on its first request. Models are picked from the
+    *_EMBEDDER overrides or the pipeline defaults; a collection built with
+    another one has its model loaded by the worker.
+    """
+    for layer in ("orientation", "texture"):
+        embedder_for(layer).warm()
+
+# ─────────────────────────────────────────────
+# Query function
+# ─────────────────────────────────────────────
+def query_bridge(query_text: str, mode=None, filters=None):
+    """
+    Run a dual-geometry query against both vector collections.
+    Returns a structured dict with 'orientation' and 'texture' results;
+    if one layer exceeds BRIDGE_LAYER_TIMEOUT it comes back empty and is
+    listed under 'partial'. mode overrides BRIDGE_SEARCH_MODE; filters
+    ({"category" | "codex_id" | "tags": value or [values]}) scope the search.
+    """
+    return get_engine().query(query_text, mode=mode, filters=filters)
+
+def stream_bridge(query_text: str, n_results: int = 5, mode=None, filters=None):
+    """
+    Generator over (event, payload) pairs: each hemisphere as soon as its
+    search finishes, then a final "done" event.
+    """
+    return get_engine().stream(query_text, n_results=n_results, mode=mode, filters=filters)
+
+def bridge_stats():
+    """Result- and embedding-cache counters for this worker."""
+    return get_engine().stats()
+
+def query_bridge_batch(query_texts, n_results: int = 5, mode=None, filters=None):
+    """
+    Run many dual-geometry queries in one pass.
+    Returns one {'query', 'orientation', 'texture'} dict per input, in order.
+    """
+    return get_engine().query_batch(list(query_texts), n_results=n_results, mode=mode, filters=filters)
+
 # ─────────────────────────────────────────────
 # Local test harness
 # ─────────────────────────────────────────────
@@ -0,0 +1,58 @@
+# scripts/compare_backends.py
+"""
+Latency comparison: Chroma (HNSW) vs the exact numpy backend on one collection.
+
+Queries are stored vectors with a little noise, so no embedder is needed.
+Reports p50/p95 per query for each backend and the overlap of their top-k.
+
+  python scripts/compare_backends.py --path data/vectors/local --collection mindfield_fragments_v2
+"""
+import argparse, time, chromadb
+import numpy as np
+from vector_backends import ChromaBackend, NumpyBackend
+from shards import TEXTURE_COLLECTION
+
+def percentile_ms(samples, p):
+    return round(float(np.percentile(samples, p)) * 1000, 3)
+
+def time_queries(backend, queries, k):
+    samples, ids = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        res = backend.query(query_embeddings=[q.tolist()], n_results=k)
+        samples.append(time.perf_counter() - t0)
+        ids.append(res["ids"][0])
+    return samples, ids
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--path", default="data/vectors/local")
+    ap.add_argument("--collection", default=TEXTURE_COLLECTION)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("-k", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    chroma = ChromaBackend(chromadb.PersistentClient(path=args.path).get_collection(args.collection))
+    exact = NumpyBackend.load(args.collection)
+
+    rng = np.random.default_rng(args.seed)
+    rows = rng.integers(0, exact.count(), size=args.queries)
+    queries = exact.vectors[rows] + rng.normal(0, 0.02, size=(args.queries, exact.vectors.shape[1])).astype(np.float32)
+
+    # warm both paths before timing
+    time_queries(chroma, queries[:5], args.k)
+    time_queries(exact, queries[:5], args.k)
+
+    chroma_t, chroma_ids = time_queries(chroma, queries, args.k)
+    exact_t, exact_ids = time_queries(exact, queries, args.k)
+    overlap = np.mean([len(set(a) & set(b)) / max(len(b), 1) for a, b in zip(chroma_ids, exact_ids)])
+
+    print(f"\n🧭 {args.collection}: {exact.count()} vetores × {exact.vectors.shape[1]}d, {args.queries} queries, k={args.k}")
+    print(f"{'backend':<8} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, t in (("chroma", chroma_t), ("numpy", exact_t)):
+        print(f"{name:<8} {percentile_ms(t, 50):>9} {percentile_ms(t, 95):>9}")
+    print(f"\nchroma recall@{args.k} vs exact: {overlap:.3f}")
+
+if __name__ == "__main__":
+    main()
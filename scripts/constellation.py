@@ -0,0 +1,84 @@
+"""
+constellation.py
+Precomputed 2D constellation coordinates
+----------------------------------------
+6_fit_constellation.py fits one 2D projection (UMAP, cosine) per collection
+at ingest time and stores it in data/vectors/constellation/:
+
+  <collection>.npz        ids + per-document x/y, scaled to [-1, 1]
+
+At query time the bridge only looks coordinates up. The query point is
+placed by k-NN interpolation: an inverse-distance weighted mean of its hits'
+coordinates, so nothing is fitted or transformed per request.
+
+Controlled via .env:
+  CONSTELLATION_DIR = data/vectors/constellation
+"""
+
+import os
+import numpy as np
+
+CONSTELLATION_DIR = os.getenv("CONSTELLATION_DIR", "data/vectors/constellation")
+
+
+class ConstellationMap:
+    def __init__(self, name, ids, coords):
+        self.name = name
+        self.coords = np.asarray(coords, dtype=np.float32)
+        self.index = {doc_id: i for i, doc_id in enumerate(ids)}
+
+    @classmethod
+    def load(cls, name, directory=CONSTELLATION_DIR):
+        """Return the stored map for a collection, or None if it was never fitted."""
+        path = os.path.join(directory, f"{name}.npz")
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as z:
+            return cls(name, z["ids"].tolist(), z["coords"])
+
+    def xy(self, doc_id):
+        i = self.index.get(doc_id)
+        if i is None:
+            return None
+        x, y = self.coords[i]
+        return round(float(x), 4), round(float(y), 4)
+
+
+def place_query(hits, eps=1e-6):
+    """k-NN interpolation of the query point from hits carrying x, y and distance."""
+    placed = [h for h in hits if "x" in h and h.get("distance") is not None]
+    if not placed:
+        return None
+    weights = np.array([1.0 / (max(h["distance"], 0.0) + eps) for h in placed])
+    xy = np.array([[h["x"], h["y"]] for h in placed], dtype=np.float64)
+    x, y = (weights[:, None] * xy).sum(axis=0) / weights.sum()
+    return {"x": round(float(x), 4), "y": round(float(y), 4)}
+
+
+# ─────────────────────────────────────────────
+# Fitting (ingest time)
+# ─────────────────────────────────────────────
+def scale_unit(coords):
+    """Center and scale to [-1, 1] on the larger axis so the canvas mapping is stable."""
+    coords = coords - (coords.max(axis=0) + coords.min(axis=0)) / 2
+    span = np.abs(coords).max() or 1.0
+    return coords / span
+
+def fit_map(name, ids, vectors, directory=CONSTELLATION_DIR, n_neighbors=15, min_dist=0.1, seed=42):
+    """Fit a 2D UMAP projection for one collection and persist its coordinates."""
+    import umap
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    reducer = umap.UMAP(
+        n_components=2, metric="cosine",
+        n_neighbors=min(n_neighbors, max(2, len(vectors) - 1)),
+        min_dist=min_dist, random_state=seed,
+    )
+    coords = scale_unit(reducer.fit_transform(vectors)).astype(np.float32)
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.npz")
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, ids=np.array(ids), coords=coords)
+    os.replace(tmp, path)
+    return path
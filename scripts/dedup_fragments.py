@@ -0,0 +1,228 @@
+"""
+dedup_fragments.py
+Near-duplicate fragment collapse (MinHash + LSH)
+------------------------------------------------
+Notebooks repeat passages across codices, and every repeat would be
+embedded, stored and compete for the same texture result slots. This pass
+sits between parsing and embedding:
+
+  data/processed/archive.jsonl    every parsed segment (1_md_to_jsonl.py)
+  data/processed/fragments.jsonl  one canonical record per near-duplicate group
+                                  (embedded by 2_embed_local.py, indexed for BM25)
+
+Each fragment becomes a set of word shingles, summarized by a MinHash
+signature; signatures are cut into bands and fragments sharing a band
+bucket are candidates. A candidate whose estimated Jaccard similarity to a
+canonical fragment reaches DEDUP_THRESHOLD is folded into it. Fragments are
+visited in archive order (path-sorted, so the same file always wins) and
+only compared against canonical ones, so groups never chain. The canonical
+record keeps its own id and lists the others under "alternates"
+({id, codex_id, segment, title}); in Chroma metadata and bridge hits they
+travel as "codex_id#segment;..." (format_alternates / parse_alternates).
+
+Runs at the end of 1_md_to_jsonl.py; rerun on its own with
+
+  python scripts/dedup_fragments.py --threshold 0.9
+
+Controlled via .env:
+  DEDUP_THRESHOLD = 0.85   (estimated Jaccard of word 5-grams; 1.0 collapses only exact repeats)
+"""
+
+import os
+import json
+import zlib
+import argparse
+import numpy as np
+
+from lexical_index import WORD_RE, fold
+
+ARCHIVE_PATH = "data/processed/archive.jsonl"
+FRAGMENTS_PATH = "data/processed/fragments.jsonl"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))
+SHINGLE = 5
+BANDS, ROWS = 16, 8          # 128 hashes; candidate odds are ~50% at Jaccard 0.71, >99% at 0.85
+
+_rng = np.random.default_rng(0x6D66)
+HASH_A = _rng.integers(1, 1 << 63, BANDS * ROWS, dtype=np.uint64) | np.uint64(1)
+HASH_B = _rng.integers(0, 1 << 63, BANDS * ROWS, dtype=np.uint64)
+SHINGLE_MIX = _rng.integers(1, 1 << 63, SHINGLE, dtype=np.uint64) | np.uint64(1)
+SHIFT = np.uint64(32)
+BAND_MIX = _rng.integers(1, 1 << 63, ROWS, dtype=np.uint64) | np.uint64(1)
+
+# ─────────────────────────────────────────────
+# Signatures
+# ─────────────────────────────────────────────
+def shingles(text, size=SHINGLE):
+    """
+    32-bit hashes of each run of `size` folded words (of the whole text when
+    it is shorter): per-word crc32s mixed position by position.
+    """
+    words = WORD_RE.findall(fold(text))
+    w = np.fromiter((zlib.crc32(t.encode("utf-8")) for t in words), dtype=np.uint64, count=len(words))
+    size = max(1, min(size, len(w)))
+    n = len(w) - size + 1
+    x = np.zeros(max(n, 1), dtype=np.uint64)
+    for j in range(size if len(w) else 0):
+        x += w[j:j + n] * SHINGLE_MIX[j]
+    return np.unique(x >> SHIFT)
+
+def signatures(texts, chunk=512):
+    """
+    (len(texts), BANDS × ROWS) MinHash matrix: per row, the min over a
+    text's shingles of the multiply-shift hash (a·x + b mod 2⁶⁴) >> 32.
+    Texts are hashed a chunk at a time so the per-shingle products stay one
+    vectorized pass.
+    """
+    out = np.empty((len(texts), BANDS * ROWS), dtype=np.uint32)
+    for start in range(0, len(texts), chunk):
+        sets = [shingles(t) for t in texts[start:start + chunk]]
+        x = np.concatenate(sets)
+        bounds = np.cumsum([0] + [len(s) for s in sets[:-1]])
+        out[start:start + len(sets)] = np.minimum.reduceat(((x[:, None] * HASH_A + HASH_B) >> SHIFT).astype(np.uint32), bounds, axis=0)
+    return out
+
+def band_keys(sigs):
+    """(n, BANDS) bucket keys: each band's ROWS hashes mixed into one uint64."""
+    bands = sigs.reshape(len(sigs), BANDS, ROWS).astype(np.uint64)
+    return (bands * BAND_MIX).sum(axis=-1) + np.arange(BANDS, dtype=np.uint64)
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures."""
+    return float((a == b).mean())
+
+# ─────────────────────────────────────────────
+# Collapse
+# ─────────────────────────────────────────────
+def alternate_ref(d):
+    return {"id": d["id"], "codex_id": d.get("codex_id"), "segment": d.get("segment"), "title": d.get("title")}
+
+def format_alternates(alternates):
+    """Alternates as one scalar metadata value: "codex_id#segment;..."."""
+    return ";".join(f"{a.get('codex_id')}#{a.get('segment')}" for a in alternates or ())
+
+def parse_alternates(value):
+    """Inverse of format_alternates: [{"codex_id", "segment"}]."""
+    refs = []
+    for ref in (value or "").split(";"):
+        if ref:
+            codex_id, _, segment = ref.rpartition("#")
+            refs.append({"codex_id": codex_id, "segment": int(segment) if segment.isdigit() else segment})
+    return refs
+
+class Deduplicator:
+    """
+    The collapse, online: fragments are fed in archive order a chunk at a
+    time and each one is either kept as canonical or folded into an earlier
+    canonical fragment. Only canonical signatures are held (BANDS × ROWS
+    uint32s each), never the records.
+    """
+
+    def __init__(self, threshold=DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self.buckets = {}
+        self.signatures = []
+        self.lines = []          # archive line of each canonical fragment
+
+    def assign(self, docs, first_line):
+        """For docs at archive lines first_line.., the canonical line each folds into (None = kept)."""
+        sigs = signatures([d.get("content") for d in docs])
+        keys = band_keys(sigs).tolist()
+        targets = []
+        for i in range(len(docs)):
+            best, best_sim = None, self.threshold
+            for key in keys[i]:
+                bucket = self.buckets.get(key, ())
+                for c in (bucket,) if isinstance(bucket, int) else bucket:
+                    sim = similarity(sigs[i], self.signatures[c])
+                    if sim >= best_sim and (best is None or sim > best_sim or c < best):
+                        best, best_sim = c, sim
+            if best is not None:
+                targets.append(self.lines[best])
+                continue
+            c = len(self.lines)
+            self.signatures.append(sigs[i].copy())
+            self.lines.append(first_line + i)
+            for key in keys[i]:
+                # most buckets hold one fragment: a bare index until a second one arrives
+                bucket = self.buckets.setdefault(key, c)
+                if bucket != c:
+                    if isinstance(bucket, int):
+                        self.buckets[key] = [bucket, c]
+                    else:
+                        bucket.append(c)
+            targets.append(None)
+        return targets
+
+def plan_collapse(docs, threshold=DEDUP_THRESHOLD, chunk=512):
+    """
+    One pass over (any iterable of) archive records: returns {canonical line:
+    [alternate refs]} and the set of collapsed lines.
+    """
+    dedup = Deduplicator(threshold)
+    alternates, dropped, buf = {}, set(), []
+
+    def flush(first_line):
+        for i, (d, target) in enumerate(zip(buf, dedup.assign(buf, first_line))):
+            if target is not None:
+                alternates.setdefault(target, []).append(alternate_ref(d))
+                dropped.add(first_line + i)
+        buf.clear()
+
+    line = 0
+    for line, d in enumerate(docs):
+        buf.append(d)
+        if len(buf) == chunk:
+            flush(line + 1 - chunk)
+    if buf:
+        flush(line + 1 - len(buf))
+    return alternates, dropped
+
+def canonical_records(docs, alternates, dropped):
+    """Second pass: the kept records, with their alternates attached (a repeated id is not listed)."""
+    for line, d in enumerate(docs):
+        if line in dropped:
+            continue
+        refs = [a for a in alternates.get(line, ()) if a["id"] != d["id"]]
+        if refs:
+            d["alternates"] = refs
+        yield d
+
+def read_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+def collapse(docs, threshold=DEDUP_THRESHOLD):
+    """
+    Canonical records, in archive order, with their near-duplicates listed
+    under "alternates"; returns (canonical, collapsed count).
+    """
+    alternates, dropped = plan_collapse(docs, threshold)
+    return list(canonical_records((dict(d) for d in docs), alternates, dropped)), len(dropped)
+
+def dedup_archive(archive_path=ARCHIVE_PATH, out_path=FRAGMENTS_PATH, threshold=DEDUP_THRESHOLD):
+    """
+    Write the canonical fragments file, streaming the archive twice (plan,
+    then write); returns (fragments read, canonical written, collapsed).
+    """
+    alternates, dropped = plan_collapse(read_jsonl(archive_path), threshold)
+    kept = 0
+    tmp = out_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as out:
+        for d in canonical_records(read_jsonl(archive_path), alternates, dropped):
+            out.write(json.dumps(d, ensure_ascii=False) + "\n")
+            kept += 1
+    os.replace(tmp, out_path)
+    return kept + len(dropped), kept, len(dropped)
+
+def main():
+    ap = argparse.ArgumentParser(description="Collapse near-duplicate fragments of archive.jsonl into fragments.jsonl.")
+    ap.add_argument("--threshold", type=float, default=DEDUP_THRESHOLD, help="estimated Jaccard similarity to collapse at")
+    ap.add_argument("--archive", default=ARCHIVE_PATH)
+    ap.add_argument("--out", default=FRAGMENTS_PATH)
+    args = ap.parse_args()
+    total, kept, collapsed = dedup_archive(args.archive, args.out, args.threshold)
+    print(f"[OK] {args.out}: {kept} fragmentos canônicos de {total} ({collapsed} quase-duplicados colapsados).")
+
+if __name__ == "__main__":
+    main()
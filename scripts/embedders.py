@@ -0,0 +1,257 @@
+"""
+embedders.py
+MindField query embedders
+-------------------------
+Each collection is searched in the geometry that built it:
+ - Orientation layer → OpenAI text-embedding-3-large
+ - Texture layer     → BAAI/bge-large-en-v1.5 (sentence-transformers)
+
+Embedders are named by a spec string, "<kind>:<model>":
+  st:BAAI/bge-large-en-v1.5        local sentence-transformers model
+  openai:text-embedding-3-large    OpenAI embeddings API
+  hash:1024                        deterministic local stand-in (tests, offline)
+
+Ingestion records the spec in the collection metadata under "embedder";
+the bridge reads it back so queries use the same model. Overrides:
+  ORIENTATION_EMBEDDER / TEXTURE_EMBEDDER = <spec>
+
+If the collection was built with truncated vectors ("embed_dim" in its
+metadata), query vectors are truncated and renormalized the same way.
+
+Model-backed embedders are wrapped in the shared query-embedding cache
+(embedding_cache.py), so a repeated query skips the model entirely.
+"""
+
+import os
+import re
+import hashlib
+import threading
+
+from embedding_cache import CachedEmbedder, get_embedding_cache
+from hnsw_config import hnsw_for, build_mismatch, apply_search_settings
+
+EMBEDDER_KEY = "embedder"
+DIM_KEY = "embed_dim"      # set when ingestion truncated the vectors (Matryoshka)
+
+DEFAULT_SPECS = {
+    "orientation": "openai:" + os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-large"),
+    "texture": "st:BAAI/bge-large-en-v1.5",
+}
+
+# ─────────────────────────────────────────────
+# Local model cache (one load per process)
+# ─────────────────────────────────────────────
+_models = {}
+_models_lock = threading.Lock()
+
+def load_sentence_transformer(model_name):
+    """Load a sentence-transformers model once per process and reuse it."""
+    model = _models.get(model_name)
+    if model is None:
+        with _models_lock:
+            model = _models.get(model_name)
+            if model is None:
+                from sentence_transformers import SentenceTransformer
+                print(f"🧭 carregando modelo {model_name} ...")
+                model = SentenceTransformer(model_name)
+                _models[model_name] = model
+    return model
+
+# ─────────────────────────────────────────────
+# Embedders
+# ─────────────────────────────────────────────
+class SentenceTransformerEmbedder:
+    """Local sentence-transformers model (texture geometry)."""
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.model_id = f"st:{model_name}"
+
+    def warm(self):
+        load_sentence_transformer(self.model_name)
+
+    def ready(self, texts=()):
+        """True once the model is loaded; until then a query would stall on the load."""
+        return self.model_name in _models
+
+    def embed(self, texts):
+        model = load_sentence_transformer(self.model_name)
+        return model.encode(list(texts), normalize_embeddings=True).tolist()
+
+
+class OpenAIEmbedder:
+    """OpenAI embeddings API (orientation geometry), over a pooled, retrying client."""
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.model_id = f"openai:{model_name}"
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from openai_embeddings import OpenAIEmbeddingClient
+                    self._client = OpenAIEmbeddingClient(
+                        self.model_name, max_retries=2, timeout=20.0,
+                        pool_size=int(os.getenv("OPENAI_POOL_SIZE", "32")),
+                    )
+        return self._client
+
+    def warm(self):
+        self._get_client()
+
+    def ready(self, texts=()):
+        return bool(os.getenv("OPENAI_API_KEY"))
+
+    def embed(self, texts):
+        return self._get_client().embed(texts)
+
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+class HashEmbedder:
+    """
+    Deterministic stand-in: hashed bag of words, L2-normalized.
+    Needs no model or network, so tests and offline runs can exercise
+    the full bridge with the same dimension as the real collection.
+    """
+
+    def __init__(self, dim=1024):
+        self.dim = int(dim)
+        self.model_id = f"hash:{self.dim}"
+
+    def warm(self):
+        pass
+
+    def ready(self, texts=()):
+        return True
+
+    def embed_one(self, text):
+        vec = [0.0] * self.dim
+        for tok in TOKEN_RE.findall(text.lower()):
+            h = hashlib.blake2b(tok.encode("utf-8"), digest_size=8).digest()
+            idx = int.from_bytes(h[:4], "little") % self.dim
+            vec[idx] += 1.0 if h[4] & 1 else -1.0
+        norm = sum(v * v for v in vec) ** 0.5
+        if norm:
+            vec = [v / norm for v in vec]
+        return vec
+
+    def embed(self, texts):
+        return [self.embed_one(t) for t in texts]
+
+    def encode(self, texts, batch_size=None, normalize_embeddings=True, **kwargs):
+        """SentenceTransformer-style call, so ingestion can run offline on the stand-in."""
+        import numpy as np
+        return np.asarray(self.embed(texts), dtype=np.float32)
+
+def truncate(vecs, dim):
+    """Keep the leading `dim` components of each vector and renormalize."""
+    out = []
+    for vec in vecs:
+        vec = list(vec[:dim])
+        norm = sum(v * v for v in vec) ** 0.5 or 1.0
+        out.append([v / norm for v in vec])
+    return out
+
+
+class TruncatedEmbedder:
+    """Matryoshka-style view of an embedder at a reduced dimension."""
+
+    def __init__(self, embedder, dim):
+        self.embedder = embedder
+        self.dim = int(dim)
+        self.model_id = f"{embedder.model_id}@{self.dim}"
+
+    def warm(self):
+        self.embedder.warm()
+
+    def ready(self, texts=()):
+        return self.embedder.ready(texts)
+
+    def embed(self, texts):
+        return truncate(self.embedder.embed(texts), self.dim)
+
+# ─────────────────────────────────────────────
+# Registry
+# ─────────────────────────────────────────────
+EMBEDDER_KINDS = {
+    "st": SentenceTransformerEmbedder,
+    "openai": OpenAIEmbedder,
+    "hash": HashEmbedder,
+}
+
+_embedders = {}
+_embedders_lock = threading.Lock()
+
+def get_embedder(spec):
+    """Return the shared embedder for a spec string, building it on first use."""
+    embedder = _embedders.get(spec)
+    if embedder is None:
+        kind, _, arg = spec.partition(":")
+        if kind not in EMBEDDER_KINDS or not arg:
+            raise ValueError(f"Unknown embedder spec: {spec!r}")
+        with _embedders_lock:
+            embedder = _embedders.get(spec)
+            if embedder is None:
+                embedder = EMBEDDER_KINDS[kind](arg)
+                _embedders[spec] = embedder
+    return embedder
+
+def embedder_spec_for(layer, collection=None):
+    """
+    Resolve which embedder built a collection.
+    Order: env override, collection metadata, pipeline default.
+    """
+    override = os.getenv(f"{layer.upper()}_EMBEDDER")
+    if override:
+        return override
+    metadata = getattr(collection, "metadata", None) or {}
+    return metadata.get(EMBEDDER_KEY) or DEFAULT_SPECS[layer]
+
+def embedder_for(layer, collection=None):
+    embedder = get_embedder(embedder_spec_for(layer, collection))
+    dim = (getattr(collection, "metadata", None) or {}).get(DIM_KEY)
+    if dim:
+        embedder = TruncatedEmbedder(embedder, dim)
+    if isinstance(embedder, HashEmbedder):
+        return embedder  # cheaper to recompute than to look up
+    return CachedEmbedder(embedder, get_embedding_cache())
+
+def open_geometry_collection(db, name, spec, dim=None, rebuild=False):
+    """
+    Get or create an ingest collection, recording its embedder (and reduced
+    dimension, if any) in the metadata. A collection built at a different
+    dimension must be rebuilt; with rebuild=True it is dropped and recreated.
+    New collections get the HNSW settings of hnsw_config.py (cosine + tuned
+    parameters); rebuild=True also recreates one built with other settings.
+    """
+    metadata = {EMBEDDER_KEY: spec}
+    if dim:
+        metadata[DIM_KEY] = int(dim)
+    hnsw = hnsw_for(name)
+    try:
+        coll = db.get_collection(name)
+    except Exception:
+        coll = None
+    if coll is not None:
+        current = (coll.metadata or {}).get(DIM_KEY)
+        mismatch = build_mismatch(coll, hnsw)
+        if current == metadata.get(DIM_KEY) and not (rebuild and mismatch):
+            if mismatch:
+                print(f"ℹ️  {name} was built with " + ", ".join(f"{k}={c}" for k, c, _ in mismatch)
+                      + "; rerun with --full to apply " + ", ".join(f"{k}={w}" for k, _, w in mismatch))
+            apply_search_settings(coll, hnsw)
+            return coll
+        if current != metadata.get(DIM_KEY) and not rebuild:
+            raise SystemExit(
+                f"Collection {name} was built with embed_dim={current}, requested {dim}; "
+                f"rerun with --full to rebuild it."
+            )
+        print(f"🗑️  Dropping {name} (embed_dim {current} → {dim}"
+              + "".join(f", {k} {c} → {w}" for k, c, w in mismatch) + ")")
+        db.delete_collection(name)
+    print(f"🗃️  Creating new collection: {name} ({', '.join(f'{k}={v}' for k, v in hnsw.items())})")
+    return db.create_collection(name, metadata=metadata, configuration={"hnsw": hnsw})
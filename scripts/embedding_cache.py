@@ -0,0 +1,259 @@
+"""
+embedding_cache.py
+Two-tier cache for query embeddings
+-----------------------------------
+Keyed by (model id, normalized query text):
+ - Tier 1: bounded in-memory LRU, private to each worker
+ - Tier 2: SQLite file shared by all workers on the host
+
+Both tiers evict by size (bytes of stored vectors), least recently used first
+(on disk, recency is only refreshed once per TOUCH_INTERVAL).
+
+Controlled via .env:
+  EMBED_CACHE_MEM_MB  = in-memory budget per worker   (default 64)
+  EMBED_CACHE_PATH    = SQLite file, empty to disable (default data/cache/query_embeddings.sqlite)
+  EMBED_CACHE_DISK_MB = on-disk budget                (default 512)
+"""
+
+import os
+import time
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+
+MB = 1024 * 1024
+TOUCH_INTERVAL = 3600  # seconds between last_used updates of a disk entry
+
+def normalize_query(text):
+    """Collapse whitespace and case so trivially different queries share a key."""
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.split()).casefold()
+
+def pack(vec):
+    return array("f", vec).tobytes()
+
+def unpack(blob):
+    vec = array("f")
+    vec.frombytes(blob)
+    return vec.tolist()
+
+# ─────────────────────────────────────────────
+# Tier 1: in-memory LRU
+# ─────────────────────────────────────────────
+class LRUTier:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            blob = self._items.get(key)
+            if blob is not None:
+                self._items.move_to_end(key)
+            return blob
+
+    def put(self, key, blob):
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._items[key] = blob
+            self.bytes += len(blob)
+            while self.bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._items)
+
+# ─────────────────────────────────────────────
+# Tier 2: SQLite shared across workers
+# ─────────────────────────────────────────────
+class SQLiteTier:
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._puts = 0
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY, vec BLOB NOT NULL,"
+                " nbytes INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+
+    def _conn(self):
+        # one connection per thread and per process (never reuse across a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        row = conn.execute("SELECT vec, last_used FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        # eviction only needs rough recency: touch at most once per interval
+        # so hot keys stay read-only instead of writing the WAL on every hit
+        now = time.time()
+        if now - row[1] > TOUCH_INTERVAL:
+            conn.execute("UPDATE embeddings SET last_used = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, key, blob):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO embeddings (key, vec, nbytes, last_used) VALUES (?, ?, ?, ?)",
+            (key, blob, len(blob), time.time()),
+        )
+        self._puts += 1
+        if self._puts % 64 == 1:  # summing the table on every insert gets slow
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # trim to 90% of budget so we don't evict on every insert
+        excess = total - int(self.max_bytes * 0.9)
+        freed = 0
+        victims = []
+        for key, nbytes in conn.execute("SELECT key, nbytes FROM embeddings ORDER BY last_used"):
+            victims.append((key,))
+            freed += nbytes
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def bytes(self):
+        return self._conn().execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()[0]
+
+# ─────────────────────────────────────────────
+# Cache front
+# ─────────────────────────────────────────────
+class EmbeddingCache:
+    def __init__(self, max_mem_bytes=64 * MB, path=None, max_disk_bytes=512 * MB):
+        self.memory = LRUTier(max_mem_bytes)
+        self.disk = SQLiteTier(path, max_disk_bytes) if path else None
+        self.mem_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model_id, text):
+        return f"{model_id}\x1f{normalize_query(text)}"
+
+    def get(self, model_id, text):
+        key = self.key(model_id, text)
+        blob = self.memory.get(key)
+        if blob is not None:
+            self.mem_hits += 1
+            return unpack(blob)
+        if self.disk is not None:
+            try:
+                blob = self.disk.get(key)
+            except sqlite3.Error as e:
+                print("⚠️  Embedding cache read failed:", e)
+                blob = None
+            if blob is not None:
+                self.disk_hits += 1
+                self.memory.put(key, blob)
+                return unpack(blob)
+        self.misses += 1
+        return None
+
+    def contains(self, model_id, text):
+        """Whether text is cached, without counting a hit or miss (the embed() that follows does)."""
+        key = self.key(model_id, text)
+        if self.memory.get(key) is not None:
+            return True
+        try:
+            return self.disk is not None and self.disk.get(key) is not None
+        except sqlite3.Error:
+            return False
+
+    def put(self, model_id, text, vec):
+        key = self.key(model_id, text)
+        blob = pack(vec)
+        self.memory.put(key, blob)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, blob)
+            except sqlite3.Error as e:
+                print("⚠️  Embedding cache write failed:", e)
+
+    def stats(self):
+        lookups = self.mem_hits + self.disk_hits + self.misses
+        return {
+            "mem_hits": self.mem_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.mem_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "mem_items": len(self.memory),
+            "mem_bytes": self.memory.bytes,
+            "mem_evictions": self.memory.evictions,
+            "disk_evictions": self.disk.evictions if self.disk else 0,
+        }
+
+
+class CachedEmbedder:
+    """Wraps an embedder; only texts missing from the cache reach the model."""
+
+    def __init__(self, embedder, cache):
+        self.embedder = embedder
+        self.cache = cache
+        self.model_id = embedder.model_id
+
+    def warm(self):
+        self.embedder.warm()
+
+    def ready(self, texts=()):
+        """Ready once the model is loaded, or already for texts that are all cached."""
+        if self.embedder.ready():
+            return True
+        texts = list(texts)
+        return bool(texts) and all(self.cache.contains(self.model_id, t) for t in texts)
+
+    def embed(self, texts):
+        texts = list(texts)
+        vecs = [self.cache.get(self.model_id, t) for t in texts]
+        missing = [i for i, v in enumerate(vecs) if v is None]
+        if missing:
+            fresh = self.embedder.embed([texts[i] for i in missing])
+            for i, vec in zip(missing, fresh):
+                self.cache.put(self.model_id, texts[i], vec)
+                vecs[i] = vec
+        return vecs
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_embedding_cache():
+    """Process-wide cache configured from the environment."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(
+                    max_mem_bytes=int(float(os.getenv("EMBED_CACHE_MEM_MB", "64")) * MB),
+                    path=os.getenv("EMBED_CACHE_PATH", "data/cache/query_embeddings.sqlite"),
+                    max_disk_bytes=int(float(os.getenv("EMBED_CACHE_DISK_MB", "512")) * MB),
+                )
+    return _cache
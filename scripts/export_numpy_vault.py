@@ -0,0 +1,50 @@
+# scripts/export_numpy_vault.py
+"""
+Export Chroma collections to the numpy vault read by BRIDGE_BACKEND=numpy,
+or (--format snapshot) to the memory-mapped snapshots read by BRIDGE_BACKEND=snapshot.
+
+  python scripts/export_numpy_vault.py                       # both pipeline collections
+  python scripts/export_numpy_vault.py --path data/vectors/local --collection mindfield_fragments_v2
+  python scripts/export_numpy_vault.py --dim 512 --dtype int8   # reduced search matrix + full-precision re-scoring
+  python scripts/export_numpy_vault.py --format snapshot     # swapped in by running servers
+"""
+import argparse, time, chromadb
+from dotenv import load_dotenv
+from vector_backends import NUMPY_VAULT_DIR, VECTOR_DTYPES, export_collection
+from vault_snapshot import SNAPSHOT_DIR, export_snapshot
+from shards import TEXTURE_COLLECTION, TEXTURE_SHARDS, shard_name, shard_path
+
+load_dotenv()
+
+# (persist path, collection) pairs written by 2_embed_local.py / 4_embed_openai_abstracts.py
+PIPELINE_COLLECTIONS = [
+    ("data/vectors/local", TEXTURE_COLLECTION),
+    ("data/vectors/abstracts_v2", "mindfield_compasses_large_v2"),
+]
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--path", help="Chroma persist directory")
+    ap.add_argument("--collection", help="collection name")
+    ap.add_argument("--format", choices=("npz", "snapshot"), default="npz", help="vault (.npz) or mapped snapshot (.mfsnap)")
+    ap.add_argument("--out", default=None, help=f"output directory (default {NUMPY_VAULT_DIR} / {SNAPSHOT_DIR})")
+    ap.add_argument("--dim", type=int, default=None, help="truncate the search matrix to this many dimensions")
+    ap.add_argument("--dtype", choices=VECTOR_DTYPES, default="float32", help="search matrix storage type")
+    args = ap.parse_args()
+
+    targets = [(args.path, args.collection)] if args.collection else PIPELINE_COLLECTIONS
+    if not args.collection and TEXTURE_SHARDS > 1:
+        # fragments live in TEXTURE_SHARDS stores (see shards.py); each exports under its shard name
+        targets = [(shard_path(TEXTURE_COLLECTION, i, TEXTURE_SHARDS), shard_name(TEXTURE_COLLECTION, i, TEXTURE_SHARDS))
+                   for i in range(TEXTURE_SHARDS)] + targets[1:]
+    for path, name in targets:
+        start = time.time()
+        coll = chromadb.PersistentClient(path=path or "data/vectors/local").get_collection(name)
+        if args.format == "snapshot":
+            out, n = export_snapshot(coll, args.out or SNAPSHOT_DIR, dim=args.dim, dtype=args.dtype)
+        else:
+            out, n = export_collection(coll, args.out or NUMPY_VAULT_DIR, dim=args.dim, dtype=args.dtype)
+        print(f"[OK] {name}: {n} vetores → {out} [{args.dtype}, dim {args.dim or 'full'}] ({time.time()-start:.1f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+hnsw_config.py
+Per-collection HNSW settings
+----------------------------
+Ingest collections are created with cosine distance (every embedding we
+store is a unit vector) and, once tune_hnsw.py has been run, with the
+graph parameters it chose, saved in data/vectors/hnsw_config.json:
+
+  {"mindfield_fragments_v2": {
+      "hnsw": {"space": "cosine", "max_neighbors": 16, "ef_construction": 128, "ef_search": 40},
+      "k": 5, "recall": 0.994, "p50_ms": 0.41, "p99_ms": 0.9, "tuned_at": "..."}}
+
+space / max_neighbors / ef_construction are fixed when a collection is
+built (a --full run rebuilds it to apply them); ef_search is applied to an
+existing collection in place (processes that already loaded the index keep
+the old value until they reopen it). Shards (name.s<i>of<N>) use the entry
+of their base collection unless they have their own.
+
+Controlled via .env:
+  HNSW_CONFIG_PATH = data/vectors/hnsw_config.json
+"""
+
+import os
+import re
+import json
+import time
+
+HNSW_CONFIG_PATH = os.getenv("HNSW_CONFIG_PATH", "data/vectors/hnsw_config.json")
+DEFAULT_HNSW = {"space": "cosine"}
+BUILD_KEYS = ("space", "max_neighbors", "ef_construction")
+SHARD_SUFFIX = re.compile(r"\.s\d+of\d+$")
+
+def load_config(path=HNSW_CONFIG_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def hnsw_for(name, path=HNSW_CONFIG_PATH):
+    """HNSW configuration to create `name` with: cosine plus any tuned parameters."""
+    config = load_config(path)
+    entry = config.get(name) or config.get(SHARD_SUFFIX.sub("", name)) or {}
+    return {**DEFAULT_HNSW, **entry.get("hnsw", {})}
+
+def save_choice(name, hnsw, report, path=HNSW_CONFIG_PATH):
+    """Record the chosen settings (and the measurements behind them) for one collection."""
+    config = load_config(path)
+    config[name] = {"hnsw": hnsw, **report, "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def current_hnsw(coll):
+    try:
+        return dict((coll.configuration or {}).get("hnsw") or {})
+    except Exception:
+        return {}
+
+def build_mismatch(coll, hnsw):
+    """Build-time settings of coll that differ from hnsw: [(key, current, wanted)]."""
+    current = current_hnsw(coll)
+    return [(k, current.get(k), hnsw[k]) for k in BUILD_KEYS if k in hnsw and current.get(k) != hnsw[k]]
+
+def apply_search_settings(coll, hnsw):
+    """Set ef_search on an existing collection if the config asks for a different one."""
+    ef = hnsw.get("ef_search")
+    if ef and current_hnsw(coll).get("ef_search") != ef:
+        coll.modify(configuration={"hnsw": {"ef_search": int(ef)}})
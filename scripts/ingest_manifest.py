@@ -0,0 +1,56 @@
+"""
+ingest_manifest.py
+Content-hash manifests for incremental ingestion
+------------------------------------------------
+ - data/processed/manifest.json (1_md_to_jsonl.py)
+     per source file: raw-bytes hash and its segments {id: content_hash}
+ - data/processed/embedded_<collection>.json (2_embed_local.py)
+     per segment id: fingerprint of what is stored in the collection,
+     "<vector>:<metadata>" — a change in the metadata half alone (e.g. new
+     alternates) is applied with a metadata-only update, not a re-encode
+
+Ids come from make_id (codex/path/title/segment), so a segment keeps its id
+while its text changes; the content hash is what tells the two apart.
+"""
+
+import os
+import json
+import hashlib
+
+def short_hash(text):
+    """16-hex sha1, same width as make_id."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+def fingerprint(content_hash, meta, embedder=""):
+    """
+    "<vector>:<metadata>" hash of a stored record: its text hash and the
+    embedder that encoded it, then the metadata written beside it.
+    """
+    meta_hash = short_hash(json.dumps(meta, sort_keys=True, ensure_ascii=False, default=str))
+    return f"{short_hash(content_hash + embedder)}:{meta_hash}"
+
+def vector_part(fp):
+    """The half of a fingerprint that only re-encoding can bring up to date."""
+    return (fp or "").partition(":")[0]
+
+def load_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(path, manifest):
+    """Write atomically so an interrupted run never leaves a torn manifest."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp, path)
@@ -0,0 +1,407 @@
+"""
+lexical_index.py
+On-disk BM25 index for the bridge's lexical and hybrid modes
+------------------------------------------------------------
+Vector search misses exact terms (codex ids, proper nouns, coined words)
+and always pays for a query embedding. This index answers from term
+postings alone:
+
+  data/index/fragments.bm25.npz   fragments.jsonl (built by 1_md_to_jsonl.py)
+  data/index/compasses.bm25.npz   abstracts.jsonl (built by 3_make_abstracts_dual_geometry.py)
+
+Each file holds a CSR inverted index (offsets / postings / tfs), document
+lengths, and a JSON table with the vocabulary plus the ids, metadata and
+documents the bridge needs to format hits without touching Chroma. Ids
+are the ones stages 2 and 4 write, so lexical and vector rankings can be
+fused by id (reciprocal rank fusion, fuse_results).
+
+Tokens are accent- and case-folded words; identifiers such as
+"THEORY.003" are also kept whole, so a codex id matches exactly.
+
+The same file carries the layer's partitions: row lists per category,
+codex and tag, written at ingestion. A filtered query
+({"category": "THEORY", "codex_id": "THEORY.003*", "tags": [...]}) is
+resolved to a row subset by select() and only that subset is scanned,
+lexically here and through the ids passed to the vector backend.
+
+  python scripts/lexical_index.py     # rebuild both from data/processed
+
+Controlled via .env:
+  LEXICAL_INDEX_DIR = data/index
+"""
+
+import os
+import re
+import json
+import bisect
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", "data/index")
+K1, B = 1.2, 0.75
+TITLE_BOOST = 2          # title tokens count this many times
+RRF_K = 60
+
+FILTER_FIELDS = ("category", "codex_id", "tags")
+# fields each layer is partitioned by; a filter on any other field does not restrict that layer
+LAYER_FIELDS = {"fragments": FILTER_FIELDS, "compasses": ("category", "codex_id")}
+
+WORD_RE = re.compile(r"[^\W_]+")
+IDENT_RE = re.compile(r"\w+(?:[._]\w+)+")
+
+def fold(text):
+    if not text or text.isascii():
+        return (text or "").casefold()
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c)).casefold()
+
+def tokenize(text):
+    """Folded words, plus dotted/underscored identifiers kept whole."""
+    text = fold(text)
+    return WORD_RE.findall(text) + IDENT_RE.findall(text)
+
+def codex_keys(codex_id):
+    """Whole-id tokens for a codex: the full id and its prefix (THEORY.003)."""
+    if not codex_id:
+        return []
+    codex_id = fold(codex_id)
+    return [codex_id, codex_id.split("_", 1)[0]]
+
+def tag_list(tags):
+    """Front-matter tags (list or "a, b" string) → folded, de-duplicated list."""
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    out = []
+    for tag in tags or []:
+        tag = fold(str(tag)).strip()
+        if tag and tag not in out:
+            out.append(tag)
+    return out
+
+def partition_keys(codex_id, category=None, tags=()):
+    """Partitions a record belongs to: (field, value) pairs."""
+    keys = []
+    if codex_id:
+        keys.append(("codex_id", codex_id))
+        category = category or codex_id.split(".", 1)[0]
+    if category:
+        keys.append(("category", category))
+    keys.extend(("tags", tag) for tag in tag_list(tags))
+    return keys
+
+# ─────────────────────────────────────────────
+# Build (ingest time)
+# ─────────────────────────────────────────────
+def index_path(name, directory=LEXICAL_INDEX_DIR):
+    return os.path.join(directory, f"{name}.bm25.npz")
+
+def build_index(name, records, directory=LEXICAL_INDEX_DIR):
+    """
+    records: iterable of {"id", "title", "text", "keys", "partitions", "metadata", "document"}.
+    Writes <directory>/<name>.bm25.npz atomically; returns (path, n_docs, n_terms).
+    """
+    ids, metadatas, documents, lengths = [], [], [], []
+    postings, partitions = {}, {}
+    for row, rec in enumerate(records):
+        for field, value in rec.get("partitions") or []:
+            partitions.setdefault(f"{field}={value}", []).append(row)
+        tokens = tokenize(rec.get("text", "")) + tokenize(rec.get("title", "")) * TITLE_BOOST
+        tokens += list(rec.get("keys") or [])
+        for term, tf in Counter(tokens).items():
+            postings.setdefault(term, []).append((row, tf))
+        ids.append(rec["id"])
+        metadatas.append(rec.get("metadata") or {})
+        documents.append(rec.get("document") or "")
+        lengths.append(len(tokens))
+
+    terms = sorted(postings)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    for t, term in enumerate(terms):
+        offsets[t + 1] = offsets[t] + len(postings[term])
+    rows = np.empty(offsets[-1], dtype=np.int32)
+    tfs = np.empty(offsets[-1], dtype=np.uint16)
+    for t, term in enumerate(terms):
+        entries = postings[term]
+        rows[offsets[t]:offsets[t + 1]] = [r for r, _ in entries]
+        tfs[offsets[t]:offsets[t + 1]] = [min(tf, 65535) for _, tf in entries]
+
+    keys = sorted(partitions)
+    part_offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    for p, key in enumerate(keys):
+        part_offsets[p + 1] = part_offsets[p] + len(partitions[key])
+    part_rows = np.fromiter((r for key in keys for r in partitions[key]),
+                            dtype=np.int32, count=int(part_offsets[-1]))
+
+    table = {"terms": terms, "ids": ids, "metadatas": metadatas, "documents": documents,
+             "partitions": keys, "fields": list(LAYER_FIELDS.get(name, FILTER_FIELDS))}
+    os.makedirs(directory, exist_ok=True)
+    path = index_path(name, directory)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, offsets=offsets, postings=rows, tfs=tfs,
+             lengths=np.asarray(lengths, dtype=np.int32),
+             part_offsets=part_offsets, part_rows=part_rows,
+             table=np.array(json.dumps(table, ensure_ascii=False)))
+    os.replace(tmp, path)
+    return path, len(ids), len(terms)
+
+def fragment_records(fragments_path):
+    """
+    Records for fragments.jsonl, shaped like 2_embed_local.py writes them. A
+    fragment that absorbed near-duplicates (dedup_fragments.py) also matches
+    and is filed under its alternates' codices.
+    """
+    from dedup_fragments import format_alternates  # it tokenizes with this module
+    with open(fragments_path, "r", encoding="utf-8") as f:
+        for line in f:
+            d = json.loads(line)
+            alternates = d.get("alternates") or []
+            keys = codex_keys(d.get("codex_id"))
+            partitions = partition_keys(d.get("codex_id"), d.get("category"), d.get("tags"))
+            for a in alternates:
+                keys += [k for k in codex_keys(a.get("codex_id")) if k not in keys]
+                partitions += [p for p in partition_keys(a.get("codex_id")) if p not in partitions]
+            metadata = {"codex_id": d.get("codex_id"), "title": d.get("title"), "segment": d.get("segment")}
+            if alternates:
+                metadata["alternates"] = format_alternates(alternates)
+            yield {
+                "id": d["id"],
+                "title": d.get("title") or "",
+                "text": d.get("content") or "",
+                "keys": keys,
+                "partitions": partitions,
+                "metadata": metadata,
+                "document": d.get("content") or "",
+            }
+
+def compass_records(abstracts_path):
+    """Records for abstracts.jsonl, with the ids 4_embed_openai_abstracts.py writes."""
+    with open(abstracts_path, "r", encoding="utf-8") as f:
+        for line in f:
+            d = json.loads(line)
+            if not d.get("summary"):
+                continue
+            yield {
+                "id": f"{d.get('codex_id')}_{d.get('node_index')}_{d.get('field_index')}",
+                "title": f"{d.get('node_label', '')} {d.get('field_label', '')}",
+                "text": d["summary"],
+                "keys": codex_keys(d.get("codex_id")),
+                "partitions": partition_keys(d.get("codex_id")),
+                "metadata": {"codex_id": d.get("codex_id"), "geometry_pair": d.get("geometry_pair"),
+                             "node_label": d.get("node_label"), "field_label": d.get("field_label"),
+                             "source": d.get("source")},
+                "document": d["summary"],
+            }
+
+# ─────────────────────────────────────────────
+# Query
+# ─────────────────────────────────────────────
+def normalize_filters(filters):
+    """
+    {"field": value | [values]} → {field: (values...)}, or None when empty.
+    A value ending in "*" matches by prefix ("THEORY.*"); tags are case-folded.
+    Raises ValueError for unknown fields or malformed values.
+    """
+    if not filters:
+        return None
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be an object of {field: value | [values]}")
+    out = {}
+    for field, values in filters.items():
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Unknown filter field {field!r}; expected one of {', '.join(FILTER_FIELDS)}")
+        if isinstance(values, str):
+            values = [values]
+        if not isinstance(values, (list, tuple)) or not values or not all(isinstance(v, str) and v for v in values):
+            raise ValueError(f"filter {field!r} must be a non-empty string or list of strings")
+        if field == "tags":
+            values = tag_list(values)
+        out[field] = tuple(sorted(set(values)))
+    return out
+
+
+class LexicalIndex:
+    SELECTION_CACHE = 256
+
+    def __init__(self, name, offsets, postings, tfs, lengths, table, mtime=0.0,
+                 part_offsets=None, part_rows=None):
+        self.name = name
+        self.mtime = mtime
+        self.offsets = offsets
+        self.postings = postings
+        self.tfs = tfs.astype(np.float32)
+        self.ids = table["ids"]
+        self.metadatas = table["metadatas"]
+        self.documents = table["documents"]
+        self.vocab = {term: t for t, term in enumerate(table["terms"])}
+        n = max(len(self.ids), 1)
+        df = np.diff(offsets).astype(np.float64)
+        self.idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avgdl = float(lengths.mean()) if len(lengths) else 1.0
+        # per-document BM25 length normalization, precomputed once
+        self.norm = (K1 * (1 - B + B * lengths / max(avgdl, 1e-9))).astype(np.float32)
+        self.partition_keys = table.get("partitions", [])
+        self.fields = set(table.get("fields", []))
+        self.part_offsets = part_offsets
+        self.part_rows = part_rows
+        self._selections = {}
+
+    @classmethod
+    def load(cls, name, directory=LEXICAL_INDEX_DIR):
+        path = index_path(name, directory)
+        if not os.path.exists(path):
+            return None
+        mtime = os.stat(path).st_mtime
+        with np.load(path, allow_pickle=False) as z:
+            parts = (z["part_offsets"], z["part_rows"]) if "part_rows" in z.files else (None, None)
+            return cls(name, z["offsets"], z["postings"], z["tfs"], z["lengths"],
+                       json.loads(str(z["table"])), mtime, *parts)
+
+    def count(self):
+        return len(self.ids)
+
+    def partition_rows(self, field, value):
+        """Rows of one partition, or of every partition whose value starts with value[:-1] if it ends in "*"."""
+        prefix = f"{field}={value[:-1]}" if value.endswith("*") else None
+        key = f"{field}={value}"
+        lo = bisect.bisect_left(self.partition_keys, prefix or key)
+        parts = []
+        for p in range(lo, len(self.partition_keys)):
+            k = self.partition_keys[p]
+            if (prefix is None and k != key) or (prefix is not None and not k.startswith(prefix)):
+                break
+            parts.append(self.part_rows[self.part_offsets[p]:self.part_offsets[p + 1]])
+        return parts
+
+    def select(self, filters):
+        """
+        (rows, ids) matching normalized filters — AND across fields, OR within
+        a field — or (None, None) when nothing restricts this layer.
+        """
+        if not filters:
+            return None, None
+        key = tuple(sorted(filters.items()))
+        if key not in self._selections:
+            rows = None
+            for field, values in filters.items():
+                if field not in self.fields:
+                    continue
+                if self.part_rows is None:
+                    raise RuntimeError(f"{self.name} index has no partitions; rebuild it (lexical_index.py)")
+                parts = [r for v in values for r in self.partition_rows(field, v)]
+                matched = np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int32)
+                rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+            ids = None if rows is None else [self.ids[r] for r in rows]
+            if len(self._selections) >= self.SELECTION_CACHE:
+                self._selections.clear()
+            self._selections[key] = (rows, ids)
+        return self._selections[key]
+
+    def top(self, text, n_results, subset=None):
+        """(rows, scores) of the best BM25 matches for one query, best first; subset restricts the rows."""
+        rows, weights = [], []
+        for term, qtf in Counter(tokenize(text)).items():
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+            s, e = self.offsets[t], self.offsets[t + 1]
+            docs, tf = self.postings[s:e], self.tfs[s:e]
+            rows.append(docs)
+            weights.append(qtf * self.idf[t] * tf * (K1 + 1) / (tf + self.norm[docs]))
+        if rows:
+            rows, weights = np.concatenate(rows), np.concatenate(weights)
+            if subset is not None:
+                keep = np.isin(rows, subset)
+                rows, weights = rows[keep], weights[keep]
+        if not len(rows):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        docs, inverse = np.unique(rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+        k = min(n_results, len(docs))
+        best = np.argpartition(-scores, k - 1)[:k] if k < len(docs) else np.arange(len(docs))
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return docs[best], scores[best]
+
+    def query(self, query_texts, n_results=5, subset=None):
+        """Chroma-shaped results; "scores" holds BM25 scores, there are no distances."""
+        out = {"ids": [], "metadatas": [], "documents": [], "scores": []}
+        for text in query_texts:
+            rows, scores = self.top(text, n_results, subset)
+            out["ids"].append([self.ids[r] for r in rows])
+            out["metadatas"].append([self.metadatas[r] for r in rows])
+            out["documents"].append([self.documents[r] for r in rows])
+            out["scores"].append([float(s) for s in scores])
+        return out
+
+
+_indexes = {}
+
+def open_index(name, directory=LEXICAL_INDEX_DIR):
+    """Process-wide index for a name, reloaded when ingestion rewrites the file."""
+    path = index_path(name, directory)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    index = _indexes.get(path)
+    if index is None or index.mtime != mtime:
+        index = LexicalIndex.load(name, directory)
+        _indexes[path] = index
+    return index
+
+# ─────────────────────────────────────────────
+# Hybrid: reciprocal rank fusion
+# ─────────────────────────────────────────────
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """[[id, ...], ...] → [(id, score), ...], best first; score = Σ 1 / (k + rank)."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: -kv[1])
+
+def fuse_results(vector, lexical, n_results, fetch_vectors=None, k=RRF_K):
+    """
+    Fuse Chroma-shaped vector and lexical results row by row. Hits found only
+    lexically keep no distance; their embeddings are fetched with
+    fetch_vectors(ids) when the vector results carried embeddings.
+    """
+    want_vectors = vector.get("embeddings") is not None
+    fused = {"ids": [], "metadatas": [], "documents": [], "distances": [], "scores": []}
+    if want_vectors:
+        fused["embeddings"] = []
+    for row in range(len(vector["ids"])):
+        found = {}
+        for i, doc_id in enumerate(lexical["ids"][row]):
+            found[doc_id] = (lexical["metadatas"][row][i], lexical["documents"][row][i], None, None)
+        for i, doc_id in enumerate(vector["ids"][row]):
+            emb = vector["embeddings"][row][i] if want_vectors else None
+            found[doc_id] = (vector["metadatas"][row][i], vector["documents"][row][i],
+                             vector["distances"][row][i], emb)
+        ranked = reciprocal_rank_fusion([vector["ids"][row], lexical["ids"][row]], k)[:n_results]
+        ids = [doc_id for doc_id, _ in ranked]
+        fused["ids"].append(ids)
+        fused["metadatas"].append([found[i][0] for i in ids])
+        fused["documents"].append([found[i][1] for i in ids])
+        fused["distances"].append([found[i][2] for i in ids])
+        fused["scores"].append([score for _, score in ranked])
+        if want_vectors:
+            missing = [i for i in ids if found[i][3] is None]
+            fetched = fetch_vectors(missing) if missing and fetch_vectors else {}
+            fused["embeddings"].append([
+                found[i][3] if found[i][3] is not None else fetched.get(i) for i in ids
+            ])
+    return fused
+
+
+if __name__ == "__main__":
+    for name, source, records in (
+        ("fragments", "data/processed/fragments.jsonl", fragment_records),
+        ("compasses", "data/processed/abstracts.jsonl", compass_records),
+    ):
+        if not os.path.exists(source):
+            print(f"⚠️  {source} not found, skipping {name}")
+            continue
+        path, n_docs, n_terms = build_index(name, records(source))
+        print(f"[OK] {path}: {n_docs} documentos, {n_terms} termos")
@@ -0,0 +1,172 @@
+"""
+openai_embeddings.py
+Batched, concurrent, retrying OpenAI embedding client
+-----------------------------------------------------
+Used by 4_embed_openai_abstracts.py (compasses) and the bridge's
+orientation embedder. Talks to the REST endpoint directly over a pooled
+requests.Session so it can be pointed at a local mock server.
+
+ - token-aware batching (≤ MAX_BATCH_INPUTS inputs, ≤ MAX_BATCH_TOKENS tokens)
+ - at most `concurrency` requests in flight
+ - exponential backoff with jitter on 429/5xx, honoring Retry-After
+ - optional persistent content-hash cache: unchanged texts are never re-sent
+
+Controlled via .env:
+  OPENAI_API_KEY
+  OPENAI_BASE_URL = https://api.openai.com/v1 (or a mock server)
+"""
+
+import os
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from embedding_cache import SQLiteTier, pack, unpack
+
+MAX_BATCH_INPUTS = 2048
+MAX_BATCH_TOKENS = 250_000      # API allows 300k per request; keep headroom for estimate error
+MAX_INPUT_TOKENS = 8191
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional; fall back to a conservative estimate
+    _ENCODING = None
+
+def count_tokens(text):
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+class EmbeddingAPIError(RuntimeError):
+    pass
+
+
+class OpenAIEmbeddingClient:
+    def __init__(self, model, api_key=None, base_url=None, dimensions=None,
+                 concurrency=4, max_retries=6, timeout=60.0, cache_path=None,
+                 max_batch_tokens=MAX_BATCH_TOKENS, max_batch_inputs=MAX_BATCH_INPUTS,
+                 pool_size=None):
+        self.model = model
+        self.dimensions = dimensions
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = (base_url or os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1").rstrip("/")
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_inputs = max_batch_inputs
+        self.cache = SQLiteTier(cache_path, max_bytes=1 << 40) if cache_path else None
+        self.session = requests.Session()
+        # keep-alive connections shared by every thread calling embed()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size or concurrency, 1))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "cache_hits": 0, "embedded": 0}
+
+    # ── cache ──
+    def cache_key(self, text):
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        return f"openai:{self.model}:{self.dimensions or 'full'}\x1f{digest}"
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    # ── batching ──
+    def make_batches(self, indexed_texts):
+        """Group (index, text) pairs into request-sized batches."""
+        batches, batch, tokens = [], [], 0
+        for i, text in indexed_texts:
+            n = min(count_tokens(text), MAX_INPUT_TOKENS)
+            if batch and (len(batch) >= self.max_batch_inputs or tokens + n > self.max_batch_tokens):
+                batches.append(batch)
+                batch, tokens = [], 0
+            batch.append((i, text))
+            tokens += n
+        if batch:
+            batches.append(batch)
+        return batches
+
+    # ── HTTP ──
+    def _retry_delay(self, attempt, response):
+        if response is not None:
+            ms = response.headers.get("retry-after-ms")
+            if ms:
+                try:
+                    return float(ms) / 1000.0
+                except ValueError:
+                    pass
+            after = response.headers.get("retry-after")
+            if after:
+                try:
+                    return float(after)
+                except ValueError:
+                    pass
+        return min(60.0, 2 ** attempt) * (0.5 + random.random() / 2)
+
+    def _post(self, texts):
+        payload = {"model": self.model, "input": texts, "encoding_format": "float"}
+        if self.dimensions:
+            payload["dimensions"] = self.dimensions
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                self._count("requests")
+                response = self.session.post(
+                    f"{self.base_url}/embeddings", json=payload, headers=headers, timeout=self.timeout
+                )
+                if response.status_code == 200:
+                    data = sorted(response.json()["data"], key=lambda e: e["index"])
+                    return [e["embedding"] for e in data]
+                if response.status_code not in RETRY_STATUS:
+                    raise EmbeddingAPIError(f"{response.status_code}: {response.text[:300]}")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise EmbeddingAPIError(f"request failed: {e}")
+            if attempt == self.max_retries:
+                raise EmbeddingAPIError(f"gave up after {attempt + 1} attempts: {response.status_code}")
+            self._count("retries")
+            delay = self._retry_delay(attempt, response)
+            print(f"   ⏳ embeddings retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+    # ── public ──
+    def embed(self, texts):
+        """Embed texts in order; cached texts are served locally, the rest batched and sent concurrently."""
+        texts = list(texts)
+        out = [None] * len(texts)
+        pending = []
+        for i, text in enumerate(texts):
+            blob = self.cache.get(self.cache_key(text)) if self.cache else None
+            if blob is not None:
+                out[i] = unpack(blob)
+                self._count("cache_hits")
+            else:
+                pending.append((i, text))
+
+        def run(batch):
+            vecs = self._post([t for _, t in batch])
+            for (i, text), vec in zip(batch, vecs):
+                out[i] = vec
+                if self.cache:
+                    self.cache.put(self.cache_key(text), pack(vec))
+            self._count("embedded", len(batch))
+
+        batches = self.make_batches(pending)
+        if len(batches) == 1:
+            run(batches[0])
+        elif batches:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="openai-embed") as pool:
+                for f in [pool.submit(run, b) for b in batches]:
+                    f.result()
+        return out
@@ -0,0 +1,81 @@
+# scripts/quantization_report.py
+"""
+Recall / latency / memory tradeoff of reduced and quantized vector storage.
+
+Starts from the full-precision numpy vault of one collection (export it with
+export_numpy_vault.py first) and compares every (dim, dtype) variant, with
+and without full-precision re-scoring, against exact float32 search.
+Queries are stored vectors with a little noise, so no embedder is needed.
+
+  python scripts/quantization_report.py --collection mindfield_compasses_large_v2 --dims 3072,1024,512,256
+  python scripts/quantization_report.py --collection mindfield_fragments_v2 --json report.json
+"""
+import argparse, json, time
+import numpy as np
+from vector_backends import NumpyBackend, VECTOR_DTYPES, normalize_rows, quantize, reduce_dim
+from shards import TEXTURE_COLLECTION
+
+def build_variant(exact, dim, dtype, rescore):
+    stored, scales = quantize(reduce_dim(exact.vectors, dim), dtype)
+    return NumpyBackend(exact.name, stored, exact.ids, exact.metadatas, exact.documents,
+                        scales=scales, full=exact.vectors if rescore else None, rescore=rescore or 1)
+
+def measure(backend, queries, k, truth):
+    samples, hits = [], 0
+    for q, gt in zip(queries, truth):
+        t0 = time.perf_counter()
+        idx, _ = backend.top_k(q[None, :], k)
+        samples.append(time.perf_counter() - t0)
+        hits += len(set(idx[0].tolist()) & gt)
+    return hits / (k * len(queries)), samples
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--collection", default=TEXTURE_COLLECTION)
+    ap.add_argument("--dims", default="", help="comma-separated dimensions (default: full, 1/2, 1/4, 1/8)")
+    ap.add_argument("--dtypes", default=",".join(VECTOR_DTYPES))
+    ap.add_argument("--rescore", type=int, default=4, help="candidate multiplier for re-scoring")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("-k", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", help="also write the rows to this file")
+    args = ap.parse_args()
+
+    exact = NumpyBackend.load(args.collection)
+    n, full_dim = exact.vectors.shape
+    dims = [int(d) for d in args.dims.split(",") if d] or [full_dim, full_dim // 2, full_dim // 4, full_dim // 8]
+
+    rng = np.random.default_rng(args.seed)
+    rows = rng.integers(0, n, size=args.queries)
+    queries = normalize_rows(exact.vectors[rows] + rng.normal(0, 0.05, size=(args.queries, full_dim)).astype(np.float32))
+    truth_idx, _ = exact.top_k(queries, args.k)
+    truth = [set(r.tolist()) for r in truth_idx]
+
+    report = []
+    print(f"\n🧭 {args.collection}: {n} × {full_dim}d, {args.queries} queries, recall@{args.k} vs exact float32")
+    print(f"{'dim':>6} {'dtype':>8} {'rescore':>8} {'recall':>8} {'p50 ms':>8} {'p99 ms':>8} {'MB':>8}")
+    for dim in dims:
+        for dtype in args.dtypes.split(","):
+            for rescore in (0, args.rescore):
+                if rescore and dim == full_dim and dtype == "float32":
+                    continue  # already exact
+                variant = build_variant(exact, dim, dtype, rescore)
+                variant.top_k(queries[:5], args.k)  # warm
+                recall, samples = measure(variant, queries, args.k, truth)
+                row = {
+                    "dim": dim, "dtype": dtype, "rescore": rescore, f"recall@{args.k}": round(recall, 4),
+                    "p50_ms": round(float(np.percentile(samples, 50)) * 1000, 3),
+                    "p99_ms": round(float(np.percentile(samples, 99)) * 1000, 3),
+                    "resident_mb": round(variant.nbytes / 2**20, 2),
+                }
+                report.append(row)
+                print(f"{dim:>6} {dtype:>8} {rescore or '-':>8} {recall:>8.3f} "
+                      f"{row['p50_ms']:>8} {row['p99_ms']:>8} {row['resident_mb']:>8}")
+    print("\n(re-scoring reads candidate rows from the full-precision file; its size is not resident)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"collection": args.collection, "n": n, "dim": full_dim, "rows": report}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+resonance.py
+Cross-layer resonance, novelty and coherence
+--------------------------------------------
+Scores a batch of bridge results in one pass of NumPy matrix products,
+from the hit embeddings the collections return (include=["embeddings"]):
+
+  similarity  cosine of each hit to the query, in its own geometry
+  coherence   mean cosine of a hit to the other hits of its layer
+  novelty     1 − max cosine to the higher-ranked hits of its layer
+              (what this hit adds that the ones above it did not say)
+  resonance   max cosine of a hit to any hit of the other layer
+
+The two layers are embedded by different models, so they are compared in
+the texture geometry: orientation hits' compass summaries are embedded
+with the texture model (through the query-embedding cache, so each compass
+is only ever embedded once). The orientation × texture matrix of those
+cosines is the resonance field; its strongest entries are returned as
+links for the constellation to draw.
+
+Rows are padded to the largest hit count and masked, so a whole batch of
+queries is scored with a handful of einsums.
+"""
+
+import numpy as np
+
+SCORE_KEYS = ("similarity", "coherence", "novelty", "resonance")
+
+
+def unit(a):
+    """L2-normalize along the last axis; all-zero (padding) rows stay zero."""
+    a = np.asarray(a, dtype=np.float32)
+    norms = np.linalg.norm(a, axis=-1, keepdims=True)
+    return a / np.where(norms == 0, 1.0, norms)
+
+def pad(rows, dim):
+    """List of (k_i, dim) arrays → (B, K, dim) array plus (B, K) validity mask."""
+    k = max((len(r) for r in rows), default=0)
+    out = np.zeros((len(rows), k, dim), dtype=np.float32)
+    mask = np.zeros((len(rows), k), dtype=bool)
+    for b, r in enumerate(rows):
+        if len(r):
+            out[b, :len(r)] = r
+            mask[b, :len(r)] = True
+    return out, mask
+
+def coherence(gram, mask):
+    """Mean similarity of each hit to the other valid hits of its row (1.0 if alone)."""
+    k = gram.shape[-1]
+    pairs = mask[:, :, None] & mask[:, None, :] & ~np.eye(k, dtype=bool)[None]
+    counts = pairs.sum(-1)
+    sums = np.where(pairs, gram, 0.0).sum(-1)
+    return np.where(counts > 0, sums / np.maximum(counts, 1), 1.0)
+
+def novelty(gram, mask):
+    """1 − max similarity to the valid hits ranked above (1.0 for the first hit)."""
+    k = gram.shape[-1]
+    earlier = np.tri(k, k, -1, dtype=bool)[None] & mask[:, None, :]
+    best = np.where(earlier, gram, -np.inf).max(-1, initial=-np.inf)
+    return np.where(np.isfinite(best), 1.0 - best, 1.0)
+
+def strongest_links(matrix, n):
+    """Top-n (orientation index, texture index, score) entries of one k_o × k_t matrix."""
+    if matrix.size == 0 or n <= 0:
+        return []
+    flat = matrix.ravel()
+    n = min(n, flat.size)
+    top = np.argpartition(-flat, n - 1)[:n]
+    top = top[np.argsort(-flat[top])]
+    cols = matrix.shape[1]
+    return [{"orientation": int(i // cols), "texture": int(i % cols), "score": round(float(flat[i]), 4)}
+            for i in top]
+
+
+def score_batch(orientation, texture, orientation_in_texture, links=8):
+    """
+    orientation / texture: {"query": (B, d) array, "hits": [(k_b, d) arrays]}
+    orientation_in_texture: [(k_o_b, d_t) arrays] — orientation hits in the texture geometry.
+    Returns one dict per row with per-hit score lists and the resonance field.
+    """
+    q_o, q_t = unit(orientation["query"]), unit(texture["query"])
+    h_o, m_o = pad(orientation["hits"], q_o.shape[-1])
+    h_t, m_t = pad(texture["hits"], q_t.shape[-1])
+    x_o, _ = pad(orientation_in_texture, q_t.shape[-1])
+    h_o, h_t, x_o = unit(h_o), unit(h_t), unit(x_o)
+
+    sim_o = np.einsum("bkd,bd->bk", h_o, q_o)
+    sim_t = np.einsum("bkd,bd->bk", h_t, q_t)
+    gram_o = np.einsum("bid,bjd->bij", h_o, h_o)
+    gram_t = np.einsum("bid,bjd->bij", h_t, h_t)
+    field = np.einsum("bid,bjd->bij", x_o, h_t)           # orientation × texture
+    valid = m_o[:, :, None] & m_t[:, None, :]
+
+    coh_o, coh_t = coherence(gram_o, m_o), coherence(gram_t, m_t)
+    nov_o, nov_t = novelty(gram_o, m_o), novelty(gram_t, m_t)
+    res_o = np.where(valid, field, -np.inf).max(2, initial=-np.inf)
+    res_t = np.where(valid, field, -np.inf).max(1, initial=-np.inf)
+
+    def column(a, b, k):
+        return [round(float(v), 4) if np.isfinite(v) else None for v in a[b, :k]]
+
+    rows = []
+    for b in range(len(q_o)):
+        k_o, k_t = int(m_o[b].sum()), int(m_t[b].sum())
+        matrix = field[b, :k_o, :k_t]
+        rows.append({
+            "orientation": {"similarity": column(sim_o, b, k_o), "coherence": column(coh_o, b, k_o),
+                            "novelty": column(nov_o, b, k_o), "resonance": column(res_o, b, k_o)},
+            "texture": {"similarity": column(sim_t, b, k_t), "coherence": column(coh_t, b, k_t),
+                        "novelty": column(nov_t, b, k_t), "resonance": column(res_t, b, k_t)},
+            "field": {
+                "matrix": np.round(matrix.astype(np.float64), 4).tolist(),
+                "links": strongest_links(matrix, links),
+                "mean": round(float(matrix.mean()), 4) if matrix.size else None,
+                "coherence": {
+                    "orientation": round(float(coh_o[b, :k_o].mean()), 4) if k_o else None,
+                    "texture": round(float(coh_t[b, :k_t].mean()), 4) if k_t else None,
+                },
+            },
+        })
+    return rows
+
+def apply_scores(hits, scores):
+    """Copy one layer's per-hit score lists onto its hit dicts."""
+    for i, hit in enumerate(hits):
+        for key, values in scores.items():
+            hit[key] = values[i]
+    return hits
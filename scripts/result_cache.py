@@ -0,0 +1,99 @@
+"""
+result_cache.py
+Bounded bridge result cache with single-flight coalescing
+---------------------------------------------------------
+Keyed by (normalized query, orientation version, texture version, n_results).
+Ingestion bumps a collection's version whenever it writes to it, so a
+rebuilt collection can never be answered from stale entries — they simply
+stop being looked up and age out of the LRU.
+
+Concurrent identical misses are coalesced: the first caller computes, the
+others wait on its future and share the result.
+"""
+
+import copy
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class ResultCache:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key, compute, cacheable=lambda result: True):
+        """Return the cached result for key, or compute it once for all concurrent callers."""
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(self._items[key])
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return copy.deepcopy(future.result())
+
+        try:
+            result = compute()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._inflight.pop(key, None)
+            if cacheable(result):
+                self._items[key] = result
+                while len(self._items) > self.max_entries:
+                    self._items.popitem(last=False)
+                    self.evictions += 1
+        future.set_result(result)
+        return copy.deepcopy(result)
+
+    def peek(self, key):
+        """Cached result for key, or None; counted as a hit or a miss."""
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(self._items[key])
+
+    def put(self, key, result):
+        with self._lock:
+            self._items[key] = copy.deepcopy(result)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._items),
+            "max_entries": self.max_entries,
+        }
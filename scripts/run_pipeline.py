@@ -0,0 +1,452 @@
+# scripts/run_pipeline.py
+"""
+Streaming ingestion: stages 1→4 in one bounded-memory run.
+
+Two lanes run side by side, each a chain of generators joined by bounded
+queues, so records flow from the raw files straight into the collections:
+
+  texture      data/raw_md/*.md → parse (1) → near-duplicate collapse → encode (2) → writer → fragments collection
+  orientation  data/raw_geometry_json/*.json → compose (3) → embed (4) → upsert → mindfield_compasses_large_v2
+
+Files are parsed at most --prefetch ahead of the encoder, fragments are
+length-bucketed inside a window of --window batches (not the whole
+archive), and at most --queue-depth encoded batches wait for the writer.
+What is held for the whole run is per-id bookkeeping only: the embed
+manifests, the ids seen, and one MinHash signature (512 bytes) plus its
+LSH bucket keys per canonical fragment. Records, texts and vectors never
+accumulate; the collection's own HNSW index grows as it does in stage 2.
+
+Each stage's own helpers do the work, and the same artifacts are written
+as the stage-by-stage run produces (archive.jsonl, fragments.jsonl,
+abstracts.jsonl, manifests, BM25 indexes), so the two can be mixed.
+Every file is re-parsed (cheap next to embedding); fragments whose text
+and embedder match the manifest are not re-embedded, and a change in their
+metadata alone is a metadata-only update. A collapsed
+fragment's alternates are only known once later files have been read, so
+canonical records are written with the alternates of the last run and
+corrected by a metadata-only update at the end.
+
+Checkpoints: every --checkpoint-every records a lane flushes its writer,
+saves its manifest and records how many source files are fully stored in
+PIPELINE_CHECKPOINT. After an interruption the next run (same settings)
+skips embedding those files, which matters for --full rebuilds that
+cannot lean on the manifest. --restart ignores the checkpoint.
+
+  python scripts/run_pipeline.py
+  python scripts/run_pipeline.py --full --batch-size 128 --checkpoint-every 4096
+  python scripts/run_pipeline.py --lanes texture --shards 4
+
+Controlled via .env:
+  PIPELINE_CHECKPOINT = data/processed/pipeline_checkpoint.json
+"""
+import os, json, time, queue, argparse, importlib, threading, chromadb
+from concurrent.futures import ThreadPoolExecutor, wait
+from dotenv import load_dotenv
+from embedders import open_geometry_collection
+from vector_backends import bump_version
+from ingest_manifest import file_hash, vector_part, load_manifest, save_manifest
+from dedup_fragments import (
+    ARCHIVE_PATH, FRAGMENTS_PATH, Deduplicator, alternate_ref, canonical_records, format_alternates, read_jsonl,
+)
+from lexical_index import build_index, fragment_records, compass_records
+from shards import TEXTURE_SHARDS, shard_of, shard_name, shard_path
+from telemetry import span, summary
+
+stage1 = importlib.import_module("1_md_to_jsonl")
+stage2 = importlib.import_module("2_embed_local")
+stage3 = importlib.import_module("3_make_abstracts_dual_geometry")
+stage4 = importlib.import_module("4_embed_openai_abstracts")
+
+load_dotenv()
+
+CHECKPOINT_PATH = os.getenv("PIPELINE_CHECKPOINT", "data/processed/pipeline_checkpoint.json")
+LANES = ("texture", "orientation")
+STOP = threading.Event()     # set on Ctrl-C; lanes stop at the next file boundary
+
+# ─────────────────────────────────────────────
+# Plumbing
+# ─────────────────────────────────────────────
+_DONE = object()
+
+def prefetch(items, depth):
+    """Run an iterator in a background thread, at most `depth` items ahead of the consumer."""
+    q = queue.Queue(maxsize=depth)
+
+    def run():
+        try:
+            for item in items:
+                q.put(item)
+        except BaseException as e:
+            q.put(e)
+        q.put(_DONE)
+
+    threading.Thread(target=run, name="prefetch", daemon=True).start()
+    while True:
+        item = q.get()
+        if item is _DONE:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+def check_stop(lane):
+    if STOP.is_set():
+        raise KeyboardInterrupt(f"{lane} interrompido")
+
+def write_jsonl_atomic(path):
+    """Open path + '.tmp' for streaming writes; the caller os.replace()s it when complete."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return open(path + ".tmp", "w", encoding="utf-8")
+
+
+class Checkpoint:
+    """Per-lane watermark: the first `files` sources are fully stored under these settings."""
+
+    def __init__(self, path=CHECKPOINT_PATH, restart=False):
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = {} if restart else load_manifest(path)
+
+    def start(self, lane, settings, sources):
+        """Number of leading sources to skip (0 unless a matching checkpoint exists)."""
+        with self.lock:
+            entry = self.state.get(lane) or {}
+            files, last = entry.get("files", 0), entry.get("last")
+            if files and entry.get("settings") == settings and files <= len(sources) and sources[files - 1] == last:
+                print(f"⏯️  [{lane}] retomando após {files} arquivos ({last})")
+                return files
+            if files:
+                print(f"⚠️  [{lane}] checkpoint de outra configuração ou de outros arquivos, recomeçando")
+            self.state[lane] = {"settings": settings, "files": 0, "last": None}
+            return 0
+
+    def advance(self, lane, files, last):
+        with self.lock:
+            self.state[lane].update(files=files, last=last)
+            save_manifest(self.path, self.state)
+
+    def finish(self, lane):
+        with self.lock:
+            self.state.pop(lane, None)
+            if self.state:
+                save_manifest(self.path, self.state)
+            elif os.path.exists(self.path):
+                os.remove(self.path)
+
+# ─────────────────────────────────────────────
+# Texture lane (stages 1 → 2)
+# ─────────────────────────────────────────────
+class TextureTarget:
+    """One texture collection (or shard) with its manifest and background writer."""
+
+    def __init__(self, db, name, manifest_path, args, rebuild, resuming):
+        self.name = name
+        self.manifest_path = manifest_path
+        self.coll = open_geometry_collection(db, name, stage2.EMBEDDER_SPEC, args.texture_dim, rebuild=rebuild)
+        # an empty collection means the manifest no longer describes it
+        fresh = (args.full and not resuming) or self.coll.count() == 0
+        self.manifest = {} if fresh else load_manifest(manifest_path)
+        self.writer = stage2.CollectionWriter(self.coll, self.manifest, args.queue_depth, manifest_path)
+        self.writer.start()
+        self.changed = False
+        self.updates = []          # metadata-only changes, handed to the writer a batch at a time
+        self.updated = 0
+
+    def update(self, item):
+        self.updates.append(item)
+        if len(self.updates) >= stage2.BATCH_SIZE:
+            self.flush_updates()
+
+    def flush_updates(self):
+        if self.updates:
+            self.writer.put(self.updates, None)
+            self.updated += len(self.updates)
+            self.updates = []
+            self.changed = True
+
+    def save(self):
+        save_manifest(self.manifest_path, self.manifest)
+
+def open_texture_targets(args, rebuild, resuming):
+    if args.shards <= 1:
+        return [TextureTarget(stage2.get_chroma_client(), stage2.COLLECTION_NAME, stage2.MANIFEST_PATH,
+                              args, rebuild, resuming)]
+    targets = []
+    for i in range(args.shards):
+        name = shard_name(stage2.COLLECTION_NAME, i, args.shards)
+        if stage2.CHROMA_MODE == "local":
+            db = chromadb.PersistentClient(path=shard_path(stage2.COLLECTION_NAME, i, args.shards))
+        else:
+            db = stage2.get_chroma_client()
+        targets.append(TextureTarget(db, name, f"data/processed/embedded_{name}.json", args, rebuild, resuming))
+    return targets
+
+def parse_sources(sources):
+    for full, rel, fn in sources:
+        with span("parse"):
+            fhash = file_hash(full)
+            docs = stage1.build_records(full, rel, fn, verbose=False)
+        yield rel, fhash, docs
+
+def previous_alternates(path=FRAGMENTS_PATH):
+    """{id: alternates} from the last fragments.jsonl, for records that had any."""
+    if not os.path.exists(path):
+        return {}
+    return {d["id"]: d["alternates"] for d in read_jsonl(path) if d.get("alternates")}
+
+
+class TextureEncoder:
+    """Length-buckets pending fragments a window at a time and hands encoded batches to the writers."""
+
+    def __init__(self, targets, args):
+        self.targets = targets
+        self.args = args
+        self.pending = []          # (doc, meta, fp, target index)
+        self.model = None
+        self.pool = None
+        self.encoded = 0
+
+    def add(self, item):
+        self.pending.append(item)
+        if len(self.pending) >= self.args.batch_size * self.args.window:
+            self.drain(final=False)
+
+    def drain(self, final=True):
+        """Encode the pending window; a short remainder waits for more unless final."""
+        if not self.pending:
+            return
+        if self.model is None:
+            self.model = stage2.load_model("[texture] ")
+            if self.args.processes > 1:
+                self.pool = self.model.start_multi_process_pool(target_devices=["cpu"] * self.args.processes)
+        size = self.args.batch_size
+        lengths = stage2.token_lengths(self.model, [d["content"] for d, _, _, _ in self.pending])
+        batches = stage2.length_bucketed(self.pending, lengths, size)
+        keep = [] if final or len(batches[-1]) == size else batches.pop()
+        for batch in batches:
+            embs = stage2.encode(self.model, [d["content"] for d, _, _, _ in batch], size, self.pool,
+                                 self.args.texture_dim)
+            for t, target in enumerate(self.targets):
+                rows = [i for i, item in enumerate(batch) if item[3] == t]
+                if rows:
+                    target.writer.put([batch[i][:3] for i in rows], embs[rows].tolist())
+                    target.changed = True
+            self.encoded += len(batch)
+        self.pending = keep
+
+    def close(self):
+        if self.pool is not None:
+            self.model.stop_multi_process_pool(self.pool)
+
+
+def texture_lane(args, checkpoint):
+    start = time.time()
+    sources = stage1.list_sources()
+    settings = {"embedder": stage2.EMBEDDER_SPEC, "dim": args.texture_dim, "full": args.full, "shards": args.shards}
+    skip = checkpoint.start("texture", settings, [rel for _, rel, _ in sources])
+    targets = open_texture_targets(args, rebuild=args.full and not skip, resuming=bool(skip))
+    guesses = previous_alternates()
+    encoder = TextureEncoder(targets, args)
+
+    dedup = Deduplicator()
+    alternates, dropped, seen, files = {}, set(), set(), {}
+    line = since_checkpoint = 0
+    completed = False
+    try:
+        with write_jsonl_atomic(ARCHIVE_PATH) as archive:
+            for n, (rel, fhash, docs) in enumerate(prefetch(parse_sources(sources), args.prefetch), 1):
+                check_stop("texture")
+                for d in docs:
+                    archive.write(json.dumps(d, ensure_ascii=False) + "\n")
+                files[rel] = {"hash": fhash, "segments": {d["id"]: d["content_hash"] for d in docs}}
+                with span("dedup"):
+                    folds = dedup.assign(docs, line)
+                for i, (d, target) in enumerate(zip(docs, folds)):
+                    if target is not None:
+                        alternates.setdefault(target, []).append(alternate_ref(d))
+                        dropped.add(line + i)
+                        continue
+                    if d["id"] in seen:
+                        continue  # duplicate id in the archive: first occurrence wins
+                    seen.add(d["id"])
+                    if n <= skip:
+                        continue  # stored before the interruption
+                    guess = dict(d, alternates=guesses[d["id"]]) if d["id"] in guesses else d
+                    meta = stage2.fragment_meta(guess)
+                    fp = stage2.fragment_fingerprint(d, meta, args.texture_dim)
+                    t = shard_of(d.get("codex_id") or d["id"], args.shards) if args.shards > 1 else 0
+                    stored = targets[t].manifest.get(d["id"])
+                    if vector_part(stored) != vector_part(fp):
+                        encoder.add((d, meta, fp, t))
+                        since_checkpoint += 1
+                    elif stored != fp:
+                        targets[t].update((d, meta, fp))
+                line += len(docs)
+                if since_checkpoint >= args.checkpoint_every:
+                    with span("checkpoint"):
+                        encoder.drain()
+                        for target in targets:
+                            target.flush_updates()
+                            target.writer.flush()
+                            target.save()
+                        checkpoint.advance("texture", n, rel)
+                    since_checkpoint = 0
+            encoder.drain()
+        for target in targets:
+            target.flush_updates()
+            target.writer.close()
+        completed = True
+    finally:
+        encoder.close()
+        if not completed:
+            for target in targets:
+                try:
+                    target.writer.close()
+                except Exception:
+                    pass
+        for target in targets:
+            target.save()  # entries are only added after their upsert, so this is always safe
+    os.replace(ARCHIVE_PATH + ".tmp", ARCHIVE_PATH)
+    save_manifest(stage1.MANIFEST_PATH, {"files": files})
+    dedup = files = None  # signatures and per-file segments are not needed past this point
+
+    # canonical records with their final alternates; fix metadata written with a stale guess
+    patches = [[] for _ in targets]
+    kept = 0
+    with span("fragments"), write_jsonl_atomic(FRAGMENTS_PATH) as out:
+        for d in canonical_records(read_jsonl(ARCHIVE_PATH), alternates, dropped):
+            out.write(json.dumps(d, ensure_ascii=False) + "\n")
+            kept += 1
+            if format_alternates(d.get("alternates")) != format_alternates(guesses.get(d["id"])):
+                t = shard_of(d.get("codex_id") or d["id"], args.shards) if args.shards > 1 else 0
+                patches[t].append(d)
+    os.replace(FRAGMENTS_PATH + ".tmp", FRAGMENTS_PATH)
+
+    patched = removed = 0
+    for target, docs in zip(targets, patches):
+        items = []
+        for d in docs:
+            if d["id"] in target.manifest:
+                meta = stage2.fragment_meta(d)
+                items.append((d, meta, stage2.fragment_fingerprint(d, meta, args.texture_dim)))
+        stage2.update_metadata(target.coll, target.manifest, items)
+        patched += target.updated + len(items)
+        target.changed |= bool(items)
+        stale = [i for i in target.manifest if i not in seen]
+        for i in range(0, len(stale), stage2.BATCH_SIZE):
+            chunk = stale[i:i + stage2.BATCH_SIZE]
+            with span("delete"):
+                target.coll.delete(ids=chunk)
+            for doc_id in chunk:
+                target.manifest.pop(doc_id, None)
+            target.changed = True
+        removed += len(stale)
+        target.save()
+        if target.changed:
+            bump_version(target.coll)  # invalidates bridge result caches keyed on the old version
+
+    with span("lexical_index"):
+        index_path, _, n_terms = build_index("fragments", fragment_records(FRAGMENTS_PATH))
+    checkpoint.finish("texture")
+    print(f"[OK] texture: {len(sources)} arquivos, {line} segmentos, {kept} canônicos ({len(dropped)} colapsados); "
+          f"{encoder.encoded} embutidos, {patched} metadados corrigidos, {removed} removidos "
+          f"em {round((time.time()-start)/60,1)} min.")
+    print(f"     Índice BM25 {index_path}: {n_terms} termos.")
+
+# ─────────────────────────────────────────────
+# Orientation lane (stages 3 → 4)
+# ─────────────────────────────────────────────
+def compose_sources(files):
+    for full, fn in files:
+        with span("compose"):
+            docs = list(stage3.compose_file(full, fn))
+        yield fn, docs
+
+def orientation_lane(args, checkpoint):
+    start = time.time()
+    files = stage3.list_geometry_files()
+    settings = {"embedder": stage4.EMBEDDER_SPEC, "dim": args.orientation_dim, "full": args.full}
+    skip = checkpoint.start("orientation", settings, [fn for _, fn in files])
+    embedder = stage4.make_embedder(args.orientation_dim)
+    coll = open_geometry_collection(stage4.get_chroma_client(), stage4.COLLECTION_NAME, stage4.EMBEDDER_SPEC,
+                                    args.orientation_dim, rebuild=args.full and not skip)
+    pending, composed, written = [], 0, 0
+
+    def flush():
+        nonlocal written
+        if not pending:
+            return
+        ids, texts, metas = zip(*pending)
+        with span("embed"):
+            embs = embedder.embed(list(texts))
+        with span("upsert"):
+            coll.upsert(ids=list(ids), embeddings=embs, metadatas=list(metas), documents=list(texts))
+        written += len(pending)
+        pending.clear()
+        print(f"   ↳ {written} compasses indexados...")
+
+    with write_jsonl_atomic(stage3.OUT_PATH) as out:
+        for n, (fn, docs) in enumerate(prefetch(compose_sources(files), args.prefetch), 1):
+            check_stop("orientation")
+            for d in docs:
+                out.write(json.dumps(d, ensure_ascii=False) + "\n")
+                composed += 1
+                entry = stage4.compass_entry(d)
+                if entry is not None and n > skip:
+                    pending.append(entry)
+            if len(pending) >= stage4.WRITE_BATCH:
+                flush()
+                checkpoint.advance("orientation", n, fn)
+        flush()
+    os.replace(stage3.OUT_PATH + ".tmp", stage3.OUT_PATH)
+    if written:
+        bump_version(coll)  # invalidates bridge result caches keyed on the old version
+
+    with span("lexical_index"):
+        index_path, _, n_terms = build_index("compasses", compass_records(stage3.OUT_PATH))
+    checkpoint.finish("orientation")
+    print(f"[OK] orientation: {len(files)} arquivos, {composed} compasses, {written} embutidos "
+          f"em {round((time.time()-start)/60,1)} min.")
+    print(f"     Índice BM25 {index_path}: {n_terms} termos.")
+
+# ─────────────────────────────────────────────
+# Main
+# ─────────────────────────────────────────────
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--lanes", default=",".join(LANES), help="comma-separated subset of texture,orientation")
+    ap.add_argument("--full", action="store_true", help="re-embed everything (rebuilding collections as needed)")
+    ap.add_argument("--restart", action="store_true", help="ignore any checkpoint left by an interrupted run")
+    ap.add_argument("--batch-size", type=int, default=stage2.BATCH_SIZE, help="fragments per encode/write batch")
+    ap.add_argument("--window", type=int, default=8, help="batches length-bucketed together")
+    ap.add_argument("--prefetch", type=int, default=8, help="source files parsed ahead of the encoder")
+    ap.add_argument("--queue-depth", type=int, default=4, help="encoded batches waiting to be written")
+    ap.add_argument("--checkpoint-every", type=int, default=2048, help="fragments embedded between checkpoints")
+    ap.add_argument("--processes", type=int, default=1, help="sentence-transformers encode processes")
+    ap.add_argument("--shards", type=int, default=TEXTURE_SHARDS, help="texture shards (see shards.py)")
+    ap.add_argument("--texture-dim", type=int, default=None, help="as 2_embed_local.py --dim")
+    ap.add_argument("--orientation-dim", type=int, default=None, help="as 4_embed_openai_abstracts.py --dim")
+    args = ap.parse_args()
+
+    lanes = [lane.strip() for lane in args.lanes.split(",") if lane.strip()]
+    unknown = set(lanes) - set(LANES)
+    if unknown:
+        ap.error(f"unknown lane(s): {', '.join(sorted(unknown))}")
+    start = time.time()
+    checkpoint = Checkpoint(restart=args.restart)
+    runners = {"texture": texture_lane, "orientation": orientation_lane}
+    with ThreadPoolExecutor(max_workers=len(lanes), thread_name_prefix="lane") as pool:
+        futures = [pool.submit(runners[lane], args, checkpoint) for lane in lanes]
+        try:
+            for f in futures:
+                f.result()
+        except KeyboardInterrupt:
+            STOP.set()
+            wait(futures)
+            print(f"\n⏸️  Interrompido; rode de novo para retomar do checkpoint ({checkpoint.path}).")
+            raise SystemExit(130)
+    print(f"\n[OK] Pipeline concluído em {round((time.time()-start)/60,1)} min.")
+    print(summary())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+shards.py
+Hash-partitioned texture collection with scatter-gather search
+--------------------------------------------------------------
+With TEXTURE_SHARDS = N > 1 the fragments are split across N collections
+by a stable hash of their codex_id (a codex never straddles shards):
+
+  chroma local   data/vectors/shards/<collection>.s<i>of<N>/   one store each
+  chroma cloud   collection <collection>.s<i>of<N> in the configured database
+  numpy/snapshot <collection>.s<i>of<N>.npz / .mfsnap  (export_numpy_vault.py)
+
+2_embed_local.py builds the shards in parallel processes, one HNSW build
+per core. The bridge opens them as one ShardedBackend: every query runs
+on all shards at once and the per-shard top-k lists are merged by
+distance, which is exact since each shard returns its own best k.
+
+Controlled via .env:
+  CHROMA_COLLECTION_TEXTURE = mindfield_fragments_v2   (the fragments collection, sharded or not)
+  TEXTURE_SHARDS = 1                      (1 = one unsharded collection)
+  SHARD_DIR      = data/vectors/shards
+"""
+
+import os
+import heapq
+import hashlib
+import chromadb
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from vector_backends import VectorBackend, ChromaBackend, VERSION_KEY, open_backend
+from telemetry import run_in_context
+
+load_dotenv()
+
+# written by 2_embed_local.py, searched by the bridge; shards are named after it
+TEXTURE_COLLECTION = os.getenv("CHROMA_COLLECTION_TEXTURE", "mindfield_fragments_v2")
+TEXTURE_SHARDS = int(os.getenv("TEXTURE_SHARDS", "1"))
+SHARD_DIR = os.getenv("SHARD_DIR", "data/vectors/shards")
+MERGE_KEYS = ("ids", "metadatas", "documents", "distances", "embeddings")
+
+def shard_of(key, n_shards):
+    """Stable shard index for a codex id (sha1, not hash(): that is salted per process)."""
+    return int(hashlib.sha1(str(key).encode("utf-8")).hexdigest()[:8], 16) % n_shards
+
+def shard_name(collection_name, i, n_shards):
+    return f"{collection_name}.s{i}of{n_shards}"
+
+def shard_path(collection_name, i, n_shards, shard_dir=SHARD_DIR):
+    """Persist directory of one shard in local Chroma mode."""
+    return os.path.join(shard_dir, shard_name(collection_name, i, n_shards))
+
+def shard_names(collection_name, n_shards):
+    return [shard_name(collection_name, i, n_shards) for i in range(n_shards)]
+
+
+class ShardedBackend(VectorBackend):
+    """N backends searched in parallel and merged into one Chroma-shaped result."""
+
+    def __init__(self, name, shards):
+        self.name = name
+        self.shards = list(shards)
+        self._pool = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard")
+
+    @property
+    def metadata(self):
+        # geometry (embedder, dim) is the same on every shard; the version spans all of them
+        metadata = dict(self.shards[0].metadata or {})
+        metadata[VERSION_KEY] = self.version()
+        return metadata
+
+    def version(self):
+        return "+".join(shard.version() for shard in self.shards)
+
+    def count(self):
+        return sum(shard.count() for shard in self.shards)
+
+    def stale(self):
+        return any(shard.stale() for shard in self.shards)
+
+    def get_vectors(self, ids):
+        vectors = {}
+        for found in self._pool.map(lambda shard: shard.get_vectors(ids), self.shards):
+            vectors.update(found)
+        return vectors
+
+    def query(self, query_embeddings, n_results=5, include=None, ids=None, **kwargs):
+        if include is not None:
+            kwargs["include"] = include
+        if ids is not None:
+            kwargs["ids"] = ids
+        futures = [
+            self._pool.submit(run_in_context(shard.query), query_embeddings, n_results, **kwargs)
+            for shard in self.shards
+        ]
+        return merge_results([f.result() for f in futures], n_results)
+
+
+def merge_results(results, n_results):
+    """Merge per-shard Chroma results row by row, keeping the n_results closest hits."""
+    keys = [k for k in MERGE_KEYS if results and results[0].get(k) is not None]
+    merged = {k: [] for k in keys}
+    for row in range(len(results[0]["ids"]) if results else 0):
+        best = heapq.nsmallest(n_results, (
+            (dist, s, i)
+            for s, r in enumerate(results)
+            for i, dist in enumerate(r["distances"][row])
+        ))
+        for k in keys:
+            merged[k].append([results[s][k][row][i] for _, s, i in best])
+    return merged
+
+
+def open_shards(collection_name, n_shards, client=None, backend="chroma"):
+    """Open the N shards of a collection as one ShardedBackend."""
+    names = shard_names(collection_name, n_shards)
+    if backend == "chroma" and os.getenv("CHROMA_MODE", "local").lower() != "cloud":
+        shards = []
+        for i, name in enumerate(names):
+            path = shard_path(collection_name, i, n_shards)
+            if not os.path.isdir(path):
+                # PersistentClient would silently create an empty store here
+                raise FileNotFoundError(f"Shard store {path} not found (run 2_embed_local.py --shards {n_shards})")
+            shard_client = chromadb.PersistentClient(path=path)
+            shards.append(ChromaBackend(shard_client.get_collection(name), shard_client))
+    else:
+        shards = [open_backend(name, client, backend) for name in names]
+    return ShardedBackend(collection_name, shards)
@@ -0,0 +1,318 @@
+"""
+telemetry.py
+Timing spans, Prometheus metrics and a slow-request sampler
+-----------------------------------------------------------
+    with trace("query") as t:          # one per request
+        with span("embed_texture"):    # anywhere below it, any thread
+            ...
+    t.server_timing()                  # → "embed_texture;dur=12.3, ..."
+
+Every span is observed in the `mindfield_stage_seconds{stage=…}` histogram,
+whether or not a trace is active (ingestion scripts use bare spans and
+print `summary()` at the end). The trace lives in a contextvar, so work
+handed to a thread pool through `run_in_context` is attributed to the
+request that submitted it.
+
+Metrics are per process; render() emits the Prometheus text format.
+
+Slow-request profiling (off unless BRIDGE_PROFILE_SLOW_MS > 0): once a
+traced request has run longer than the threshold, a sampler thread
+records the stacks of every thread working on it every
+BRIDGE_PROFILE_INTERVAL_MS. When the request finishes, the folded stacks
+(flamegraph.pl / speedscope format) are written to BRIDGE_PROFILE_DIR and
+the hottest ones are printed.
+
+Controlled via .env:
+  BRIDGE_PROFILE_SLOW_MS     = threshold in ms, 0 disables   (default 0)
+  BRIDGE_PROFILE_INTERVAL_MS = sampling interval             (default 5)
+  BRIDGE_PROFILE_DIR         = data/cache/profiles
+"""
+
+import os
+import sys
+import time
+import bisect
+import threading
+import contextvars
+from collections import Counter as TallyCounter
+from contextlib import contextmanager
+
+PROFILE_SLOW_MS = float(os.getenv("BRIDGE_PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("BRIDGE_PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("BRIDGE_PROFILE_DIR", "data/cache/profiles")
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# ─────────────────────────────────────────────
+# Metrics
+# ─────────────────────────────────────────────
+def _label_str(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for n, v in zip(names, values):
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{n}="{v}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # labels → [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_label_str(names, key + (le,))} {cumulative}")
+                labels = _label_str(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {series[-1]:.6f}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+    def totals(self):
+        """{labels: (count, sum)} — used for the ingestion summary."""
+        with self._lock:
+            return {key: (sum(s[:-1]), s[-1]) for key, s in self._series.items()}
+
+
+REGISTRY = []
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+STAGE_SECONDS = register(Histogram(
+    "mindfield_stage_seconds", "Time spent per bridge / ingestion stage.", ("stage",)))
+REQUEST_SECONDS = register(Histogram(
+    "mindfield_request_seconds", "End-to-end request latency.", ("route",)))
+REQUESTS = register(Counter(
+    "mindfield_requests_total", "Requests served, by route and status.", ("route", "status")))
+SLOW_PROFILES = register(Counter(
+    "mindfield_slow_request_profiles_total", "Slow requests whose stacks were sampled.", ("route",)))
+
+def render(extra_gauges=None):
+    """Prometheus text exposition for every registered metric (+ optional flat gauges)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for name, value in (extra_gauges or {}).items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+def flatten(prefix, stats):
+    """{"results": {"hits": 3}} → {"<prefix>_results_hits": 3}, for render()."""
+    out = {}
+    for key, value in (stats or {}).items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            out.update(flatten(name, value))
+        else:
+            out[name] = value
+    return out
+
+# ─────────────────────────────────────────────
+# Traces and spans
+# ─────────────────────────────────────────────
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.spans = {}          # stage → seconds (summed if repeated)
+        self.status = "ok"       # set to the response code by the caller, if it has one
+        self.threads = {threading.get_ident()}
+        self.samples = None      # folded stack → count, filled by the sampler
+        self._lock = threading.Lock()
+
+    def enter(self):
+        """Register the calling thread as working on this trace (for the sampler)."""
+        with self._lock:
+            self.threads.add(threading.get_ident())
+
+    def thread_ids(self):
+        with self._lock:
+            return list(self.threads)
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self):
+        """Value for the Server-Timing response header (durations in ms)."""
+        with self._lock:
+            parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.spans.items()]
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current = contextvars.ContextVar("mindfield_trace", default=None)
+
+def current_trace():
+    return _current.get()
+
+@contextmanager
+def span(stage):
+    """Time a block; recorded in the stage histogram and the active trace, if any."""
+    t = _current.get()
+    if t is not None:
+        t.enter()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - t0
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        if t is not None:
+            t.add(stage, seconds)
+
+@contextmanager
+def trace(route):
+    """Open a request trace; records request latency and, if slow, a stack profile."""
+    t = Trace(route)
+    token = _current.set(t)
+    if PROFILE_SLOW_MS > 0:
+        _sampler().watch(t)
+    try:
+        yield t
+    except BaseException:
+        t.status = "error"
+        raise
+    finally:
+        _current.reset(token)
+        seconds = t.elapsed()
+        REQUEST_SECONDS.observe(seconds, route=route)
+        REQUESTS.inc(route=route, status=t.status)
+        if PROFILE_SLOW_MS > 0:
+            _sampler().unwatch(t)
+            if t.samples:
+                dump_profile(t)
+
+def run_in_context(fn):
+    """Wrap fn so it runs with the caller's trace when submitted to a thread pool."""
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+def summary(prefix="⏱️ "):
+    """One line of total seconds per stage recorded in this process (ingestion scripts)."""
+    totals = STAGE_SECONDS.totals()
+    if not totals:
+        return ""
+    parts = [f"{key[0]} {total:.2f}s" for key, (_, total) in sorted(totals.items(), key=lambda kv: -kv[1][1])]
+    return f"{prefix} " + " · ".join(parts)
+
+# ─────────────────────────────────────────────
+# Slow-request sampler
+# ─────────────────────────────────────────────
+def _fold(frame, limit=64):
+    stack = []
+    while frame is not None and len(stack) < limit:
+        code = frame.f_code
+        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class StackSampler(threading.Thread):
+    """Samples the threads of traces that have outlived the slow threshold."""
+
+    def __init__(self, slow_s, interval_s):
+        super().__init__(name="slow-request-sampler", daemon=True)
+        self.slow_s = slow_s
+        self.interval_s = interval_s
+        self._watched = set()
+        self._lock = threading.Lock()
+
+    def watch(self, t):
+        with self._lock:
+            self._watched.add(t)
+
+    def unwatch(self, t):
+        with self._lock:
+            self._watched.discard(t)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval_s)
+            with self._lock:
+                slow = [t for t in self._watched if t.elapsed() >= self.slow_s]
+            if not slow:
+                continue
+            frames = sys._current_frames()
+            for t in slow:
+                if t.samples is None:
+                    t.samples = TallyCounter()
+                for ident in t.thread_ids():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        t.samples[_fold(frame)] += 1
+
+
+_sampler_thread = None
+_sampler_lock = threading.Lock()
+
+def _sampler():
+    global _sampler_thread
+    if _sampler_thread is None or not _sampler_thread.is_alive():
+        with _sampler_lock:
+            if _sampler_thread is None or not _sampler_thread.is_alive():
+                _sampler_thread = StackSampler(PROFILE_SLOW_MS / 1000.0, PROFILE_INTERVAL_MS / 1000.0)
+                _sampler_thread.start()
+    return _sampler_thread
+
+def dump_profile(t, top=5):
+    """Write a slow trace's folded stacks to PROFILE_DIR and print the hottest."""
+    SLOW_PROFILES.inc(route=t.name)
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    route = t.name.strip("/").replace("/", "_") or "root"
+    path = os.path.join(PROFILE_DIR, f"{stamp}-{route}-{int(t.elapsed() * 1000)}ms.folded")
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in t.samples.most_common():
+            f.write(f"{stack} {count}\n")
+    print(f"🐢  slow {t.name} ({t.elapsed() * 1000:.0f} ms) — {t.server_timing()}")
+    for stack, count in t.samples.most_common(top):
+        print(f"    {count:>4} × {' ; '.join(stack.split(';')[-3:])}")
+    print(f"    stacks → {path}")
+    return path
@@ -0,0 +1,184 @@
+# scripts/tune_hnsw.py
+"""
+Sweep HNSW parameters for a collection and save the fastest setting that
+reaches a recall target (see hnsw_config.py).
+
+The collection's stored vectors are the corpus; a sample of them (each
+excluding itself) are the queries, and exact cosine top-k over the whole
+corpus is the ground truth. Every max_neighbors (M) × ef_construction pair
+is built once in a scratch Chroma store; ef_search is swept on that index.
+Each point reports recall@k and single-query p50/p99 latency, the
+recall/latency frontier is marked with ★, and the chosen point (lowest p50
+with recall ≥ --target, else the highest recall) goes to HNSW_CONFIG_PATH.
+2_embed_local.py / 4_embed_openai_abstracts.py then build with it (--full
+rebuilds an existing collection; a new ef_search is applied in place and
+taken up the next time a server opens the collection).
+
+  python scripts/tune_hnsw.py                                   # both pipeline collections
+  python scripts/tune_hnsw.py --path data/vectors/local --collection mindfield_fragments_v2 --target 0.99
+  python scripts/tune_hnsw.py --m 8,16,32 --ef-construction 64,128,256 --ef-search 10,20,40,80,160 --dry-run
+"""
+import argparse, time, tempfile, chromadb
+import numpy as np
+from chromadb.api.client import SharedSystemClient
+from dotenv import load_dotenv
+from vector_backends import fetch_collection, normalize_rows
+from hnsw_config import HNSW_CONFIG_PATH, save_choice
+from export_numpy_vault import PIPELINE_COLLECTIONS
+from shards import TEXTURE_COLLECTION, TEXTURE_SHARDS, shard_name, shard_path
+
+load_dotenv()
+
+INDEX_NAME = "tune_hnsw"
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+# ─────────────────────────────────────────────
+# Ground truth
+# ─────────────────────────────────────────────
+def kth_similarity(vectors, queries, k, block=256):
+    """Cosine of each query row's exact k-th nearest neighbour, excluding the query itself."""
+    kth = np.empty(len(queries), dtype=np.float32)
+    for start in range(0, len(queries), block):
+        rows = queries[start:start + block]
+        sims = vectors[rows] @ vectors.T
+        sims[np.arange(len(rows)), rows] = -np.inf
+        kth[start:start + len(rows)] = -np.partition(-sims, k - 1, axis=1)[:, k - 1]
+    return kth
+
+# ─────────────────────────────────────────────
+# Sweep
+# ─────────────────────────────────────────────
+def build_index(path, ids, vectors, m, ef_construction, batch=5000):
+    """Cosine collection with these graph parameters in a scratch store; returns build seconds."""
+    start = time.perf_counter()
+    coll = chromadb.PersistentClient(path=path).create_collection(INDEX_NAME, configuration={"hnsw": {
+        "space": "cosine", "max_neighbors": m, "ef_construction": ef_construction}})
+    for i in range(0, len(ids), batch):
+        coll.add(ids=ids[i:i + batch], embeddings=vectors[i:i + batch])
+    return time.perf_counter() - start
+
+def open_with_ef(path, ef_search):
+    """
+    Reopen the scratch index at ef_search. A loaded index keeps the ef it
+    was loaded with, so the client cache is cleared and the graph reloaded
+    from disk, the way the bridge picks the setting up on its next start.
+    """
+    chromadb.PersistentClient(path=path).get_collection(INDEX_NAME).modify(
+        configuration={"hnsw": {"ef_search": ef_search}})
+    SharedSystemClient.clear_system_cache()
+    return chromadb.PersistentClient(path=path).get_collection(INDEX_NAME)
+
+def measure(coll, ids, vectors, queries, kth, k, warmup=5):
+    """
+    recall@k and per-query latencies (ms). A returned hit counts when it is
+    at least as close as the exact k-th neighbour, so ties among duplicate
+    vectors are not scored as misses.
+    """
+    row_of = {id_: i for i, id_ in enumerate(ids)}
+    for row in queries[:warmup]:
+        coll.query(query_embeddings=[vectors[row]], n_results=k + 1, include=[])
+    hits, latencies = 0, []
+    for row, floor in zip(queries, kth):
+        start = time.perf_counter()
+        res = coll.query(query_embeddings=[vectors[row]], n_results=k + 1, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = [row_of[i] for i in res["ids"][0] if i != ids[row]][:k]
+        hits += int((vectors[found] @ vectors[row] >= floor - 1e-5).sum()) if found else 0
+    return hits / (len(queries) * k), np.asarray(latencies)
+
+def frontier(points):
+    """Points not beaten on both recall and p50 by another point."""
+    best, keep = -1.0, []
+    for p in sorted(points, key=lambda p: (p["p50_ms"], -p["recall"])):
+        if p["recall"] > best:
+            keep.append(p)
+            best = p["recall"]
+    return keep
+
+def choose(points, target):
+    ok = [p for p in points if p["recall"] >= target]
+    if ok:
+        return min(ok, key=lambda p: (p["p50_ms"], p["max_neighbors"], p["ef_construction"], p["ef_search"]))
+    return max(points, key=lambda p: (p["recall"], -p["p50_ms"]))
+
+def tune(name, ids, vectors, args):
+    rng = np.random.default_rng(args.seed)
+    if args.max_docs and len(ids) > args.max_docs:
+        keep = np.sort(rng.choice(len(ids), args.max_docs, replace=False))
+        ids, vectors = [ids[i] for i in keep], vectors[keep]
+    vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+    k = min(args.k, len(ids) - 1)
+    queries = rng.choice(len(ids), min(args.queries, len(ids)), replace=False)
+
+    start = time.time()
+    kth = kth_similarity(vectors, queries, k)
+    print(f"🎯 {name}: {len(ids)} vetores × {vectors.shape[1]}d, {len(queries)} queries, exact top-{k} ({time.time()-start:.1f}s)")
+
+    points = []
+    print(f"   {'M':>3} {'efC':>4} {'efS':>4} {'recall':>7} {'p50 ms':>7} {'p99 ms':>7} {'build s':>8}")
+    for m in args.m:
+        for efc in args.ef_construction:
+            with tempfile.TemporaryDirectory(prefix="tune_hnsw_") as path:
+                build_s = build_index(path, ids, vectors, m, efc)
+                for ef in args.ef_search:
+                    recall, lat = measure(open_with_ef(path, ef), ids, vectors, queries, kth, k)
+                    points.append({"max_neighbors": m, "ef_construction": efc, "ef_search": ef,
+                                   "recall": round(recall, 4), "p50_ms": round(float(np.percentile(lat, 50)), 3),
+                                   "p99_ms": round(float(np.percentile(lat, 99)), 3), "build_s": round(build_s, 2)})
+                    p = points[-1]
+                    print(f"   {m:>3} {efc:>4} {ef:>4} {p['recall']:>7.4f} {p['p50_ms']:>7.3f} {p['p99_ms']:>7.3f} {build_s:>8.2f}")
+                SharedSystemClient.clear_system_cache()
+
+    chosen = choose(points, args.target)
+    print("📈 frontier (recall vs p50):")
+    for p in frontier(points):
+        mark = "→" if p is chosen else "★"
+        print(f"   {mark} M={p['max_neighbors']} efC={p['ef_construction']} efS={p['ef_search']}: "
+              f"recall@{k} {p['recall']:.4f}, p50 {p['p50_ms']:.3f} ms, p99 {p['p99_ms']:.3f} ms")
+    if chosen["recall"] < args.target:
+        print(f"⚠️  no setting reached recall {args.target}; keeping the most accurate one")
+    hnsw = {"space": "cosine", "max_neighbors": chosen["max_neighbors"],
+            "ef_construction": chosen["ef_construction"], "ef_search": chosen["ef_search"]}
+    report = {"k": k, "target": args.target, "recall": chosen["recall"],
+              "p50_ms": chosen["p50_ms"], "p99_ms": chosen["p99_ms"], "docs": len(ids), "queries": len(queries)}
+    return hnsw, report
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--path", help="Chroma persist directory")
+    ap.add_argument("--collection", help="collection name")
+    ap.add_argument("--k", type=int, default=5, help="neighbours per query (the bridge asks for 5)")
+    ap.add_argument("--queries", type=int, default=200, help="sampled query vectors")
+    ap.add_argument("--target", type=float, default=0.99, help="minimum recall@k")
+    ap.add_argument("--m", type=int_list, default=[8, 16, 32], help="max_neighbors values")
+    ap.add_argument("--ef-construction", type=int_list, default=[64, 128, 256])
+    ap.add_argument("--ef-search", type=int_list, default=[10, 20, 40, 80, 160])
+    ap.add_argument("--max-docs", type=int, default=0, help="tune on a random sample of the corpus (0 = all)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--config", default=HNSW_CONFIG_PATH, help="where the chosen settings are saved")
+    ap.add_argument("--dry-run", action="store_true", help="report only, do not save")
+    args = ap.parse_args()
+
+    targets = [(args.path, args.collection, args.collection)] if args.collection else \
+              [(path, name, name) for path, name in PIPELINE_COLLECTIONS]
+    if not args.collection and TEXTURE_SHARDS > 1:
+        # shards share one graph config (saved under the base name); tune on the first shard
+        targets[0] = (shard_path(TEXTURE_COLLECTION, 0, TEXTURE_SHARDS),
+                      shard_name(TEXTURE_COLLECTION, 0, TEXTURE_SHARDS), TEXTURE_COLLECTION)
+    for path, name, config_name in targets:
+        coll = chromadb.PersistentClient(path=path or "data/vectors/local").get_collection(name)
+        ids, vectors, _, _ = fetch_collection(coll)
+        if len(ids) < 2:
+            print(f"⚠️  {name}: {len(ids)} vetores, nada para afinar")
+            continue
+        hnsw, report = tune(name, ids, vectors, args)
+        if args.dry_run:
+            print(f"🧪 dry run: {config_name} → {hnsw}")
+        else:
+            save_choice(config_name, hnsw, report, args.config)
+            print(f"[OK] {config_name} → {hnsw} ({args.config})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+vault_snapshot.py
+Single-file, memory-mapped collection snapshots
+-----------------------------------------------
+One self-describing file per collection, written by
+
+  python scripts/export_numpy_vault.py --format snapshot
+
+and served by BRIDGE_BACKEND=snapshot. The bridge maps it read-only, so
+every gunicorn worker searches the same page-cache copy and opening a
+collection costs a header parse, not an index load.
+
+Layout (little-endian, every section 64-byte aligned):
+
+  0   magic  b"MFSNAP\\0\\1"
+  8   uint32 format version
+  12  uint32 header length H
+  16  header JSON (H bytes): name, collection metadata (data version),
+      row count, storage, and {section: offset, dtype, shape}
+  ..  vectors    float32 | float16 | int8   (rows × dim), unit rows
+  ..  scales     float32 rows                 (int8 only)
+  ..  full       float32 rows × full dim      (when the search matrix is reduced)
+  ..  ids / metadatas / documents             UTF-8 blobs (metadata as JSON)
+  ..  *_offsets  uint64 rows + 1              record i = blob[off[i]:off[i+1]]
+
+Swapping is atomic: the export writes <name>.mfsnap.tmp and renames it
+over the old file. The backend stats the path every BRIDGE_VERSION_TTL
+seconds and reports itself stale when the inode changes; the bridge then
+reopens it, while in-flight queries finish on the old mapping.
+
+Controlled via .env:
+  SNAPSHOT_DIR = data/vectors/snapshot
+"""
+
+import os
+import json
+import mmap
+import time
+import struct
+import numpy as np
+
+from vector_backends import (
+    NumpyBackend, VERSION_TTL, fetch_collection, normalize_rows, quantize, reduce_dim,
+)
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "data/vectors/snapshot")
+MAGIC = b"MFSNAP\x00\x01"
+FORMAT_VERSION = 1
+ALIGN = 64
+PREAMBLE = struct.Struct("<8sII")
+
+def snapshot_path(name, snapshot_dir=SNAPSHOT_DIR):
+    return os.path.join(snapshot_dir, f"{name}.mfsnap")
+
+def _aligned(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+# ─────────────────────────────────────────────
+# Write
+# ─────────────────────────────────────────────
+def _blob(values):
+    """Strings → (uint8 blob, uint64 offsets)."""
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+def write_snapshot(name, ids, vectors, metadatas, documents, metadata=None,
+                   snapshot_dir=SNAPSHOT_DIR, dim=None, dtype="float32"):
+    """Write <snapshot_dir>/<name>.mfsnap and atomically replace any previous one."""
+    vectors = normalize_rows(np.asarray(vectors, dtype=np.float32)) if len(vectors) else np.zeros((0, 0), np.float32)
+    stored, scales = quantize(reduce_dim(vectors, dim), dtype) if len(vectors) else (vectors, None)
+    reduced = stored.dtype != np.float32 or stored.shape[1] != vectors.shape[1]
+
+    arrays = {"vectors": stored}
+    if scales is not None:
+        arrays["scales"] = scales
+    if reduced:
+        arrays["full"] = vectors
+    for field, values in (
+        ("ids", ids),
+        ("metadatas", [json.dumps(m or {}, ensure_ascii=False) for m in metadatas]),
+        ("documents", [d or "" for d in documents]),
+    ):
+        arrays[field], arrays[f"{field}_offsets"] = _blob(values)
+
+    sections = {key: {"dtype": a.dtype.str, "shape": list(a.shape)} for key, a in arrays.items()}
+    header = {
+        "format": FORMAT_VERSION,
+        "name": name,
+        "metadata": metadata or {},
+        "count": len(ids),
+        "storage": {"dim": int(stored.shape[1]) if stored.ndim == 2 else 0, "dtype": dtype,
+                    "full_dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0},
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "sections": sections,
+    }
+    # offsets depend on the header length, which depends on the offsets: fix the
+    # header size first with placeholder offsets wide enough for the final ones
+    total = sum(a.nbytes + ALIGN for a in arrays.values())
+    for s in sections.values():
+        s["offset"] = total
+    head_len = len(json.dumps(header).encode("utf-8"))
+    cursor = _aligned(PREAMBLE.size + head_len)
+    for key, a in arrays.items():
+        sections[key]["offset"] = cursor
+        cursor = _aligned(cursor + a.nbytes)
+    head = json.dumps(header).encode("utf-8").ljust(head_len)
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = snapshot_path(name, snapshot_dir)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, head_len))
+        f.write(head)
+        for key, a in arrays.items():
+            f.write(b"\0" * (sections[key]["offset"] - f.tell()))
+            f.write(np.ascontiguousarray(a).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+def export_snapshot(collection, snapshot_dir=SNAPSHOT_DIR, page_size=1000, dim=None, dtype="float32"):
+    """Dump a Chroma collection into a snapshot file; returns (path, rows)."""
+    ids, vectors, metadatas, documents = fetch_collection(collection, page_size)
+    path = write_snapshot(collection.name, ids, vectors, metadatas, documents,
+                          collection.metadata, snapshot_dir, dim=dim, dtype=dtype)
+    return path, len(ids)
+
+# ─────────────────────────────────────────────
+# Read
+# ─────────────────────────────────────────────
+class StringTable:
+    """Read-only sequence over a blob + offsets section; records decode on access."""
+
+    def __init__(self, blob, offsets, decode=None):
+        self.blob = blob
+        self.offsets = offsets
+        self.decode = decode
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        value = self.blob[int(self.offsets[i]):int(self.offsets[i + 1])].tobytes().decode("utf-8")
+        return self.decode(value) if self.decode else value
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class Snapshot:
+    """A mapped snapshot file; arrays are zero-copy views into the mapping."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self.identity = (st.st_ino, st.st_size, st.st_mtime_ns)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, head_len = PREAMBLE.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a MindField snapshot")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path}: snapshot format {version}, expected {FORMAT_VERSION}")
+        self.path = path
+        self.header = json.loads(self._map[PREAMBLE.size:PREAMBLE.size + head_len])
+
+    def array(self, key):
+        section = self.header["sections"].get(key)
+        if section is None:
+            return None
+        dtype = np.dtype(section["dtype"])
+        shape = tuple(section["shape"])
+        count = int(np.prod(shape)) if shape else 1
+        return np.frombuffer(self._map, dtype=dtype, count=count, offset=section["offset"]).reshape(shape)
+
+    def strings(self, key, decode=None):
+        return StringTable(self.array(key), self.array(f"{key}_offsets"), decode)
+
+
+class SnapshotBackend(NumpyBackend):
+    """Exact search (see NumpyBackend) over a memory-mapped snapshot."""
+
+    def __init__(self, path, version_ttl=VERSION_TTL, rescore=4):
+        snap = Snapshot(path)
+        self.snapshot = snap
+        self.path = path
+        self.name = snap.header["name"]
+        self.metadata = snap.header.get("metadata") or {}
+        self.vectors = snap.array("vectors")
+        self.scales = snap.array("scales")
+        self.full = snap.array("full")
+        self.rescore = rescore
+        self.ids = snap.strings("ids")
+        self.metadatas = snap.strings("metadatas", json.loads)
+        self.documents = snap.strings("documents")
+        self._rows = None
+        self.version_ttl = version_ttl
+        self._checked = time.monotonic()
+
+    @classmethod
+    def load(cls, name, snapshot_dir=SNAPSHOT_DIR):
+        return cls(snapshot_path(name, snapshot_dir))
+
+    def stale(self):
+        """True once the file on disk has been replaced (checked at most every ttl seconds)."""
+        now = time.monotonic()
+        if now - self._checked < self.version_ttl:
+            return False
+        self._checked = now
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False  # mid-swap or removed: keep serving the mapping we have
+        return (st.st_ino, st.st_size, st.st_mtime_ns) != self.snapshot.identity
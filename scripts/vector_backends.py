@@ -0,0 +1,345 @@
+"""
+vector_backends.py
+Pluggable search backends for the bridge
+----------------------------------------
+Every backend answers the same call as a Chroma collection:
+
+    backend.query(query_embeddings=[...], n_results=5, ids=None)
+      → {"ids": [[...]], "metadatas": [[...]], "documents": [[...]], "distances": [[...]]}
+
+so the bridge formats hits the same way whichever one is behind it.
+ids, when given, restricts the search to those records (filtered queries;
+see the partitions in lexical_index.py).
+
+  chroma  Chroma collection (HNSW + SQLite), local or cloud
+  numpy   exact in-process search over an exported vault (.npz):
+          one float32 matrix product + argpartition top-k, no recall loss.
+          At our corpus size (~1.5k fragments, 72 compasses) this is faster
+          than an HNSW walk plus the metadata fetch.
+  snapshot  the same search over a memory-mapped single-file snapshot,
+          shared by all workers through the page cache (vault_snapshot.py)
+
+The numpy vault can also be exported truncated (--dim) and/or quantized
+(--dtype float16|int8); candidates are then re-scored at full precision.
+
+Controlled via .env:
+  BRIDGE_BACKEND   = chroma | numpy | snapshot   (default chroma)
+  NUMPY_VAULT_DIR  = data/vectors/numpy      (written by export_numpy_vault.py)
+"""
+
+import os
+import json
+import time
+import uuid
+import numpy as np
+
+BRIDGE_BACKEND = os.getenv("BRIDGE_BACKEND", "chroma").lower()
+NUMPY_VAULT_DIR = os.getenv("NUMPY_VAULT_DIR", "data/vectors/numpy")
+# how often a live Chroma collection is re-read for its data version (seconds)
+VERSION_TTL = float(os.getenv("BRIDGE_VERSION_TTL", "2"))
+VERSION_KEY = "version"
+
+
+def bump_version(collection):
+    """Mark a collection as changed; called by ingestion after every write pass."""
+    metadata = dict(collection.metadata or {})
+    metadata[VERSION_KEY] = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    collection.modify(metadata=metadata)
+    return metadata[VERSION_KEY]
+
+
+class VectorBackend:
+    """Interface shared by all backends."""
+
+    name = ""
+    metadata = None
+
+    def query(self, query_embeddings, n_results=5, **kwargs):
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+    def get_vectors(self, ids):
+        """{id: vector} for stored ids (hybrid search fetches lexical-only hits)."""
+        raise NotImplementedError
+
+    def version(self):
+        """Data version of what this backend is serving (bumped by ingestion)."""
+        return (self.metadata or {}).get(VERSION_KEY, "0")
+
+    def stale(self):
+        """True when the data behind this handle was replaced and it should be reopened."""
+        return False
+
+
+class ChromaBackend(VectorBackend):
+    """Thin pass-through to a Chroma collection."""
+
+    def __init__(self, collection, client=None, version_ttl=VERSION_TTL):
+        self.collection = collection
+        self.client = client
+        self.name = collection.name
+        self.metadata = collection.metadata
+        self.version_ttl = version_ttl
+        self._checked = time.monotonic()
+
+    def version(self):
+        # the collection is live, so its metadata is re-read (at most every ttl seconds)
+        now = time.monotonic()
+        if self.client is not None and now - self._checked >= self.version_ttl:
+            self._checked = now
+            try:
+                self.metadata = self.client.get_collection(self.name).metadata
+            except Exception as e:
+                print(f"⚠️  Could not refresh version of {self.name}:", e)
+        return super().version()
+
+    def query(self, query_embeddings, n_results=5, **kwargs):
+        return self.collection.query(
+            query_embeddings=query_embeddings, n_results=n_results, **kwargs
+        )
+
+    def count(self):
+        return self.collection.count()
+
+    def get_vectors(self, ids):
+        got = self.collection.get(ids=list(ids), include=["embeddings"])
+        return {i: np.asarray(e, dtype=np.float32) for i, e in zip(got["ids"], got["embeddings"])}
+
+
+def normalize_rows(mat):
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+# ─────────────────────────────────────────────
+# Reduced / quantized storage
+# ─────────────────────────────────────────────
+VECTOR_DTYPES = ("float32", "float16", "int8")
+
+def reduce_dim(vectors, dim):
+    """Matryoshka-style truncation: keep the leading `dim` components and renormalize."""
+    if not dim or dim >= vectors.shape[1]:
+        return vectors
+    return normalize_rows(np.ascontiguousarray(vectors[:, :dim]))
+
+def quantize(vectors, dtype):
+    """Return (stored, scales). int8 uses one symmetric scale per row."""
+    if dtype == "float32":
+        return vectors.astype(np.float32), None
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        stored = np.round(vectors / scales[:, None]).astype(np.int8)
+        return stored, scales.astype(np.float32)
+    raise ValueError(f"Unknown vector dtype: {dtype!r}")
+
+
+class NumpyBackend(VectorBackend):
+    """
+    Exact cosine search over contiguous arrays held in memory.
+
+    The search matrix may be truncated to fewer dimensions and/or stored as float16
+    or int8. In that case the top n_results * rescore candidates from the
+    coarse pass are re-scored against full-precision vectors (`full`, usually
+    a read-only memmap) so the returned order matches an exact search.
+    """
+
+    BLOCK_ROWS = 16384  # rows dequantized at a time; bounds the float32 scratch
+
+    def __init__(self, name, vectors, ids, metadatas, documents, metadata=None,
+                 scales=None, full=None, rescore=4):
+        self.name = name
+        vectors = np.asarray(vectors)
+        if vectors.dtype not in (np.float16, np.int8):
+            vectors = normalize_rows(vectors.astype(np.float32))
+        self.vectors = np.ascontiguousarray(vectors)
+        self.scales = scales
+        self.full = full
+        self.rescore = rescore
+        self.ids = list(ids)
+        self.metadatas = list(metadatas)
+        self.documents = list(documents)
+        self.metadata = metadata or {}
+        self._rows = None
+
+    @classmethod
+    def load(cls, name, vault_dir=NUMPY_VAULT_DIR):
+        path = os.path.join(vault_dir, f"{name}.npz")
+        with np.load(path, allow_pickle=False) as z:
+            vectors = z["vectors"]
+            scales = z["scales"] if "scales" in z.files else None
+            table = json.loads(str(z["table"]))
+        full_path = os.path.join(vault_dir, f"{name}.full.npy")
+        full = np.load(full_path, mmap_mode="r") if os.path.exists(full_path) else None
+        return cls(name, vectors, table["ids"], table["metadatas"],
+                   table["documents"], table.get("metadata"), scales=scales, full=full)
+
+    def count(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        return self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def coarse_scores(self, q, rows=None):
+        """Similarity of each query to every stored row (or only `rows`), in the stored geometry."""
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        scales = self.scales if rows is None or self.scales is None else self.scales[rows]
+        dim = vectors.shape[1]
+        if q.shape[1] != dim:
+            q = normalize_rows(q[:, :dim])
+        if vectors.dtype == np.float32:
+            return q @ vectors.T
+        sims = np.empty((len(q), len(vectors)), dtype=np.float32)
+        for s in range(0, len(vectors), self.BLOCK_ROWS):
+            block = vectors[s:s + self.BLOCK_ROWS].astype(np.float32)
+            if scales is not None:
+                block *= scales[s:s + self.BLOCK_ROWS, None]
+            sims[:, s:s + len(block)] = q @ block.T
+        return sims
+
+    def rows_for(self, ids):
+        """Row numbers of the given ids (unknown ids are skipped), ascending."""
+        if self._rows is None:
+            self._rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        return np.sort(np.fromiter((self._rows[i] for i in ids if i in self._rows), dtype=np.int64))
+
+    def top_k(self, query_embeddings, n_results, rows=None):
+        """
+        Return (indices, similarities), each shaped (n_queries, k), best first.
+        With rows, only that subset of the matrix is scanned.
+        """
+        q = normalize_rows(np.asarray(query_embeddings, dtype=np.float32))
+        sims = self.coarse_scores(q, rows)
+        n = sims.shape[1]
+        k = min(n_results, n)
+        if k == 0:
+            return np.empty((len(q), 0), dtype=np.int64), np.empty((len(q), 0), dtype=np.float32)
+
+        approximate = self.full is not None and (
+            self.vectors.dtype != np.float32 or self.vectors.shape[1] != q.shape[1]
+        )
+        pool = min(n, k * self.rescore) if approximate else k
+        if pool < n:
+            idx = np.argpartition(-sims, pool - 1, axis=1)[:, :pool]
+        else:
+            idx = np.tile(np.arange(n), (len(q), 1))
+        part = np.take_along_axis(sims, idx, axis=1)
+        if rows is not None:
+            idx = rows[idx]
+
+        if approximate:
+            # re-score the candidates against full-precision, full-dimension rows
+            for r in range(len(q)):
+                rows = np.sort(idx[r])
+                exact = normalize_rows(np.asarray(self.full[rows], dtype=np.float32)) @ q[r]
+                idx[r], part[r] = rows, exact
+        order = np.argsort(-part, axis=1)[:, :k]
+        return np.take_along_axis(idx, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+    def row_vectors(self, rows):
+        """float32 vectors of the given rows, at full precision when a full copy exists."""
+        if self.full is not None:
+            return np.asarray(self.full[rows], dtype=np.float32)
+        block = self.vectors[rows].astype(np.float32)
+        if self.scales is not None:
+            block *= self.scales[rows, None]
+        return block
+
+    def get_vectors(self, ids):
+        rows = self.rows_for(ids)
+        return dict(zip((self.ids[r] for r in rows), self.row_vectors(rows))) if len(rows) else {}
+
+    def query(self, query_embeddings, n_results=5, include=None, ids=None, **kwargs):
+        idx, sims = self.top_k(query_embeddings, n_results, None if ids is None else self.rows_for(ids))
+        results = {
+            "ids": [[self.ids[j] for j in row] for row in idx],
+            "metadatas": [[self.metadatas[j] for j in row] for row in idx],
+            "documents": [[self.documents[j] for j in row] for row in idx],
+            "distances": (1.0 - sims).tolist(),
+        }
+        if include and "embeddings" in include:
+            results["embeddings"] = [self.row_vectors(row) for row in idx]
+        return results
+
+
+# ─────────────────────────────────────────────
+# Export (Chroma → numpy vault)
+# ─────────────────────────────────────────────
+def fetch_collection(collection, page_size=1000):
+    """Page a Chroma collection into (ids, float32 vectors, metadatas, documents)."""
+    ids, vectors, metadatas, documents = [], [], [], []
+    offset = 0
+    while True:
+        page = collection.get(
+            include=["embeddings", "metadatas", "documents"],
+            limit=page_size, offset=offset,
+        )
+        if not len(page["ids"]):
+            break
+        ids.extend(page["ids"])
+        vectors.extend(np.asarray(e, dtype=np.float32) for e in page["embeddings"])
+        metadatas.extend(page["metadatas"])
+        documents.extend(page["documents"])
+        offset += len(page["ids"])
+    matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), np.float32)
+    return ids, matrix, metadatas, documents
+
+def write_vault(name, ids, vectors, metadatas, documents, metadata=None,
+                vault_dir=NUMPY_VAULT_DIR, dim=None, dtype="float32"):
+    """
+    Write <vault_dir>/<name>.npz. With dim/dtype set, the search matrix is
+    truncated/quantized and <name>.full.npy keeps float32 rows for re-scoring.
+    """
+    os.makedirs(vault_dir, exist_ok=True)
+    path = os.path.join(vault_dir, f"{name}.npz")
+    full_path = os.path.join(vault_dir, f"{name}.full.npy")
+    vectors = normalize_rows(np.asarray(vectors, dtype=np.float32)) if len(vectors) else vectors
+    stored, scales = quantize(reduce_dim(vectors, dim), dtype) if len(vectors) else (vectors, None)
+    table = {
+        "ids": ids,
+        "metadatas": metadatas,
+        "documents": documents,
+        "metadata": metadata or {},
+        "storage": {"dim": int(stored.shape[1]) if stored.ndim == 2 else 0, "dtype": dtype},
+    }
+    arrays = {"vectors": stored, "table": np.array(json.dumps(table, ensure_ascii=False))}
+    if scales is not None:
+        arrays["scales"] = scales
+
+    reduced = stored.dtype != np.float32 or (len(vectors) and stored.shape[1] != vectors.shape[1])
+    if reduced:
+        tmp_full = full_path + ".tmp.npy"
+        np.save(tmp_full, vectors)
+        os.replace(tmp_full, full_path)
+    elif os.path.exists(full_path):
+        os.remove(full_path)
+
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+    return path
+
+def export_collection(collection, vault_dir=NUMPY_VAULT_DIR, page_size=1000, dim=None, dtype="float32"):
+    """Dump a Chroma collection's vectors, ids, metadata and documents to <vault_dir>/<name>.npz."""
+    ids, vectors, metadatas, documents = fetch_collection(collection, page_size)
+    path = write_vault(collection.name, ids, vectors, metadatas, documents,
+                       collection.metadata, vault_dir, dim=dim, dtype=dtype)
+    return path, len(ids)
+
+
+def open_backend(collection_name, client=None, backend=BRIDGE_BACKEND):
+    """Open a collection through the configured backend."""
+    if backend == "numpy":
+        return NumpyBackend.load(collection_name)
+    if backend == "chroma":
+        return ChromaBackend(client.get_collection(collection_name), client)
+    if backend == "snapshot":
+        from vault_snapshot import SnapshotBackend  # imports this module
+        return SnapshotBackend.load(collection_name)
+    raise ValueError(f"Unknown BRIDGE_BACKEND: {backend!r}")
@@ -1,7 +1,8 @@
 import chromadb
+from shards import TEXTURE_COLLECTION
 
 DB_PATH = "data/vectors/local"
-COLLECTION_NAME = "mindfield_fragments"
+COLLECTION_NAME = TEXTURE_COLLECTION
 
 client = chromadb.PersistentClient(path=DB_PATH)
 coll = client.get_collection(COLLECTION_NAME)